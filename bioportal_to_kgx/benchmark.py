@@ -0,0 +1,289 @@
+"""Functions for timing pipeline stages on synthetic data."""
+
+import os
+import shutil
+import time
+from typing import Callable, List, Optional
+
+from bioportal_to_kgx.bioportal_utils import BIOPORTAL_SOURCE
+from bioportal_to_kgx.dump_utils import (find_dump_files, get_header_offset,
+                                         parse_header)
+from bioportal_to_kgx.graph_utils import (process_graph_files,
+                                          validate_graph_files)
+from bioportal_to_kgx.repair_utils import repair_bad_curies, sanitize_dump
+from bioportal_to_kgx.synthetic import (relax_to_obojson, write_fake_robot,
+                                        write_graph_files,
+                                        write_synthetic_dump)
+
+# Shape of the synthetic dump used in benchmarks,
+# with a few problems for the repair stages to find
+BENCHMARK_SHAPE = {"file_iri_fraction": 0.001, "bad_comment_fraction": 0.001}
+
+BENCHMARK_MD = {
+    "full_name": "Synthetic Ontology - submission 1",
+    "bp_version": BIOPORTAL_SOURCE,
+}
+
+# Files the transform path reads from the working directory
+TRANSFORM_RESOURCES = ["namespace_maps.tsv"]
+
+
+def time_stage(
+    stage: str,
+    func: Callable,
+    items: int,
+    repeat: int = 1,
+    setup: Optional[Callable] = None,
+) -> dict:
+    """
+    Time a stage, keeping the fastest of several runs.
+
+    :param stage: str, name of the stage
+    :param func: function to time, called without arguments
+    :param items: int, number of items (e.g., files or rows)
+    the stage handles, to get a rate
+    :param repeat: int, number of times to run the stage
+    :param setup: function to call before each run, not timed,
+    e.g., to restore files the stage changes
+    :return: dict with keys stage, seconds, items and items_per_second
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "stage": stage,
+        "seconds": round(best, 4),
+        "items": items,
+        "items_per_second": round(items / best, 1) if best > 0 else 0.0,
+    }
+
+
+def import_functions():
+    """
+    Import the main transform functions, if their dependencies are installed.
+
+    :return: the bioportal_to_kgx.functions module, or None
+    """
+    try:
+        from bioportal_to_kgx import functions
+    except ImportError as e:
+        print(f"Can't import transform functions ({e}) - some stages will be skipped.")
+        return None
+
+    return functions
+
+
+def transform_all(functions, filepaths: list, robot_path: str) -> None:
+    """
+    Transform dump files, one at a time, as do_transforms would.
+
+    Uses the current directory for outputs.
+    :param functions: the bioportal_to_kgx.functions module
+    :param filepaths: list of paths to dump files
+    :param robot_path: str, path to ROBOT, or a stand-in
+    """
+    for filepath in filepaths:
+        functions.transform_ontology(
+            filepath,
+            kgx_validate=False,
+            robot_validate=False,
+            pandas_validate=False,
+            get_bioportal_metadata=False,
+            ncbo_key="",
+            write_curies=False,
+            robot_path=robot_path,
+            cache_dir="",
+            cache_params={},
+            compression="",
+            compress_threads=1,
+            native_ontologies=[],
+            onto_metadata={},
+            trace_path="",
+            kgx_validate_params={},
+            robot_env=dict(os.environ),
+        )
+
+
+def run_benchmarks(
+    work_dir: str,
+    sizes: list,
+    repeat: int = 3,
+    transform: bool = True,
+    seed: int = 0,
+) -> list:
+    """
+    Time each stage of the pipeline on a synthetic dump.
+
+    The dump is written to work_dir, along with
+    any other inputs and outputs.
+    The transform path uses a stand-in for ROBOT,
+    so it measures time spent outside of Java,
+    and needs KGX and universalizer.
+    Stages needing the main transform functions are
+    skipped if these can't be imported.
+    :param work_dir: str, path to an empty directory to work in
+    :param sizes: list of ints, number of classes in each ontology
+    :param repeat: int, number of times to run each stage,
+    keeping the fastest
+    :param transform: bool, if True, also time full transforms
+    :param seed: int, seed for the synthetic dump
+    :return: list of dicts, as returned by time_stage
+    """
+    results = []  # type: List[dict]
+    work_dir = os.path.abspath(work_dir)
+    dump_dir = os.path.join(work_dir, "data")
+    print(f"Writing synthetic dump of {len(sizes)} ontologies to {dump_dir}...")
+    filepaths = write_synthetic_dump(dump_dir, sizes, seed, **BENCHMARK_SHAPE)
+    functions = import_functions()
+
+    if functions:
+        results.append(
+            time_stage(
+                "examine_data_directory",
+                lambda: functions.examine_data_directory(dump_dir, [], []),
+                len(filepaths),
+                repeat,
+            )
+        )
+    else:
+        results.append(
+            time_stage(
+                "find_dump_files",
+                lambda: find_dump_files(dump_dir),
+                len(filepaths),
+                repeat,
+            )
+        )
+
+    def read_headers():
+        for filepath in filepaths:
+            parse_header(filepath)
+            get_header_offset(filepath)
+
+    results.append(time_stage("header_parse", read_headers, len(filepaths), repeat))
+
+    sanitized_path = os.path.join(work_dir, "sanitized.nt")
+
+    def sanitize_all():
+        for filepath in filepaths:
+            sanitize_dump(filepath, get_header_offset(filepath), sanitized_path)
+
+    results.append(time_stage("sanitize_dump", sanitize_all, sum(sizes), repeat))
+
+    # Relax the largest ontology once, without timing it,
+    # to get a relaxed JSON to repair
+    largest = filepaths[sizes.index(max(sizes))]
+    body_path = os.path.join(work_dir, "body.nt")
+    with open(largest, "rb") as infile, open(body_path, "wb") as outfile:
+        infile.seek(get_header_offset(largest))
+        shutil.copyfileobj(infile, outfile)
+    relaxed_path = os.path.join(work_dir, "relaxed.json")
+    relax_to_obojson(body_path, relaxed_path)
+    repair_path = os.path.join(work_dir, "repair_relaxed.json")
+    results.append(
+        time_stage(
+            "repair_bad_curies",
+            lambda: repair_bad_curies(repair_path),
+            max(sizes),
+            repeat,
+            setup=lambda: shutil.copyfile(relaxed_path, repair_path),
+        )
+    )
+
+    graph_dir = os.path.join(work_dir, "graph")
+    rows = sum(sizes)
+    results.append(
+        time_stage(
+            "add_metadata",
+            lambda: process_graph_files(graph_dir, BENCHMARK_MD),
+            rows * 2,
+            repeat,
+            setup=lambda: write_graph_files(graph_dir, "SYN", rows),
+        )
+    )
+
+    if functions:
+        results.append(
+            time_stage(
+                "pandas_validate_transform",
+                lambda: functions.pandas_validate_transform(graph_dir),
+                rows * 2,
+                repeat,
+            )
+        )
+    else:
+        results.append(
+            time_stage(
+                "validate_graph_files",
+                lambda: validate_graph_files(graph_dir),
+                rows * 2,
+                repeat,
+            )
+        )
+
+    if transform and functions:
+        results.append(time_transforms(functions, work_dir, filepaths, sizes, repeat))
+    elif transform:
+        print("Skipping transforms, as transform functions can't be imported.")
+
+    return results
+
+
+def time_transforms(
+    functions, work_dir: str, filepaths: list, sizes: list, repeat: int
+) -> dict:
+    """
+    Time full transforms of a synthetic dump, with a stand-in for ROBOT.
+
+    Transforms run in work_dir, as outputs and
+    some resources are relative to the current directory.
+    :param functions: the bioportal_to_kgx.functions module
+    :param work_dir: str, path to the working directory
+    :param filepaths: list of paths to dump files
+    :param sizes: list of ints, number of classes in each ontology
+    :param repeat: int, number of times to run the transforms
+    :return: dict, as returned by time_stage
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for resource in TRANSFORM_RESOURCES:
+        shutil.copy(os.path.join(root, resource), work_dir)
+    robot_path = os.path.join(work_dir, "robot")
+    write_fake_robot(robot_path)
+
+    def clear_outputs():
+        shutil.rmtree(os.path.join(work_dir, functions.TXDIR), ignore_errors=True)
+
+    start_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        return time_stage(
+            "transform_ontology",
+            lambda: transform_all(functions, filepaths, robot_path),
+            sum(sizes),
+            repeat,
+            setup=clear_outputs,
+        )
+    finally:
+        os.chdir(start_dir)
+
+
+def format_results(results: list) -> str:
+    """
+    Format benchmark results as a table.
+
+    :param results: list of dicts, as returned by time_stage
+    :return: str, tab-delimited table with a header
+    """
+    lines = ["stage\tseconds\titems\titems_per_second"]
+    for result in results:
+        lines.append(
+            f"{result['stage']}\t{result['seconds']}\t"
+            f"{result['items']}\t{result['items_per_second']}"
+        )
+
+    return "\n".join(lines)
@@ -1,12 +1,35 @@
 """Functions for interfacing with Bioportal."""
 
+import hashlib
+import json
 import os
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from urllib.parse import urlencode
 
 import requests  # type: ignore
 
+from bioportal_to_kgx.compress_utils import open_file
+
 BIOPORTAL_SOURCE = "BioPortal 2022-07-20"
-BASE_ONTO_URL = "https://data.bioontology.org/ontologies/"
+BASE_API_URL = "https://data.bioontology.org/"
+BASE_ONTO_URL = BASE_API_URL + "ontologies/"
+
+# Defaults for API requests
+DEFAULT_THREADS = 4
+DEFAULT_RATE = 10.0  # requests per second, for one API key
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 1.0  # seconds
+DEFAULT_TIMEOUT = 20.0  # seconds
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+# Submission fields to include in snapshots
+SNAPSHOT_SUBMISSION_FIELDS = ["submissionId", "creationDate", "ontology"]
+
+# Responses worth trying again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 # Mapping from Biolink slots (keys) to a custom value
 # assembled from metadata
@@ -16,52 +39,317 @@ MD_HEADINGS = {
 }
 
 
-def bioportal_metadata(ontoid: str, api_key: str) -> dict:
+class RateLimiter:
+    """Space out calls from any number of threads to a maximum rate."""
+
+    def __init__(self, rate: float) -> None:
+        """
+        Set up the limiter.
+
+        :param rate: float, maximum calls per second, or 0 for no limit
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Wait until another call is allowed."""
+        if self.interval == 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class MetadataClient:
     """
-    Retrieve metadata for the given ontology.
+    Retrieve ontology metadata from the BioPortal API.
 
-    Note that this requires a NCBO API key,
-    to be passed in api_key.
-    Returns a dict.
-    :param outname: short identifier for the ontology,
-                    to be used for API calls
-    :param outdir: directory to write outfile to
-    :param api_key: str, NCBO API key
+    Requests share one pool of connections, are limited
+    to a maximum rate for the API key, and are retried
+    with exponential backoff on connection errors,
+    timeouts, and rate limit or server errors.
+    Responses may be cached on disk, so records are
+    only retrieved again once older than the TTL.
     """
-    md = {}
-    missing_pages = []  # type: List[str]
 
-    # Return content from the Ontology endpoint
-    # http://data.bioontology.org/metadata/Ontology
-    # Get the base ontology record and the latest_submission record
-    for rec_type in ["", "latest_submission"]:
-        req_url = f"{BASE_ONTO_URL}{ontoid}/{rec_type}"
-        params = dict(apikey=api_key, display_context="False", include="all")
-        print(f"Accessing {req_url}...")
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = BASE_API_URL,
+        cache_dir: str = "",
+        ttl: float = DEFAULT_CACHE_TTL,
+        threads: int = DEFAULT_THREADS,
+        rate: float = DEFAULT_RATE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """
+        Set up the client.
+
+        :param api_key: str, NCBO API key
+        :param api_url: str, base URL of the API
+        :param cache_dir: str, path to cache responses in,
+        or empty string to not cache them
+        :param ttl: float, seconds to keep cached responses for
+        :param threads: int, number of requests to make at once
+        :param rate: float, maximum requests per second, or 0 for no limit
+        :param retries: int, number of times to retry a failed request
+        :param backoff: float, seconds to wait before the first retry,
+        doubled for each retry after that
+        :param timeout: float, seconds to wait for each response
+        """
+        self.api_key = api_key
+        self.api_url = api_url
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.threads = threads
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=threads
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def cache_path(self, url: str) -> str:
+        """
+        Get the path a response would be cached at.
+
+        The API key is not part of the URL,
+        so cached responses may be shared.
+        :param url: str, URL requested
+        :return: str, path to the cache file
+        """
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json"
+        )
+
+    def read_cache(self, url: str) -> Any:
+        """
+        Get a cached response, if present and not expired.
+
+        :param url: str, URL requested
+        :return: response content, or None if not cached
+        """
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.cache_path(url)) as infile:
+                entry = json.load(infile)
+        except (IOError, ValueError):
+            return None
+        if time.time() - entry.get("fetched", 0) > self.ttl:
+            return None
+
+        return entry.get("content")
+
+    def write_cache(self, url: str, content: Any) -> None:
+        """
+        Cache a response.
+
+        Written to a temporary file first, so other
+        processes never see a partial entry.
+        :param url: str, URL requested
+        :param content: response content
+        """
+        if not self.cache_dir:
+            return
+        cache_path = self.cache_path(url)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as outfile:
+            json.dump({"url": url, "fetched": time.time(), "content": content}, outfile)
+        os.replace(tmp_path, cache_path)
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> Any:
+        """
+        Get a record from the API, using the cache if possible.
+
+        :param url: str, URL to request, without the API key
+        :param params: dict of any other query parameters
+        :return: response content, usually a dict (or a list
+        for list endpoints), or None if it couldn't be retrieved
+        """
+        cache_url = url
+        if params:
+            cache_url = f"{url}?{urlencode(sorted(params.items()))}"
+        content = self.read_cache(cache_url)
+        if content is not None:
+            return content
+
+        all_params = dict(params or {}, apikey=self.api_key)
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2**attempt)
+            self.limiter.wait()
+            try:
+                response = self.session.get(
+                    url, params=all_params, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                print(f"Request for {url} failed: {e}")
+            else:
+                if response.status_code == 200:
+                    content = response.json()
+                    self.write_cache(cache_url, content)
+                    return content
+                if response.status_code not in RETRY_STATUSES:
+                    print(f"Request for {url} failed: {response.status_code}")
+                    return None
+                print(f"Request for {url} failed: {response.status_code}")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            if attempt < self.retries:
+                time.sleep(delay)
+
+        return None
+
+    def get_metadata(self, ontoid: str) -> dict:
+        """
+        Retrieve metadata for the given ontology.
+
+        :param ontoid: str, short identifier for the ontology,
+        e.g., BTO
+        :return: dict of metadata, as returned by assemble_metadata
+        """
+        # Return content from the Ontology endpoint
+        # http://data.bioontology.org/metadata/Ontology
+        # Get the base ontology record and the latest_submission record
+        records = {}
+        params = dict(display_context="False", include="all")
+        for rec_type in ["", "latest_submission"]:
+            req_url = f"{self.api_url}ontologies/{ontoid}/{rec_type}"
+            records[rec_type] = self.get_json(req_url, params)
+            if records[rec_type] is None:
+                records[rec_type] = req_url
+
+        return assemble_metadata(ontoid, records)
+
+    def get_all_metadata(self, ontoids: list) -> dict:
+        """
+        Retrieve metadata for many ontologies at once.
+
+        :param ontoids: list of short identifiers for ontologies
+        :return: dict of identifiers to dicts of metadata,
+        as returned by assemble_metadata
+        """
+        ontoids = sorted(set(ontoids))
+        if len(ontoids) == 0:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            all_md = executor.map(self.get_metadata, ontoids)
+
+        return dict(zip(ontoids, all_md))
+
+    def get_collection(self, url: str, params: dict) -> Optional[list]:
+        """
+        Get all records from a list endpoint.
+
+        Paged responses are followed to the last page.
+        :param url: str, URL of the list endpoint
+        :param params: dict of any other query parameters
+        :return: list of records, or None if any page
+        couldn't be retrieved
+        """
+        records = []  # type: List[dict]
+        page_params = dict(params)
+        while True:
+            content = self.get_json(url, page_params)
+            if content is None:
+                return None
+            if isinstance(content, list):
+                return records + content
+            records.extend(content.get("collection", []))
+            if not content.get("nextPage"):
+                return records
+            page_params["page"] = content["nextPage"]
+
+    def get_snapshot(self) -> dict:
+        """
+        Retrieve records for all ontologies, in bulk.
+
+        Uses the ontologies and submissions list endpoints,
+        so only a few requests are made in all, rather than
+        two per ontology.
+        The submissions endpoint provides the
+        latest submission of each ontology.
+        :return: dict of ontology acronyms to dicts
+        of records, as used by assemble_metadata,
+        or an empty dict if retrieval failed
+        """
+        params = dict(display_context="False", display_links="False")
+        print("Retrieving all ontology records...")
+        ontologies = self.get_collection(
+            f"{self.api_url}ontologies", dict(params, include="all")
+        )
+        print("Retrieving all latest submission records...")
+        submissions = self.get_collection(
+            f"{self.api_url}submissions",
+            dict(params, include=",".join(SNAPSHOT_SUBMISSION_FIELDS)),
+        )
+        if ontologies is None or submissions is None:
+            return {}
+
+        snapshot = {}
+        for record in ontologies:
+            snapshot[record["acronym"]] = {"": record}
+        for record in submissions:
+            acronym = get_submission_acronym(record)
+            if acronym in snapshot:
+                snapshot[acronym]["latest_submission"] = record
+
+        return snapshot
+
+
+def assemble_metadata(ontoid: str, records: dict) -> dict:
+    """
+    Reduce ontology records to just the metadata we want.
 
-        response = requests.get(req_url, params=params, timeout=20)
-        print(response)
+    :param ontoid: str, short identifier for the ontology
+    :param records: dict with the ontology record (key "")
+    and the latest_submission record, as dicts.
+    A record that couldn't be retrieved is instead
+    a str for where it was expected, e.g., its URL.
+    :return: dict of metadata. If any record is missing,
+    the name is an empty string.
+    """
+    md = {}
+    missing_pages = []  # type: List[str]
 
-        if response.status_code != 200:
-            content = None
-            missing_pages.append(req_url)
-        else:
-            content = response.json()
+    for rec_type, content in records.items():
+        if not isinstance(content, dict):
+            missing_pages.append(content)
+            continue
 
         # Reduce the content to just what we want
-        if content:
-            if rec_type == "":
-                for md_type in ["name", "ontologyType"]:
-                    md[md_type] = content[md_type]
-            elif rec_type == "latest_submission":
-                for md_type in ["submissionId", "creationDate"]:
-                    md[md_type] = content[md_type]
-
-        # Assemble the full name
-        if all(md_type in md for md_type in ["name", "submissionId"]):
-            md["full_name"] = f"{md['name']} - submission {md['submissionId']}"
-        elif "name" in md:
-            md["full_name"] = md["name"]
+        if rec_type == "":
+            for md_type in ["name", "ontologyType"]:
+                md[md_type] = content[md_type]
+        elif rec_type == "latest_submission":
+            for md_type in ["submissionId", "creationDate"]:
+                md[md_type] = content[md_type]
+
+    # Assemble the full name
+    if all(md_type in md for md_type in ["name", "submissionId"]):
+        md["full_name"] = f"{md['name']} - submission {md['submissionId']}"
+    elif "name" in md:
+        md["full_name"] = md["name"]
 
     if len(missing_pages) == 0:
         print(f"Retrieved metadata for {ontoid} ({md['name']})")
@@ -76,17 +364,117 @@ def bioportal_metadata(ontoid: str, api_key: str) -> dict:
     return md
 
 
+def get_submission_acronym(record: dict) -> str:
+    """
+    Get the acronym of the ontology a submission record is for.
+
+    :param record: dict, submission record
+    :return: str, ontology acronym, or empty string if not found
+    """
+    ontology = record.get("ontology", "")
+    if isinstance(ontology, dict):
+        return ontology.get("acronym", "")
+
+    # Otherwise it's a link to the ontology
+    return str(ontology).rstrip("/").split("/")[-1]
+
+
+def write_metadata_snapshot(snapshot: dict, snapshot_path: str) -> None:
+    """
+    Write a snapshot of ontology records to a file.
+
+    Written to a temporary file first, so a failed
+    write doesn't replace an existing snapshot.
+    :param snapshot: dict of ontology acronyms to dicts of records,
+    as returned by MetadataClient.get_snapshot
+    :param snapshot_path: str, path to the snapshot file (JSON)
+    """
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "w") as outfile:
+        json.dump(
+            {
+                "bp_version": BIOPORTAL_SOURCE,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "ontologies": snapshot,
+            },
+            outfile,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_metadata_snapshot(snapshot_path: str) -> dict:
+    """
+    Read a snapshot of ontology records from a file.
+
+    :param snapshot_path: str, path to the snapshot file (JSON)
+    :return: dict of ontology acronyms to dicts of records
+    """
+    with open(snapshot_path) as infile:
+        snapshot = json.load(infile)
+    print(
+        f"Read records for {len(snapshot['ontologies'])} ontologies "
+        f"from metadata snapshot {snapshot_path} ({snapshot['created']})"
+    )
+
+    return snapshot["ontologies"]
+
+
+def snapshot_metadata(snapshot: dict, ontoids: list) -> dict:
+    """
+    Get metadata for ontologies from a snapshot, without the network.
+
+    :param snapshot: dict of ontology acronyms to dicts of records,
+    as returned by read_metadata_snapshot
+    :param ontoids: list of short identifiers for ontologies
+    :return: dict of identifiers to dicts of metadata,
+    as returned by assemble_metadata
+    """
+    all_md = {}
+    for ontoid in sorted(set(ontoids)):
+        records = dict(snapshot.get(ontoid, {}))
+        for rec_type in ["", "latest_submission"]:
+            if rec_type not in records:
+                records[rec_type] = f"{ontoid}/{rec_type} (not in snapshot)"
+        all_md[ontoid] = assemble_metadata(ontoid, records)
+
+    return all_md
+
+
+def bioportal_metadata(ontoid: str, api_key: str, cache_dir: str = "") -> dict:
+    """
+    Retrieve metadata for the given ontology.
+
+    Note that this requires a NCBO API key,
+    to be passed in api_key.
+    To retrieve metadata for many ontologies,
+    use a MetadataClient instead.
+    :param ontoid: short identifier for the ontology,
+                    to be used for API calls
+    :param api_key: str, NCBO API key
+    :param cache_dir: str, path to cache responses in,
+    or empty string to not cache them
+    :return: dict of metadata, as returned by assemble_metadata
+    """
+    client = MetadataClient(api_key, cache_dir=cache_dir, threads=1)
+    try:
+        return client.get_metadata(ontoid)
+    finally:
+        client.close()
+
+
 def check_header_for_md(filepath: str) -> bool:
     """
     Check for presence of metadata property names.
 
-    Takes a filename for a KGX edge or nodelist.
+    Takes a filename for a KGX edge or nodelist,
+    which may be compressed.
     :param filepath: str, path to KGX format file
     :return: bool, True if metadata fields appear present
     """
     have_md = False
 
-    with open(filepath, "r") as infile:
+    with open_file(filepath, "r") as infile:
         header = infile.readline()
 
     for heading in MD_HEADINGS:
@@ -94,41 +482,3 @@ def check_header_for_md(filepath: str) -> bool:
             have_md = True
 
     return have_md
-
-
-def manually_add_md(filepath: str, md: dict) -> bool:
-    """
-    Create new column headings and add values to node/edgelist.
-
-    Takes a filename for the KGX edge or nodelist,
-    for each entry. Removes "knowledge_source" if present.
-    :param filepath: str, path to KGX format file
-    :param md: dict, the metadata
-    :return: bool, True if successful
-    """
-    success = False
-
-    ks_heading = "knowledge_source"
-
-    out_filepath = filepath + ".tmp"
-
-    try:
-        with open(filepath, "r") as infile:
-            out_header_split = ((infile.readline()).rstrip()).split("\t")
-            if ks_heading in out_header_split:
-                out_header_split.remove(ks_heading)
-            with open(out_filepath, "w") as outfile:
-                for heading in MD_HEADINGS:
-                    out_header_split.append(heading)
-                outfile.write("\t".join(out_header_split) + "\n")
-                for line in infile:
-                    line_split = (line.rstrip()).split("\t")
-                    for heading in MD_HEADINGS:
-                        line_split.append(md[MD_HEADINGS[heading]])
-                    outfile.write("\t".join(line_split) + "\n")
-        os.replace(out_filepath, filepath)
-        success = True
-    except (IOError, KeyError) as e:
-        print(f"Failed to write metadata to {filepath}: {e}")
-
-    return success
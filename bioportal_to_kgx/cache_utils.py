@@ -0,0 +1,237 @@
+"""Functions for caching transform outputs between runs."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+
+from bioportal_to_kgx.compress_utils import strip_compression
+
+# Size of blocks to read when hashing dump files
+BLOCK_SIZE = 1024 * 1024
+
+# Stands in for the transform name in cached file names,
+# as the same dump body may appear under a new submission version
+OUTNAME_TOKEN = "@OUTNAME@"
+
+# Report files written without the transform name
+REPORT_NAMES = ["robot.report", "robot.measure"]
+
+
+def get_tool_versions(robot_path: str) -> dict:
+    """
+    Get versions of the tools that produce transform outputs.
+
+    ROBOT doesn't have a version to check without starting it,
+    so its jar is hashed instead.
+    :param robot_path: Path to ROBOT files
+    :return: dict of tool names to version strings
+    """
+    versions = {}
+
+    for package in ["kgx", "universalizer"]:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = "unknown"
+
+    robot_jar_path = os.path.join(os.path.dirname(robot_path), "robot.jar")
+    if os.path.exists(robot_jar_path):
+        versions["robot"] = file_digest(robot_jar_path)
+    else:
+        versions["robot"] = "unknown"
+
+    return versions
+
+
+def file_digest(filepath: str, offset: int = 0) -> str:
+    """
+    Get the SHA-256 hash of a file's contents.
+
+    :param filepath: str, path to file
+    :param offset: int, byte offset to start hashing from
+    :return: str, hex digest
+    """
+    digest = hashlib.sha256()
+
+    with open(filepath, "rb") as infile:
+        infile.seek(offset)
+        for block in iter(lambda: infile.read(BLOCK_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def get_body_digest(filepath: str, header_offset: int, cache_dir: str) -> str:
+    """
+    Get the hash of a dump file body, avoiding rehashing if possible.
+
+    The hash is recorded in the cache index with the file's
+    size and modification time. If these haven't changed
+    since the last time, the recorded hash is reused.
+    :param filepath: str, path to the dump file
+    :param header_offset: int, byte offset of the first line after the header
+    :param cache_dir: str, path to the cache directory
+    :return: str, hex digest of the dump body
+    """
+    abs_path = os.path.abspath(filepath)
+    stat = os.stat(abs_path)
+    path_id = hashlib.sha256(abs_path.encode()).hexdigest()
+    index_path = os.path.join(cache_dir, "index", f"{path_id}.json")
+
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as index_file:
+                entry = json.load(index_file)
+            if (
+                entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["header_offset"] == header_offset
+            ):
+                return entry["digest"]
+        except (ValueError, KeyError):
+            pass  # Will be replaced below
+
+    entry = {
+        "path": abs_path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "header_offset": header_offset,
+        "digest": file_digest(abs_path, header_offset),
+    }
+    write_json_atomic(index_path, entry)
+
+    return entry["digest"]
+
+
+def get_cache_key(body_digest: str, params: dict) -> str:
+    """
+    Get the cache key for a transform.
+
+    :param body_digest: str, hex digest of the dump body
+    :param params: dict of tool versions, options, and anything
+    else affecting transform outputs (e.g., the ontology acronym
+    and its BioPortal metadata)
+    :return: str, hex digest to use as the key
+    """
+    key_material = json.dumps({"body": body_digest, **params}, sort_keys=True)
+
+    return hashlib.sha256(key_material.encode()).hexdigest()
+
+
+def get_entry_dir(cache_dir: str, cache_key: str) -> str:
+    """
+    Get the directory for a single cache entry.
+
+    :param cache_dir: str, path to the cache directory
+    :param cache_key: str, key for the entry
+    :return: str, path to the entry directory
+    """
+    return os.path.join(cache_dir, "objects", cache_key[:2], cache_key)
+
+
+def restore_from_cache(
+    cache_dir: str, cache_key: str, outdir: str, outname: str
+) -> bool:
+    """
+    Copy cached transform outputs to an output directory.
+
+    :param cache_dir: str, path to the cache directory
+    :param cache_key: str, key for the entry
+    :param outdir: str, directory to copy outputs to
+    :param outname: str, name of the transform, e.g., BTO_1
+    :return: bool, True if the entry was found and restored
+    """
+    entry_dir = get_entry_dir(cache_dir, cache_key)
+    manifest_path = os.path.join(entry_dir, "manifest.json")
+
+    if not os.path.exists(manifest_path):
+        return False
+
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    for cached_name in manifest["files"]:
+        outfile_path = os.path.join(outdir, cached_name.replace(OUTNAME_TOKEN, outname))
+        # Copy to a temporary name first so partial copies aren't mistaken
+        # for complete transforms
+        shutil.copyfile(os.path.join(entry_dir, cached_name), outfile_path + ".tmp")
+        os.replace(outfile_path + ".tmp", outfile_path)
+
+    return True
+
+
+def store_in_cache(
+    cache_dir: str, cache_key: str, outdir: str, outname: str, params: dict
+) -> bool:
+    """
+    Copy transform outputs to the cache.
+
+    Outputs are assembled in a temporary directory
+    and then moved into place, so other processes
+    (or other hosts sharing the cache) never see
+    a partial entry. If an entry already exists,
+    it is left as is.
+    :param cache_dir: str, path to the cache directory
+    :param cache_key: str, key for the entry
+    :param outdir: str, directory containing outputs
+    :param outname: str, name of the transform, e.g., BTO_1
+    :param params: dict of tool versions and options, for the manifest
+    :return: bool, True if a new entry was stored
+    """
+    entry_dir = get_entry_dir(cache_dir, cache_key)
+    if os.path.exists(entry_dir):
+        return False
+
+    cached_names = []
+    tmp_root = os.path.join(cache_dir, "tmp")
+    os.makedirs(tmp_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=tmp_root)
+
+    try:
+        for filename in sorted(os.listdir(outdir)):
+            if strip_compression(filename).endswith(".tmp"):
+                continue
+            if filename.startswith(outname + "_") or (
+                filename == f"kgx_validate_{outname}.log"
+            ):
+                cached_name = filename.replace(outname, OUTNAME_TOKEN)
+            elif filename in REPORT_NAMES:
+                cached_name = filename
+            else:
+                continue
+            shutil.copyfile(
+                os.path.join(outdir, filename), os.path.join(tmp_dir, cached_name)
+            )
+            cached_names.append(cached_name)
+
+        manifest = {"outname": outname, "files": cached_names, "params": params}
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        os.rename(tmp_dir, entry_dir)
+    except OSError as e:
+        # Most likely another process stored the same entry first
+        print(f"Did not cache outputs for {outname}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+    return True
+
+
+def write_json_atomic(filepath: str, content: dict) -> None:
+    """
+    Write a JSON file by writing to a temporary file and renaming it.
+
+    :param filepath: str, path to write to
+    :param content: dict to write
+    """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        mode="w", dir=os.path.dirname(filepath), delete=False
+    ) as tmp_file:
+        json.dump(content, tmp_file)
+    os.replace(tmp_file.name, filepath)
@@ -0,0 +1,183 @@
+"""Functions for building and using a catalog of 4store dump files."""
+
+import csv
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from bioportal_to_kgx.dump_utils import (find_dump_files, get_header_offset,
+                                         read_header_metadata)
+
+CATALOG_FIELDS = [
+    "path",
+    "filename",
+    "type",
+    "acronym",
+    "version",
+    "size",
+    "header_offset",
+    "line_estimate",
+    "mtime_ns",
+]
+
+# Integer fields, converted when reading the catalog
+INT_FIELDS = ["size", "header_offset", "line_estimate", "mtime_ns"]
+
+# Bytes of dump body to sample when estimating line counts
+LINE_SAMPLE_SIZE = 64 * 1024
+
+
+def read_catalog(catalog_path: str) -> dict:
+    """
+    Read a dump catalog from disk.
+
+    :param catalog_path: str, path to catalog TSV
+    :return: dict of file paths to catalog entries (dicts),
+    empty if the catalog doesn't exist yet
+    """
+    catalog = {}
+
+    if not os.path.exists(catalog_path):
+        return catalog
+
+    with open(catalog_path, newline="") as catalog_file:
+        reader = csv.DictReader(catalog_file, delimiter="\t")
+        for row in reader:
+            for field in INT_FIELDS:
+                row[field] = int(row[field])
+            catalog[row["path"]] = row
+
+    return catalog
+
+
+def write_catalog(catalog: dict, catalog_path: str) -> None:
+    """
+    Write a dump catalog to disk.
+
+    The catalog is written to a temporary file and then
+    moved into place, so it's never left half-written.
+    :param catalog: dict of file paths to catalog entries
+    :param catalog_path: str, path to catalog TSV
+    """
+    catalog_dir = os.path.dirname(os.path.abspath(catalog_path))
+
+    with tempfile.NamedTemporaryFile(
+        mode="w", dir=catalog_dir, delete=False, newline=""
+    ) as tmp_file:
+        writer = csv.DictWriter(tmp_file, fieldnames=CATALOG_FIELDS, delimiter="\t")
+        writer.writeheader()
+        for path in sorted(catalog):
+            writer.writerow(catalog[path])
+    os.replace(tmp_file.name, catalog_path)
+
+
+def catalog_entry(filepath: str) -> dict:
+    """
+    Read the details of a single dump file for the catalog.
+
+    Only the header and a small sample of the body are read.
+    :param filepath: str, path to the dump file
+    :return: dict of catalog fields
+    """
+    stat = os.stat(filepath)
+    metadata_split = read_header_metadata(filepath)
+    header_offset = get_header_offset(filepath)
+    body_size = stat.st_size - header_offset
+
+    # Estimate lines from the average line length in a sample
+    line_estimate = 0
+    if body_size > 0:
+        with open(filepath, "rb") as infile:
+            infile.seek(header_offset)
+            sample = infile.read(LINE_SAMPLE_SIZE)
+        sample_lines = max(sample.count(b"\n"), 1)
+        line_estimate = round(body_size * sample_lines / len(sample))
+
+    def header_part(index: int) -> str:
+        return metadata_split[index] if len(metadata_split) > index else ""
+
+    return {
+        "path": filepath,
+        "filename": os.path.basename(filepath),
+        "type": header_part(0),
+        "acronym": header_part(1),
+        "version": header_part(3),
+        "size": stat.st_size,
+        "header_offset": header_offset,
+        "line_estimate": line_estimate,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def update_catalog(
+    input: str, catalog_path: str, threads: int = 1, discovery_threads: int = 1
+) -> dict:
+    """
+    Build or refresh the catalog for a dump directory.
+
+    Files already in the catalog with the same size and
+    modification time are not reopened.
+    New and changed files have their headers read in parallel.
+    Files no longer in the dump are dropped.
+    :param input: str for root of data dump
+    :param catalog_path: str, path to catalog TSV
+    :param threads: int, number of threads to read headers with
+    :param discovery_threads: int, number of threads to list directories with
+    :return: dict of file paths to catalog entries
+    """
+    old_catalog = read_catalog(catalog_path)
+    catalog = {}
+    to_read = []
+
+    for filepath in find_dump_files(input, discovery_threads):
+        entry = old_catalog.get(filepath)
+        if entry:
+            stat = os.stat(filepath)
+            if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                catalog[filepath] = entry
+                continue
+        to_read.append(filepath)
+
+    print(
+        f"Catalog: {len(catalog)} file(s) unchanged, "
+        f"{len(to_read)} to read, "
+        f"{len(set(old_catalog) - set(catalog) - set(to_read))} removed."
+    )
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for entry in executor.map(catalog_entry, to_read):
+            catalog[entry["path"]] = entry
+
+    write_catalog(catalog, catalog_path)
+
+    return catalog
+
+
+def filter_catalog(catalog: dict, ontologies: list) -> list:
+    """
+    Get paths for dump files matching ontology names.
+
+    :param catalog: dict of file paths to catalog entries
+    :param ontologies: list of ontology acronyms, optionally
+    with a submission version, e.g., ["BTO", "GO:1523"].
+    If empty, all ontologies are returned.
+    :return: sorted list of file paths as strings
+    """
+    acronyms = set()
+    versions = set()
+    for name in ontologies:
+        if ":" in name:
+            versions.add(tuple(name.split(":", 1)))
+        else:
+            acronyms.add(name)
+
+    filepaths = []
+    for filepath, entry in catalog.items():
+        if len(ontologies) > 0 and not (
+            entry["acronym"] in acronyms
+            or (entry["acronym"], entry["version"]) in versions
+        ):
+            continue
+        filepaths.append(filepath)
+
+    return sorted(filepaths)
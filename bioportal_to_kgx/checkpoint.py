@@ -0,0 +1,216 @@
+"""Functions for recording finished transform stages, so transforms can resume."""
+
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+from bioportal_to_kgx.cache_utils import write_json_atomic
+from bioportal_to_kgx.compress_utils import strip_compression
+from bioportal_to_kgx.graph_utils import is_graph_file
+
+# Each ontology's state is kept next to its outputs,
+# named so it isn't mistaken for an output or cached
+STATE_SUFFIX = ".state.json"
+
+# Stages write outputs here first, then move them into place
+STAGING_DIRNAME = ".staging"
+
+# Stages recorded in the state, in order
+STAGES = ["relax", "curie_repair", "transform", "normalization", "graph_check"]
+
+# Once this stage has finished, the transform is complete
+COMPLETE_STAGE = "graph_check"
+
+
+def get_state_path(outdir: str, outname: str) -> str:
+    """
+    Get the path to the state file for a transform.
+
+    :param outdir: str, output directory of the transform
+    :param outname: str, name of the transform, e.g., BTO_1
+    :return: str, path to the state file
+    """
+    return os.path.join(outdir, outname + STATE_SUFFIX)
+
+
+def get_dump_identity(filepath: str) -> dict:
+    """
+    Get what identifies a dump file, to tell if it changed.
+
+    :param filepath: str, path to the dump file
+    :return: dict with keys path, size and mtime_ns
+    """
+    stat = os.stat(filepath)
+
+    return {
+        "path": os.path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def read_state(outdir: str, outname: str, filepath: str, params: dict) -> dict:
+    """
+    Read the state of a transform, if it can be resumed.
+
+    State is only kept if the dump file and the options
+    that change outputs are the same as when it was written.
+    :param outdir: str, output directory of the transform
+    :param outname: str, name of the transform, e.g., BTO_1
+    :param filepath: str, path to the dump file
+    :param params: dict of options that change outputs
+    :return: dict with keys dump, params and stages (a dict of
+    stage names to details of each finished stage), or
+    an empty dict if there is no state to resume from
+    """
+    state_path = get_state_path(outdir, outname)
+    if not os.path.exists(state_path):
+        return {}
+
+    try:
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+    except ValueError:
+        print(f"Could not read state for {outname} - will start over.")
+        return {}
+
+    if state.get("dump") != get_dump_identity(filepath):
+        print(f"Dump file for {outname} has changed - will start over.")
+        return {}
+    if state.get("params") != params:
+        print(f"Options for {outname} have changed - will start over.")
+        return {}
+
+    return state
+
+
+def start_state(outdir: str, outname: str, filepath: str, params: dict) -> dict:
+    """
+    Start a new state for a transform, and write it.
+
+    Writing the state before any outputs means outputs
+    left by a crash are never taken as complete.
+    :param outdir: str, output directory of the transform
+    :param outname: str, name of the transform, e.g., BTO_1
+    :param filepath: str, path to the dump file
+    :param params: dict of options that change outputs
+    :return: dict, the new state
+    """
+    state = {
+        "outname": outname,
+        "dump": get_dump_identity(filepath),
+        "params": params,
+        "stages": {},
+    }
+    write_json_atomic(get_state_path(outdir, outname), state)
+
+    return state
+
+
+def is_stage_done(state: dict, stage: str) -> bool:
+    """
+    Check if a stage has finished.
+
+    :param state: dict, the state, as from read_state
+    :param stage: str, name of the stage
+    :return: bool, True if the stage is recorded as finished
+    """
+    return stage in state.get("stages", {})
+
+
+def get_stage_details(state: dict, stage: str) -> dict:
+    """
+    Get what was recorded when a stage finished.
+
+    :param state: dict, the state, as from read_state
+    :param stage: str, name of the stage
+    :return: dict of details, empty if the stage hasn't finished
+    """
+    return state.get("stages", {}).get(stage, {})
+
+
+def mark_stage_done(
+    state: dict, outdir: str, stage: str, details: Optional[dict] = None
+) -> None:
+    """
+    Record that a stage has finished, and write the state.
+
+    The state is replaced atomically, after the
+    stage's outputs are in place.
+    :param state: dict, the state, changed in place
+    :param outdir: str, output directory of the transform
+    :param stage: str, name of the stage
+    :param details: dict of anything else to record, e.g.,
+    fixes applied, for when the stage is skipped on resume
+    """
+    state["stages"][stage] = {"finished": time.time(), **(details or {})}
+    write_json_atomic(get_state_path(outdir, state["outname"]), state)
+
+
+def get_last_stage(state: dict) -> str:
+    """
+    Get the last stage that finished.
+
+    :param state: dict, the state, as from read_state
+    :return: str, name of the stage, or empty string if none
+    """
+    done = [stage for stage in STAGES if is_stage_done(state, stage)]
+
+    return done[-1] if done else ""
+
+
+def make_staging_dir(outdir: str) -> str:
+    """
+    Make an empty directory for a stage to write its outputs to.
+
+    Anything left by an earlier stage that didn't finish is removed.
+    :param outdir: str, output directory of the transform
+    :return: str, path to the staging directory
+    """
+    staging_dir = os.path.join(outdir, STAGING_DIRNAME)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    return staging_dir
+
+
+def commit_outputs(staging_dir: str, outdir: str) -> list:
+    """
+    Move a stage's outputs into place, then remove the staging directory.
+
+    Each file is renamed, which is atomic on the same filesystem,
+    so no output is ever seen partly written.
+    :param staging_dir: str, path to the staging directory
+    :param outdir: str, output directory of the transform
+    :return: list of paths to the outputs moved
+    """
+    out_filepaths = []
+    for filename in sorted(os.listdir(staging_dir)):
+        staged_path = os.path.join(staging_dir, filename)
+        if not os.path.isfile(staged_path):
+            continue
+        out_filepath = os.path.join(outdir, filename)
+        os.replace(staged_path, out_filepath)
+        out_filepaths.append(out_filepath)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return out_filepaths
+
+
+def clear_partial_outputs(outdir: str, graph_files: bool) -> None:
+    """
+    Remove outputs left by a transform that didn't finish.
+
+    The staging directory and any temporary files are always removed.
+    :param outdir: str, output directory of the transform
+    :param graph_files: bool, if True, also remove node and edge files,
+    e.g., if the stage writing them didn't finish
+    """
+    shutil.rmtree(os.path.join(outdir, STAGING_DIRNAME), ignore_errors=True)
+    for filename in os.listdir(outdir):
+        if strip_compression(filename).endswith(".tmp") or (
+            graph_files and is_graph_file(filename)
+        ):
+            os.remove(os.path.join(outdir, filename))
@@ -0,0 +1,188 @@
+"""Functions for reading and writing compressed transform outputs."""
+
+import gzip
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+# Supported compression types and their file extensions
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+# Size of chunks to compress in parallel for gzip
+CHUNK_SIZE = 1024 * 1024
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def get_compression(filepath: str) -> str:
+    """
+    Get the compression type of a file from its extension.
+
+    :param filepath: str, path to file
+    :return: str, compression type (e.g., gzip), or empty string if none
+    """
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if filepath.endswith(extension):
+            return compression
+
+    return ""
+
+
+def strip_compression(filepath: str) -> str:
+    """
+    Remove any compression extension from a file path.
+
+    :param filepath: str, path to file
+    :return: str, path without compression extension
+    """
+    compression = get_compression(filepath)
+    if compression:
+        return filepath[: -len(COMPRESSION_EXTENSIONS[compression])]
+
+    return filepath
+
+
+def compressed_path(filepath: str, compression: str) -> str:
+    """
+    Get the path a file should have with the given compression.
+
+    :param filepath: str, path to file, with or without a compression extension
+    :param compression: str, compression type, or empty string for none
+    :return: str, path with the extension for the compression type
+    """
+    return strip_compression(filepath) + COMPRESSION_EXTENSIONS.get(compression, "")
+
+
+def check_compression(compression: str) -> None:
+    """
+    Check that a compression type can be used.
+
+    Raises ValueError for unknown types,
+    and ImportError if zstd is requested but zstandard is not installed.
+    :param compression: str, compression type, or empty string for none
+    """
+    if compression and compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unknown compression type: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError(
+            "zstd compression requires the zstandard package - "
+            "install it with pip install zstandard"
+        )
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """
+    Write a gzip file, compressing chunks in parallel.
+
+    Each chunk is compressed as a separate gzip member,
+    and members are written in order.
+    Concatenated members are still a valid gzip file,
+    readable with gzip, zcat, or pandas.
+    """
+
+    def __init__(self, filepath: str, threads: int) -> None:
+        """
+        Open a file for writing.
+
+        :param filepath: str, path to file
+        :param threads: int, number of threads to compress with
+        """
+        self.outfile = open(filepath, "wb")
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pending = deque()  # type: deque
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        """Allow writing."""
+        return True
+
+    def write(self, data) -> int:
+        """
+        Add data to the file.
+
+        :param data: bytes-like object to write
+        :return: int, number of bytes written
+        """
+        if self.closed:
+            raise ValueError("write to closed file")
+        self.buffer.extend(data)
+        if len(self.buffer) >= CHUNK_SIZE:
+            self.submit_chunk()
+        return len(data)
+
+    def submit_chunk(self) -> None:
+        """Start compressing the buffered data."""
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        self.pending.append(
+            self.executor.submit(gzip.compress, chunk, GZIP_LEVEL, mtime=0)
+        )
+        # Don't let compressed chunks pile up in memory
+        while len(self.pending) > self.threads * 2:
+            self.outfile.write(self.pending.popleft().result())
+
+    def close(self) -> None:
+        """Compress any remaining data and close the file."""
+        if self.closed:
+            return
+        try:
+            if len(self.buffer) > 0 or len(self.pending) == 0:
+                self.submit_chunk()
+            while len(self.pending) > 0:
+                self.outfile.write(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown()
+            self.outfile.close()
+            super().close()
+
+
+def open_file(filepath: str, mode: str = "r", threads: int = 1) -> IO:
+    """
+    Open a file, compressed or not, based on its extension.
+
+    Files ending in .gz are read and written as gzip,
+    and files ending in .zst as zstd.
+    Anything else is opened as usual.
+    :param filepath: str, path to file
+    :param mode: str, one of r, w, rb, or wb
+    :param threads: int, number of threads to compress with when writing
+    :return: file object
+    """
+    compression = get_compression(filepath)
+    check_compression(compression)
+    binary_mode = mode[0] + "b"
+
+    if compression == "gzip":
+        if binary_mode == "wb" and threads > 1:
+            fileobj = ParallelGzipWriter(filepath, threads)  # type: IO
+        else:
+            fileobj = gzip.open(filepath, binary_mode, compresslevel=GZIP_LEVEL)
+    elif compression == "zstd":
+        if binary_mode == "wb":
+            cctx = zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL, threads=threads if threads > 1 else 0
+            )
+            fileobj = cctx.stream_writer(open(filepath, "wb"), closefd=True)
+        else:
+            dctx = zstandard.ZstdDecompressor()
+            # Buffered so lines can be read
+            fileobj = io.BufferedReader(
+                dctx.stream_reader(
+                    open(filepath, "rb"), closefd=True, read_across_frames=True
+                )
+            )
+    else:
+        fileobj = open(filepath, binary_mode)
+
+    if "b" in mode:
+        return fileobj
+
+    return io.TextIOWrapper(fileobj, encoding="utf-8")
@@ -0,0 +1,258 @@
+"""Functions for predicting transform costs from earlier runs, to plan a run."""
+
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List
+
+from bioportal_to_kgx.cache_utils import write_json_atomic
+from bioportal_to_kgx.dump_utils import parse_header
+from bioportal_to_kgx.robot_utils import (HEAP_MB_PER_INPUT_MB,
+                                          MIN_JAVA_HEAP_MB,
+                                          estimate_robot_heap)
+from bioportal_to_kgx.sharding import find_shard_paths, get_shard_path
+
+# Stages showing an ontology was really transformed,
+# rather than found already done or restored from cache
+TRANSFORM_STAGES = ["robot_relax", "native_transform", "kgx_transform"]
+
+# Seconds per MB of dump file for ontologies without history,
+# used until there's history to estimate it from
+DEFAULT_SECONDS_PER_MB = 2.0
+
+
+def read_history_file(history_path: str) -> dict:
+    """
+    Read one file of recorded costs.
+
+    :param history_path: str, path to the file (JSON)
+    :return: dict of ontology acronyms to costs,
+    or an empty dict if there is no file
+    """
+    if not os.path.exists(history_path):
+        return {}
+
+    try:
+        with open(history_path) as history_file:
+            return json.load(history_file)
+    except ValueError:
+        print(f"Could not read cost history at {history_path} - ignoring it.")
+        return {}
+
+
+def read_cost_history(history_path: str) -> dict:
+    """
+    Read the costs recorded for each ontology in earlier runs.
+
+    Sharded runs record costs in their own files
+    (e.g., transform_costs.shard_1_of_4.json), so these
+    are read too. Where an ontology was recorded more
+    than once, its latest costs are used.
+    :param history_path: str, path to the cost history (JSON)
+    :return: dict of ontology acronyms to costs, each a dict with keys
+    input_bytes, stage_seconds (dict of stage names to wall seconds),
+    peak_rss_mb and updated, or an empty dict if there is no history
+    """
+    history = read_history_file(history_path)
+    for shard_paths in find_shard_paths(history_path).values():
+        for shard_path in shard_paths.values():
+            for ontology, costs in read_history_file(shard_path).items():
+                latest = history.get(ontology, {}).get("updated", 0)
+                if costs.get("updated", 0) > latest:
+                    history[ontology] = costs
+
+    return history
+
+
+def update_cost_history(
+    history_path: str, paths: list, results: list, shard=None
+) -> int:
+    """
+    Record the costs of transforms just run.
+
+    Only successful transforms are recorded. If a transform
+    resumed partway (so some stages didn't run this time),
+    times from the last run are kept for the stages that didn't,
+    as long as the dump file is the same size.
+    Shards write to their own file, so shards finishing
+    at once don't overwrite each other's costs.
+    The file is read again just before writing,
+    so runs finishing at once lose as little as possible.
+    :param history_path: str, path to the cost history (JSON)
+    :param paths: list of dump file paths
+    :param results: list of result dicts from transform_ontology,
+    in the same order as paths
+    :param shard: tuple of (index, count) if this run is one shard
+    of a run, or None for a whole run
+    :return: int, number of ontologies recorded
+    """
+    previous_history = read_cost_history(history_path)
+    out_path = get_shard_path(history_path, *shard) if shard else history_path
+    history = read_history_file(out_path)
+    recorded = 0
+    for filepath, result in zip(paths, results):
+        tx_result = result["tx_result"]
+        stage_seconds = result.get("stage_seconds", {})
+        if not tx_result or tx_result["status"] != "OK":
+            continue
+        if not any(stage in stage_seconds for stage in TRANSFORM_STAGES):
+            continue
+        input_bytes = os.path.getsize(filepath)
+        previous = previous_history.get(tx_result["id"], {})
+        if previous.get("input_bytes") == input_bytes:
+            stage_seconds = {**previous["stage_seconds"], **stage_seconds}
+        history[tx_result["id"]] = {
+            "input_bytes": input_bytes,
+            "stage_seconds": stage_seconds,
+            "peak_rss_mb": tx_result["peak_rss_mb"],
+            "updated": time.time(),
+        }
+        recorded = recorded + 1
+
+    if recorded > 0:
+        write_json_atomic(out_path, history)
+
+    return recorded
+
+
+def get_seconds_per_mb(history: dict) -> float:
+    """
+    Estimate transform time per MB of dump file from history.
+
+    :param history: dict of ontology acronyms to costs
+    :return: float, seconds per MB over all recorded ontologies,
+    or DEFAULT_SECONDS_PER_MB if there is no history
+    """
+    total_mb = sum(costs["input_bytes"] for costs in history.values()) / 1024**2
+    total_seconds = sum(
+        sum(costs["stage_seconds"].values()) for costs in history.values()
+    )
+    if total_mb == 0 or total_seconds == 0:
+        return DEFAULT_SECONDS_PER_MB
+
+    return total_seconds / total_mb
+
+
+def predict_cost(
+    filepath: str, ontology: str, history: dict, seconds_per_mb: float
+) -> dict:
+    """
+    Predict the time and peak memory needed to transform a dump file.
+
+    Ontologies in the history are predicted from their last
+    successful transform, scaled by the change in dump file size.
+    Others are predicted from their size alone: time from
+    seconds_per_mb, and memory from the heap ROBOT would need.
+    :param filepath: str, path to the dump file
+    :param ontology: str, ontology acronym
+    :param history: dict of ontology acronyms to costs
+    :param seconds_per_mb: float, seconds per MB for ontologies without history
+    :return: dict with keys seconds, peak_rss_mb and source
+    (history or size)
+    """
+    input_bytes = os.path.getsize(filepath)
+    input_mb = input_bytes / 1024**2
+    costs = history.get(ontology)
+    if costs and costs["input_bytes"] > 0:
+        scale = input_bytes / costs["input_bytes"]
+        return {
+            "seconds": sum(costs["stage_seconds"].values()) * scale,
+            "peak_rss_mb": costs["peak_rss_mb"] * scale,
+            "source": "history",
+        }
+
+    return {
+        "seconds": input_mb * seconds_per_mb,
+        "peak_rss_mb": MIN_JAVA_HEAP_MB + HEAP_MB_PER_INPUT_MB * input_mb,
+        "source": "size",
+    }
+
+
+def plan_transforms(
+    paths: list, history: dict, workers: int = 1, memory_budget: int = 0
+) -> dict:
+    """
+    Order transforms longest first, and predict how the run will go.
+
+    Starting the longest transforms first keeps one large
+    ontology from stretching the end of the run.
+    The run is simulated as transform_in_pool runs it:
+    ontologies start in order, as workers are free and
+    their ROBOT heaps fit within the memory budget.
+    :param paths: list of dump file paths
+    :param history: dict of ontology acronyms to costs
+    :param workers: int, number of worker processes
+    :param memory_budget: int, total MB available to ROBOT heaps,
+    or 0 to not limit them
+    :return: dict with keys jobs (list of dicts, in the order to
+    start them, each with keys path, ontology, input_mb, seconds,
+    peak_rss_mb, source, start and end), total_seconds
+    and peak_rss_mb (predicted for the whole run)
+    """
+    seconds_per_mb = get_seconds_per_mb(history)
+    jobs = []  # type: List[dict]
+    for filepath in paths:
+        metadata_split = parse_header(filepath)
+        ontology = metadata_split[1] if metadata_split else os.path.basename(filepath)
+        job = {
+            "path": filepath,
+            "ontology": ontology,
+            "input_mb": os.path.getsize(filepath) / 1024**2,
+        }
+        job.update(predict_cost(filepath, ontology, history, seconds_per_mb))
+        jobs.append(job)
+    jobs.sort(key=lambda job: (-job["seconds"], job["path"]))
+
+    heaps = {}  # type: Dict[str, int]
+    for job in jobs:
+        heaps[job["path"]] = (
+            estimate_robot_heap(job["path"], memory_budget) if memory_budget > 0 else 0
+        )
+
+    pending = deque(jobs)
+    running = []  # type: List[dict]
+    now = 0.0
+    reserved = 0
+    peak_rss_mb = 0.0
+    while len(pending) > 0 or len(running) > 0:
+        while len(pending) > 0 and len(running) < workers:
+            heap = heaps[pending[0]["path"]]
+            if len(running) > 0 and reserved + heap > memory_budget > 0:
+                break
+            job = pending.popleft()
+            job["start"] = now
+            job["end"] = now + job["seconds"]
+            running.append(job)
+            reserved = reserved + heap
+        peak_rss_mb = max(peak_rss_mb, sum(job["peak_rss_mb"] for job in running))
+
+        finished = min(running, key=lambda job: job["end"])
+        running.remove(finished)
+        now = finished["end"]
+        reserved = reserved - heaps[finished["path"]]
+
+    return {"jobs": jobs, "total_seconds": now, "peak_rss_mb": peak_rss_mb}
+
+
+def format_plan(plan: dict) -> str:
+    """
+    Format a plan as a table, with totals.
+
+    :param plan: dict, as returned by plan_transforms
+    :return: str, tab-delimited table with a header,
+    followed by the predicted total time and peak memory
+    """
+    lines = ["ontology\tinput_mb\tseconds\tpeak_rss_mb\tstart\tend\testimate"]
+    for job in plan["jobs"]:
+        lines.append(
+            f"{job['ontology']}\t{job['input_mb']:.1f}\t{job['seconds']:.0f}\t"
+            f"{job['peak_rss_mb']:.0f}\t{job['start']:.0f}\t{job['end']:.0f}\t"
+            f"{job['source']}"
+        )
+    minutes, seconds = divmod(int(plan["total_seconds"]), 60)
+    hours, minutes = divmod(minutes, 60)
+    lines.append(f"Predicted total time: {hours}:{minutes:02d}:{seconds:02d}")
+    lines.append(f"Predicted peak memory: {plan['peak_rss_mb']:.0f} MB")
+
+    return "\n".join(lines)
@@ -0,0 +1,165 @@
+"""Functions for working with 4store data dump files."""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Iterator
+
+NAMESPACE = "data.bioontology.org"
+TARGET_TYPE = "ontologies"
+
+# Dump files are named with 28-character hashes,
+# e.g., dabd4d902360003975fb25ae56f8
+DATA_FILENAME_LENGTH = 28
+
+# Dump bodies are N-Triples, so ROBOT is given them
+# under a name with this extension to parse them as such
+BODY_EXTENSION = ".nt"
+
+
+def find_dump_files(input: str, threads: int = 1) -> list:
+    """
+    Find all data files within a dump directory, recursively.
+
+    Only files with names of the expected length are returned.
+    Directories may be listed by several threads at once,
+    which helps on network filesystems where each listing is slow.
+    Symlinked directories are not followed.
+    :param input: str for root of data dump
+    :param threads: int, number of threads to list directories with
+    :return: sorted list of file paths as strings
+    """
+    data_filepaths = []
+
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            pending = {executor.submit(scan_dump_dir, input)}
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepaths, subdirs = future.result()
+                    data_filepaths.extend(filepaths)
+                    for subdir in subdirs:
+                        pending.add(executor.submit(scan_dump_dir, subdir))
+    else:
+        dirs = [input]
+        while len(dirs) > 0:
+            filepaths, subdirs = scan_dump_dir(dirs.pop())
+            data_filepaths.extend(filepaths)
+            dirs.extend(subdirs)
+
+    return sorted(data_filepaths)
+
+
+def scan_dump_dir(path: str) -> tuple:
+    """
+    List a single directory within a dump.
+
+    :param path: str, path to directory
+    :return: tuple of (list of data file paths, list of subdirectory paths)
+    """
+    filepaths = []
+    subdirs = []
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif len(entry.name) == DATA_FILENAME_LENGTH and entry.is_file():
+                filepaths.append(entry.path)
+
+    return (filepaths, subdirs)
+
+
+def read_header_metadata(filepath: str) -> list:
+    """
+    Read the metadata header of a 4store dump file.
+
+    :param filepath: str, path to the dump file
+    :return: list of the path components following the namespace,
+    e.g., ['ontologies', 'BTO', 'submissions', '1'],
+    or an empty list if the header is malformed
+    """
+    with open(filepath, errors="replace") as infile:
+        header = (infile.readline()).rstrip()
+    try:  # Throws IndexError if input header is malformed
+        metadata = (header.split(NAMESPACE))[1]
+    except IndexError:
+        return []
+
+    return metadata.lstrip("/").split("/")
+
+
+def parse_header(filepath: str) -> list:
+    """
+    Parse the metadata header of a 4store dump file.
+
+    :param filepath: str, path to the dump file
+    :return: list of the path components following the namespace,
+    e.g., ['ontologies', 'BTO', 'submissions', '1'],
+    or an empty list if the header is malformed
+    or isn't for the target type
+    """
+    metadata_split = read_header_metadata(filepath)
+    if len(metadata_split) < 4 or metadata_split[0] != TARGET_TYPE:
+        return []
+
+    return metadata_split
+
+
+def get_header_offset(filepath: str) -> int:
+    """
+    Find where the body of a dump file starts.
+
+    Each dump file begins with one line of metadata,
+    followed by the N-Triples for the graph.
+    :param filepath: str, path to the dump file
+    :return: int, byte offset of the first line after the header
+    """
+    with open(filepath, "rb") as infile:
+        infile.readline()
+        return infile.tell()
+
+
+def is_body_empty(filepath: str, header_offset: int) -> bool:
+    """
+    Check if a dump file has nothing after its header.
+
+    Uses the file size, so the file doesn't need to be read.
+    :param filepath: str, path to the dump file
+    :param header_offset: int, byte offset of the first line after the header
+    :return: bool, True if there is nothing after the header
+    """
+    return os.path.getsize(filepath) <= header_offset
+
+
+@contextmanager
+def dump_body(filepath: str, header_offset: int) -> Iterator[str]:
+    """
+    Provide the body of a dump file as an N-Triples file, without copying it.
+
+    The header of a dump file is an N-Triples comment,
+    so the dump file as a whole can be read as N-Triples.
+    It is linked to under a name ending in .nt, in a
+    temporary directory, so ROBOT parses it as such.
+    Only if it can't be linked (e.g., where symlinks
+    aren't supported) is the body copied instead.
+    Either way, it's a local file, so it may be read
+    more than once (e.g., to try different parsers).
+    The link is removed once the context is exited.
+    :param filepath: str, path to the dump file
+    :param header_offset: int, byte offset of the first line after the header
+    :return: iterator yielding a str path to read the body from
+    """
+    with tempfile.TemporaryDirectory() as body_dir:
+        body_path = os.path.join(body_dir, os.path.basename(filepath) + BODY_EXTENSION)
+        try:
+            os.symlink(os.path.abspath(filepath), body_path)
+        except OSError:
+            with open(filepath, "rb") as infile, open(body_path, "wb") as outfile:
+                infile.seek(header_offset)
+                shutil.copyfileobj(infile, outfile)
+
+        yield body_path
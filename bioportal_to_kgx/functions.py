@@ -1,64 +1,118 @@
 """Main functions for transforming BP to KGX."""
 
-import glob
 import os
-import re
+import shutil
 import sys
 import tempfile
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
 from json import dump as json_dump
+from typing import ContextManager, Dict, List, Optional
 
 import kgx.cli  # type: ignore
-import pandas as pd  # type: ignore
 from universalizer.norm import clean_and_normalize_graph
 
-from bioportal_to_kgx.bioportal_utils import (BIOPORTAL_SOURCE,
+from bioportal_to_kgx.bioportal_utils import (BIOPORTAL_SOURCE, MetadataClient,
                                               bioportal_metadata,
                                               check_header_for_md,
-                                              manually_add_md)
-from bioportal_to_kgx.robot_utils import (initialize_robot, relax_ontology,
-                                          robot_measure, robot_remove,
-                                          robot_report)
+                                              read_metadata_snapshot,
+                                              snapshot_metadata)
+from bioportal_to_kgx.cache_utils import (get_body_digest, get_cache_key,
+                                          get_tool_versions,
+                                          restore_from_cache, store_in_cache)
+from bioportal_to_kgx.catalog import filter_catalog, update_catalog
+from bioportal_to_kgx.checkpoint import (COMPLETE_STAGE, STAGES,
+                                         clear_partial_outputs, commit_outputs,
+                                         get_last_stage, get_stage_details,
+                                         get_state_path, is_stage_done,
+                                         make_staging_dir, mark_stage_done,
+                                         read_state, start_state)
+from bioportal_to_kgx.compress_utils import (compressed_path, get_compression,
+                                             open_file)
+from bioportal_to_kgx.cost_model import (plan_transforms, read_cost_history,
+                                         update_cost_history)
+from bioportal_to_kgx.dump_utils import (NAMESPACE, TARGET_TYPE, dump_body,
+                                         find_dump_files, get_header_offset,
+                                         is_body_empty, parse_header)
+from bioportal_to_kgx.graph_utils import (get_graph_files, is_edge_file,
+                                          is_graph_file, is_node_file,
+                                          process_graph_files,
+                                          validate_graph_files)
+from bioportal_to_kgx.kgx_validation import BATCH_ROWS, sharded_validate
+from bioportal_to_kgx.native_source import native_transform
+from bioportal_to_kgx.repair_utils import repair_bad_curies, sanitize_dump
+from bioportal_to_kgx.robot_utils import (estimate_robot_heap, get_robot_heap,
+                                          initialize_robot, robot_chain,
+                                          robot_remove, set_robot_heap)
 from bioportal_to_kgx.stats import make_transform_stats
+from bioportal_to_kgx.telemetry import Tracer
 
 TXDIR = "transformed"
-NAMESPACE = "data.bioontology.org"
-TARGET_TYPE = "ontologies"
 
+ROBOT_REPORT_NAME = "robot.report"
+ROBOT_MEASURE_NAME = "robot.measure"
 
-def examine_data_directory(input: str, include_only: list, exclude: list):
+# How many times to try an ontology if its worker process dies
+MAX_WORKER_ATTEMPTS = 2
+
+
+def examine_data_directory(
+    input: str,
+    include_only: list,
+    exclude: list,
+    threads: int = 1,
+    catalog_path: str = "",
+    ontologies: Optional[list] = None,
+):
     """
     Generate paths for all data files within a path, recursively.
 
+    If a catalog path is provided, the dump catalog there
+    is refreshed and used to filter files by ontology,
+    without needing to open unchanged files.
     :param input: str for root of data dump
     :param include_only: if non-empty, only return these files
     :param exclude: if non-empty, don't return these files
+    :param threads: int, number of threads to list directories
+    and read headers with
+    :param catalog_path: str, path to the dump catalog, if using one
+    :param ontologies: if non-empty, only return files for these
+    ontologies (acronyms, or acronym:version). Requires a catalog.
     :return: list of file paths as strings
     """
-    data_filepaths = []
-
     # Check if this path exists first.
     if not os.path.isdir(input):
         raise FileNotFoundError(f"Cannot find {input}.")
 
     print(f"Looking for records in {input}")
 
-    including = False
-    if len(include_only) > 0:
-        print(f"Will only include the specified {len(include_only)} file(s).")
-        including = True
-    excluding = False
-    if len(exclude) > 0:
-        print(f"Will exclude the specified {len(exclude)} file(s).")
-        excluding = True
-
-    # Find all files, not including lone directory names
-    for filepath in glob.iglob(input + "**/**", recursive=True):
-        if len(os.path.basename(filepath)) == 28 and filepath not in data_filepaths:
-            if including and os.path.basename(filepath) not in include_only:
-                continue
-            if excluding and os.path.basename(filepath) in exclude:
-                continue
-            data_filepaths.append(filepath)
+    include_set = set(include_only)
+    if len(include_set) > 0:
+        print(f"Will only include the specified {len(include_set)} file(s).")
+    exclude_set = set(exclude)
+    if len(exclude_set) > 0:
+        print(f"Will exclude the specified {len(exclude_set)} file(s).")
+
+    if catalog_path:
+        print(f"Updating dump catalog at {catalog_path}")
+        catalog = update_catalog(input, catalog_path, threads, threads)
+        if ontologies:
+            print(f"Will only include the specified {len(ontologies)} ontologies.")
+        candidate_filepaths = filter_catalog(catalog, ontologies or [])
+    else:
+        candidate_filepaths = find_dump_files(input, threads)
+
+    data_filepaths = []
+    for filepath in candidate_filepaths:
+        filename = os.path.basename(filepath)
+        if len(include_set) > 0 and filename not in include_set:
+            continue
+        if filename in exclude_set:
+            continue
+        data_filepaths.append(filepath)
 
     if len(data_filepaths) > 0:
         print(f"{len(data_filepaths)} files found.")
@@ -76,6 +130,19 @@ def do_transforms(
     get_bioportal_metadata: bool,
     ncbo_key: str,
     write_curies: bool,
+    workers: int = 1,
+    memory_budget: int = 0,
+    cache_dir: str = "",
+    compression: str = "",
+    compress_threads: int = 1,
+    native_ontologies: Optional[list] = None,
+    metadata_cache: str = "",
+    metadata_snapshot: str = "",
+    trace_path: str = "",
+    kgx_validate_params: Optional[dict] = None,
+    status_path: str = "onto_status.yaml",
+    shard: Optional[tuple] = None,
+    cost_history: str = "",
 ) -> dict:
     """
     Do all the transformation operations.
@@ -87,6 +154,8 @@ def do_transforms(
     to tsv node/edgelists.
     Parses header for each to get
     metadata.
+    If workers is more than 1, each file
+    is transformed in its own worker process.
     :param paths: list of file paths as strings
     :param kgx_validate: bool
     :param robot_validate: bool
@@ -94,6 +163,39 @@ def do_transforms(
     :param get_bioportal_metadata: bool
     :param ncbo_key: str
     :param write_curies: bool
+    :param workers: int, number of parallel worker processes
+    :param memory_budget: int, total MB available to concurrent
+    ROBOT heaps, or 0 to use the default heap for every ontology
+    :param cache_dir: str, path to a cache of transform outputs,
+    to reuse for dump files that haven't changed,
+    or empty string to not use a cache
+    :param compression: str, compression type for outputs
+    (gzip or zstd), or empty string to not compress them
+    :param compress_threads: int, number of threads to
+    compress each output file with
+    :param native_ontologies: list of ontology acronyms to
+    transform directly from the dump file, without ROBOT,
+    or ["all"] to transform every ontology this way
+    :param metadata_cache: str, path to cache BioPortal
+    API responses in, or empty string to not cache them
+    :param metadata_snapshot: str, path to a snapshot of
+    BioPortal records to read metadata from instead of the API,
+    or empty string to use the API
+    :param trace_path: str, path to write a JSONL trace of
+    the time and resources used by each stage to,
+    or empty string to not write one
+    :param kgx_validate_params: dict with keys batch_rows,
+    workers and sample_fraction, to run KGX validation in
+    batches as with kgx_validate_transform,
+    or None to validate each graph at once
+    :param status_path: str, path to write transform statistics to
+    :param shard: tuple of (index, count) if paths are only
+    one shard of a run, recorded with the statistics so
+    shards can be merged, or None for a whole run
+    :param cost_history: str, path to the costs of earlier
+    transforms, used to start the longest first and updated
+    with the costs of this run (in the shard's own file, if a shard),
+    or empty string to start the largest files first and not record costs
     :return: dict of transform success/failure,
             with ontology names as keys,
             bools for values with success as True
@@ -108,306 +210,850 @@ def do_transforms(
     robot_env = robot_params[1]
     print(f"ROBOT evironment variables: {robot_env['ROBOT_JAVA_ARGS']}")
 
+    # Anything that changes the outputs for the same input
+    # is part of the cache key
+    cache_params = {}
+    if cache_dir:
+        print(f"Using transform cache at {cache_dir}")
+        cache_params = get_tool_versions(robot_path)
+        cache_params.update(
+            {
+                "kgx_validate": kgx_validate,
+                "kgx_validate_sample": (kgx_validate_params or {}).get(
+                    "sample_fraction", 1.0
+                ),
+                "robot_validate": robot_validate,
+                "get_bioportal_metadata": get_bioportal_metadata,
+                "write_curies": write_curies,
+                "compression": compression,
+            }
+        )
+
+    if compression:
+        print(f"Outputs will be compressed with {compression}.")
+
+    if not native_ontologies:
+        native_ontologies = []
+    elif "all" in native_ontologies:
+        print("All ontologies will be transformed without ROBOT.")
+    else:
+        print(
+            f"{len(native_ontologies)} ontologies will be transformed without ROBOT."
+        )
+
+    # Start a new trace for each run, as with the status file
+    if trace_path:
+        print(f"Writing stage trace to {trace_path}")
+        open(trace_path, "w").close()
+
+    # Retrieve all metadata up front, concurrently,
+    # rather than one ontology at a time during transforms
+    onto_metadata = {}  # type: Dict[str, dict]
+    if get_bioportal_metadata:
+        ontoids = []
+        for filepath in paths:
+            metadata_split = parse_header(filepath)
+            if metadata_split:
+                ontoids.append(metadata_split[1])
+        tracer = Tracer(trace_path, "")
+        with tracer.span("metadata_retrieval"):
+            if metadata_snapshot:
+                print("Reading BioPortal metadata from snapshot...")
+                onto_metadata = snapshot_metadata(
+                    read_metadata_snapshot(metadata_snapshot), ontoids
+                )
+            else:
+                print("Retrieving BioPortal metadata...")
+                if metadata_cache:
+                    print(f"Using metadata cache at {metadata_cache}")
+                client = MetadataClient(ncbo_key, cache_dir=metadata_cache)
+                try:
+                    onto_metadata = client.get_all_metadata(ontoids)
+                finally:
+                    client.close()
+
+    print("Transforming all...")
+
+    transform_args = (
+        kgx_validate,
+        robot_validate,
+        pandas_validate,
+        get_bioportal_metadata,
+        ncbo_key,
+        write_curies,
+        robot_path,
+        cache_dir,
+        cache_params,
+        compression,
+        compress_threads,
+        native_ontologies,
+        onto_metadata,
+        trace_path,
+        kgx_validate_params or {},
+    )
+
+    if memory_budget > 0:
+        print(f"ROBOT heaps will be sized to fit within {memory_budget} MB.")
+
+    # Start the longest transforms first, as predicted from
+    # earlier runs or from file sizes, so a large ontology
+    # doesn't start last and stretch the whole run
+    history = read_cost_history(cost_history) if cost_history else {}
+    plan = plan_transforms(paths, history, workers, memory_budget)
+    run_paths = [job["path"] for job in plan["jobs"]]
+    print(
+        f"Predicted run time: {plan['total_seconds'] / 60:.1f} minutes "
+        f"({len(history)} ontologies with cost history)."
+    )
+
+    if workers > 1:
+        print(f"Using {workers} worker processes.")
+        results = transform_in_pool(
+            run_paths, transform_args, robot_env, workers, memory_budget
+        )
+    else:
+        results = []
+        for filepath in run_paths:
+            job_env = robot_env_for(filepath, robot_env, memory_budget)
+            results.append(transform_ontology(filepath, *transform_args, job_env))
+    results_by_path = dict(zip(run_paths, results))
+    results = [results_by_path[filepath] for filepath in paths]
+
+    if cost_history:
+        recorded = update_cost_history(cost_history, paths, results, shard)
+        print(f"Recorded costs for {recorded} transforms in {cost_history}")
+
+    # Merge per-ontology results in input order,
+    # so the status file is the same regardless of worker count
     txs_complete = {}
     txs_invalid = []
-
     tx_results = []  # A list of dicts
+    for result in results:
+        txs_complete.update(result["txs_complete"])
+        txs_invalid.extend(result["txs_invalid"])
+        if result["tx_result"]:
+            tx_results.append(result["tx_result"])
 
-    print("Transforming all...")
+    # Notify about any invalid transforms (i.e., completed but broken somehow)
+    if len(txs_invalid) > 0:
+        print(f"The following transforms may have issues:{txs_invalid}")
+
+    make_transform_stats(tx_results, status_path, shard)
+
+    # TODO: clean up all remaining placeholders
+    return txs_complete
+
+
+def transform_in_pool(
+    paths: list,
+    transform_args: tuple,
+    robot_env: dict,
+    workers: int,
+    memory_budget: int = 0,
+) -> list:
+    """
+    Run transform_ontology on each path in a pool of worker processes.
+
+    Each ontology is handled by a separate process.
+    If memory_budget is set, each ROBOT heap is sized
+    for its input file and a new ontology is only started
+    while the heaps of all running ontologies fit within
+    the budget. Files are started in the order given,
+    so a large ontology waits for memory to free up
+    rather than being passed over by smaller ones.
+    If a worker dies (e.g., killed for running out of memory),
+    the pool is restarted and the affected ontologies are
+    tried once more before being recorded as failed.
+    :param paths: list of file paths as strings
+    :param transform_args: tuple of args for transform_ontology,
+    following the file path and preceding the ROBOT environment
+    :param robot_env: ROBOT environment parameters
+    :param workers: int, number of worker processes
+    :param memory_budget: int, total MB available to ROBOT heaps,
+    or 0 to use the default heap for every ontology
+    :return: list of result dicts, in the same order as paths
+    """
+    results = {}  # type: Dict[str, dict]
+    attempts = {filepath: 0 for filepath in paths}
+    job_envs = {
+        filepath: robot_env_for(filepath, robot_env, memory_budget)
+        for filepath in paths
+    }
+    heaps = {filepath: get_robot_heap(job_envs[filepath]) for filepath in paths}
+
+    pending = deque(paths)
+    running = {}  # type: Dict[Future, str]
+    reserved = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            # Start as many ontologies as the workers and budget allow.
+            # Something must always be running, so an ontology
+            # larger than the whole budget still gets to run alone.
+            while len(pending) > 0 and len(running) < workers:
+                heap = heaps[pending[0]]
+                if len(running) > 0 and reserved + heap > memory_budget > 0:
+                    break
+                filepath = pending.popleft()
+                future = executor.submit(
+                    transform_ontology, filepath, *transform_args, job_envs[filepath]
+                )
+                running[future] = filepath
+                reserved = reserved + heap
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            # If the pool broke, all running ontologies were lost with it
+            lost = [f for f in done if isinstance(f.exception(), BrokenProcessPool)]
+            if len(lost) > 0:
+                done, _ = wait(running)
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+
+            retry = []
+            for future in done:
+                filepath = running.pop(future)
+                reserved = reserved - heaps[filepath]
+                attempts[filepath] = attempts[filepath] + 1
+                try:
+                    results[filepath] = future.result()
+                except BrokenProcessPool as e:
+                    if attempts[filepath] < MAX_WORKER_ATTEMPTS:
+                        print(f"Worker for {filepath} was lost - will retry.")
+                        retry.append(filepath)
+                    else:
+                        print(f"Worker for {filepath} crashed: {e}")
+                        results[filepath] = failed_result(filepath)
+                except Exception as e:
+                    print(f"Encountered error while transforming {filepath}: {e}")
+                    results[filepath] = failed_result(filepath)
+            retry.sort(key=paths.index)
+            pending.extendleft(reversed(retry))
+    finally:
+        executor.shutdown(wait=True)
+
+    return [results[filepath] for filepath in paths]
+
+
+def robot_env_for(filepath: str, robot_env: dict, memory_budget: int) -> dict:
+    """
+    Get the ROBOT environment to use for a single dump file.
+
+    :param filepath: str, path to the dump file
+    :param robot_env: ROBOT environment parameters
+    :param memory_budget: int, total MB available to ROBOT heaps,
+    or 0 to use the default heap
+    :return: dict of ROBOT environment parameters
+    """
+    if memory_budget > 0:
+        heap = estimate_robot_heap(filepath, memory_budget)
+        return set_robot_heap(robot_env, heap)
+    else:
+        return robot_env
 
-    for filepath in paths:
-        print(f"Starting on {filepath}")
+
+def failed_result(filepath: str) -> dict:
+    """
+    Build the result for an ontology whose transform did not finish.
+
+    :param filepath: str, path to the dump file
+    :return: dict in the format returned by transform_ontology
+    """
+    result = {"txs_complete": {}, "txs_invalid": [], "tx_result": None}
+
+    header_md = parse_header(filepath)
+    if header_md:
+        dataname, version = header_md[1], header_md[3]
+        outname = f"{dataname}_{version}"
+        result["txs_complete"][outname] = False
+        result["txs_invalid"].append(outname)
+        result["tx_result"] = {
+            "id": dataname,
+            "status": "FAIL",
+            "nodecount": 0,
+            "edgecount": 0,
+            "fixes": {},
+        }
+
+    return result
+
+
+def transform_ontology(
+    filepath: str,
+    kgx_validate: bool,
+    robot_validate: bool,
+    pandas_validate: bool,
+    get_bioportal_metadata: bool,
+    ncbo_key: str,
+    write_curies: bool,
+    robot_path: str,
+    cache_dir: str,
+    cache_params: dict,
+    compression: str,
+    compress_threads: int,
+    native_ontologies: list,
+    onto_metadata: dict,
+    trace_path: str,
+    kgx_validate_params: dict,
+    robot_env: dict,
+) -> dict:
+    """
+    Do all the transformation operations for a single dump file.
+
+    Safe to run in a separate process, as all results
+    are returned rather than shared.
+    :param filepath: str, path to the dump file
+    :param kgx_validate: bool
+    :param robot_validate: bool
+    :param pandas_validate: bool
+    :param get_bioportal_metadata: bool
+    :param ncbo_key: str
+    :param write_curies: bool
+    :param robot_path: path to ROBOT itself
+    :param cache_dir: str, path to the transform cache,
+    or empty string to not use a cache
+    :param cache_params: dict of tool versions and options,
+    used along with the dump body to look up cached transforms
+    :param compression: str, compression type for outputs
+    (gzip or zstd), or empty string to not compress them
+    :param compress_threads: int, number of threads to
+    compress each output file with
+    :param native_ontologies: list of ontology acronyms to
+    transform without ROBOT, or ["all"]
+    :param onto_metadata: dict of ontology acronyms to
+    BioPortal metadata already retrieved
+    :param trace_path: str, path to the JSONL trace of stages,
+    or empty string to not write one
+    :param kgx_validate_params: dict of options for KGX validation
+    in batches, as for kgx_validate_transform, or empty dict
+    :param robot_env: ROBOT environment parameters
+    :return: dict with keys txs_complete (dict of ontology names to bools),
+            txs_invalid (list of ontology names),
+            tx_result (dict of transform stats, or None),
+            and, once the transform has run, stage_seconds
+            (dict of stage names to wall seconds)
+    """
+    txs_complete = {}  # type: Dict[str, bool]
+    txs_invalid = []  # type: List[str]
+    result = {
+        "txs_complete": txs_complete,
+        "txs_invalid": txs_invalid,
+        "tx_result": None,
+    }
+    nodecount = 0
+    edgecount = 0
+    md_to_add = {}  # type: Dict[str, str]
+    fixes = {}  # type: Dict[str, int]
+
+    print(f"Starting on {filepath}")
+    tracer = Tracer(trace_path, os.path.basename(filepath))
+    with tracer.span("header_parse"):
         with open(filepath) as infile:
             header = (infile.readline()).rstrip()
-            try:  # Throws IndexError if input header is malformed
-                metadata = (header.split(NAMESPACE))[1]
-            except IndexError:
-                print(f"Header of {filepath} looks wrong...will skip.")
-                continue
-            metadata = metadata.lstrip("/")
-            metadata_split = metadata.split("/")
-            if metadata_split[0] == TARGET_TYPE:
-                dataname = metadata_split[1]
-                version = metadata_split[3]
-                outname = f"{dataname}_{version}"
-                outdir = os.path.join(TXDIR, "/".join(metadata_split[0:2]))
-                outpath = os.path.join(outdir, outname)
-                if not os.path.exists(outdir):
-                    os.makedirs(outdir)
-                ok_to_transform = True
-            else:
-                continue
-            # Check if the outdir already contains transforms
-            # or if it contains a logfile - if not,
-            # and the validate flag is True,
-            # then validation is still required
-            have_robot_report = False
-            have_kgx_validation_log = False
-            have_bioportal_metadata = False
-            tx_filecount = 0
-            filelist = os.listdir(outdir)
-            for filename in filelist:
-                if filename.endswith("nodes.tsv") or filename.endswith("edges.tsv"):
-                    tx_filecount = tx_filecount + 1
-                    if ok_to_transform:
-                        print(f"Transform already present for {outname}")
-                        ok_to_transform = False
-                        txs_complete[outname] = True
-                    # Check to see if metadata properties are in the header
-                    if check_header_for_md(os.path.join(outdir, filename)):
-                        print("BioPortal metadata present.")
-                        have_bioportal_metadata = True
-                if filename.endswith(".report"):
-                    print(f"ROBOT report(s) present: {filename}")
-                    have_robot_report = True
-                if filename.endswith(".log"):
-                    print(f"KGX validation log present: {filename}")
-                    have_kgx_validation_log = True
-            if pandas_validate and tx_filecount > 0:
-                print("Validating graph files can be parsed...")
-                if pandas_validate_transform(outdir) == (0, 0):
-                    print(f"Validation did not complete for {outname}.")
-                    txs_invalid.append(outname)
-            if robot_validate and not have_robot_report and tx_filecount > 0:
-                print(f"ROBOT reports not found for {outname} " "- will generate.")
-                get_robot_reports(filepath, outdir, robot_path, robot_env)
-            if kgx_validate and not have_kgx_validation_log and tx_filecount > 0:
-                print(f"KGX validation log not found for {outname} " "- will validate.")
-                kgx_validate_transform(outdir)
-            if get_bioportal_metadata and not have_bioportal_metadata:
-                print(f"BioPortal metadata not found for {outname} " "- will retrieve.")
-                onto_md = bioportal_metadata(dataname, ncbo_key)
-                # If we fail to retrieve metadata, onto_md['name'] == None
-                # Add metadata to existing transforms - just the edges for now
-                # If we don't have transforms yet, metadata will be added below
-                if (
-                    onto_md["name"] != ""
-                ):  # This will be empty string if metadata retrieval failed
-                    for filename in filelist:
-                        if filename.endswith("edges.tsv"):
-                            print(f"Adding metadata to {outname}...")
-                            if manually_add_md(os.path.join(outdir, filename), onto_md):
-                                print("Complete.")
-                            else:
-                                print("Something went wrong during metadata writing.")
-
-            # Need version of file w/o first line or KGX will choke
-            # The file may be empty, but that doesn't mean the
-            # relevant contents aren't somewhere in the data dump
-            # So we write a placeholder if needed
-            with tempfile.NamedTemporaryFile(mode="w", delete=False) as tempout:
-                linecount = 0
-                for line in infile:
-                    tempout.write(line)
-                    linecount = linecount + 1
-                tempname = tempout.name
-
-            if linecount == 0:
-                print(f"File for {outname} is empty! Writing placeholder.")
-                with open(outpath, "w") as outfile:
-                    outfile.write("")
-                    pass
-                txs_complete[outname] = False
-                continue
-
+    try:  # Throws IndexError if input header is malformed
+        metadata = (header.split(NAMESPACE))[1]
+    except IndexError:
+        print(f"Header of {filepath} looks wrong...will skip.")
+        return result
+    metadata = metadata.lstrip("/")
+    metadata_split = metadata.split("/")
+    if metadata_split[0] == TARGET_TYPE:
+        dataname = metadata_split[1]
+        version = metadata_split[3]
+        outname = f"{dataname}_{version}"
+        tracer.ontology = outname
+        outdir = os.path.join(TXDIR, "/".join(metadata_split[0:2]))
+        outpath = os.path.join(outdir, outname)
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+        ok_to_transform = True
+    else:
+        return result
+
+    # Some ontologies may be read directly, without ROBOT
+    use_native = dataname in native_ontologies or "all" in native_ontologies
+
+    # Each stage records when it finishes, so a transform
+    # interrupted by a crash resumes from the first stage that didn't.
+    # Graph files are only trusted if all stages making them finished,
+    # or if they predate state files.
+    state_params = {"compression": compression, "native": use_native}
+    has_state = os.path.exists(get_state_path(outdir, outname))
+    state = read_state(outdir, outname, filepath, state_params)
+    trust_outputs = not has_state or is_stage_done(state, COMPLETE_STAGE)
+
+    # Check if the outdir already contains transforms
+    # or if it contains a logfile - if not,
+    # and the validate flag is True,
+    # then validation is still required
+    have_robot_report = False
+    have_kgx_validation_log = False
+    have_bioportal_metadata = False
+    tx_filecount = 0
+    filelist = os.listdir(outdir)
+    for filename in filelist:
+        if is_graph_file(filename) and trust_outputs:
+            tx_filecount = tx_filecount + 1
             if ok_to_transform:
-                print(f"ROBOT: relax {outname}")
-                relaxed_outpath = os.path.join(outdir, outname + "_relaxed.json")
-                if relax_ontology(robot_path, tempname, relaxed_outpath, robot_env):
-                    txs_complete[outname] = True
-                else:
+                print(f"Transform already present for {outname}")
+                ok_to_transform = False
+                txs_complete[outname] = True
+            # Check to see if metadata properties are in the header
+            if check_header_for_md(os.path.join(outdir, filename)):
+                print("BioPortal metadata present.")
+                have_bioportal_metadata = True
+        if filename.endswith(".report"):
+            print(f"ROBOT report(s) present: {filename}")
+            have_robot_report = True
+        if filename.endswith(".log"):
+            print(f"KGX validation log present: {filename}")
+            have_kgx_validation_log = True
+    if pandas_validate and tx_filecount > 0:
+        print("Validating graph files can be parsed...")
+        with tracer.span("pandas_validation", inputs=[outdir]):
+            if pandas_validate_transform(outdir) == (0, 0):
+                print(f"Validation did not complete for {outname}.")
+                txs_invalid.append(outname)
+    if robot_validate and not have_robot_report and tx_filecount > 0:
+        print(f"ROBOT reports not found for {outname} " "- will generate.")
+        with tracer.span("robot_validation", inputs=[filepath]):
+            get_robot_reports(filepath, outdir, robot_path, robot_env)
+    if kgx_validate and not have_kgx_validation_log and tx_filecount > 0:
+        print(f"KGX validation log not found for {outname} " "- will validate.")
+        with tracer.span("kgx_validation", inputs=[outdir]):
+            kgx_validate_transform(outdir, validate_params=kgx_validate_params)
+    if get_bioportal_metadata and not have_bioportal_metadata:
+        print(f"BioPortal metadata not found for {outname} " "- will retrieve.")
+        if dataname in onto_metadata:
+            onto_md = onto_metadata[dataname]
+        else:
+            onto_md = bioportal_metadata(dataname, ncbo_key)
+        # If we fail to retrieve metadata, onto_md['name'] == None
+        # Metadata is added to the edges along with the
+        # final check of the graph files, below
+        if (
+            onto_md["name"] != ""
+        ):  # This will be empty string if metadata retrieval failed
+            md_to_add = onto_md
+
+    # Need version of file w/o first line or KGX will choke
+    # The file may be empty, but that doesn't mean the
+    # relevant contents aren't somewhere in the data dump
+    # So we write a placeholder if needed
+    header_offset = get_header_offset(filepath)
+    if is_body_empty(filepath, header_offset):
+        print(f"File for {outname} is empty! Writing placeholder.")
+        with open(outpath, "w") as outfile:
+            outfile.write("")
+            pass
+        txs_complete[outname] = False
+        return result
+
+    if ok_to_transform:
+        if state:
+            print(f"Resuming {outname} after {get_last_stage(state) or 'start'}.")
+        else:
+            state = start_state(outdir, outname, filepath, state_params)
+        clear_partial_outputs(outdir, not is_stage_done(state, "transform"))
+
+    # Reuse outputs from a previous transform of the same dump body
+    cache_key = ""
+    from_cache = False
+    if ok_to_transform and cache_dir:
+        print(f"Checking cache for {outname}...")
+        with tracer.span("cache_lookup", inputs=[filepath], outputs=[outdir]):
+            body_digest = get_body_digest(filepath, header_offset, cache_dir)
+            # Outputs also depend on the ontology (e.g., for the
+            # prefixes of its CURIEs) and the metadata added to edges
+            cache_key = get_cache_key(
+                body_digest,
+                {
+                    **cache_params,
+                    "native": use_native,
+                    "ontology": dataname,
+                    "metadata": md_to_add,
+                },
+            )
+            if restore_from_cache(cache_dir, cache_key, outdir, outname):
+                print(f"Restored transform for {outname} from cache.")
+                ok_to_transform = False
+                from_cache = True
+                txs_complete[outname] = True
+                # The final check still runs on restored outputs,
+                # and records itself once it passes
+                for stage in STAGES:
+                    if stage != COMPLETE_STAGE:
+                        mark_stage_done(state, outdir, stage, {"from_cache": True})
+
+    relaxed_outpath = os.path.join(outdir, outname + "_relaxed.json")
+    # ROBOT and KGX only support gzip for the relaxed JSON,
+    # so it's used whenever outputs are compressed.
+    # ROBOT compresses it as it's written.
+    if compression:
+        relaxed_outpath = compressed_path(relaxed_outpath, "gzip")
+
+    relax_done = (
+        ok_to_transform
+        and not use_native
+        and is_stage_done(state, "relax")
+        and os.path.exists(relaxed_outpath)
+    )
+    if relax_done:
+        print(f"ROBOT relax already finished for {outname}.")
+        fixes = get_stage_details(state, "relax").get("fixes", {})
+        txs_complete[outname] = True
+
+    if ok_to_transform and not use_native and not relax_done:
+        print(f"ROBOT: relax {outname}")
+        # Outputs are moved into place once ROBOT succeeds
+        staging_dir = make_staging_dir(outdir)
+        staged_relaxed_path = os.path.join(
+            staging_dir, os.path.basename(relaxed_outpath)
+        )
+
+        # If we need ROBOT reports, get them from the same ROBOT process
+        report_paths = {}
+        if robot_validate:
+            print("Will also generate ROBOT reports.")
+            report_paths = {
+                "measure_path": os.path.join(staging_dir, ROBOT_MEASURE_NAME),
+                "report_path": os.path.join(staging_dir, ROBOT_REPORT_NAME),
+            }
+
+        # Remove triples we know ROBOT will fail on before relaxing,
+        # rather than waiting for it to fail.
+        # ROBOT reads the dump file in place, as its header
+        # is an N-Triples comment, rather than from a copy,
+        # unless a sanitized copy had to be written.
+        with tempfile.TemporaryDirectory() as repair_dir:
+            print(f"Checking {outname} for known problems...")
+            sanitized_path = os.path.join(repair_dir, outname + "_sanitized.nt")
+            with tracer.span("sanitize", inputs=[filepath], outputs=[sanitized_path]):
+                fixes = sanitize_dump(filepath, header_offset, sanitized_path)
+            for fix, fix_count in fixes.items():
+                print(f"Applied fix {fix} to {fix_count} line(s) of {outname}.")
+            if fixes:
+                body = nullcontext(sanitized_path)  # type: ContextManager[str]
+            else:
+                body = dump_body(filepath, header_offset)
+            relax_inputs = [sanitized_path if fixes else filepath]
+            with body as body_path:
+                with tracer.span(
+                    "robot_relax", inputs=relax_inputs, outputs=[staged_relaxed_path]
+                ):
+                    robot_status = robot_chain(
+                        robot_path,
+                        body_path,
+                        robot_env,
+                        staged_relaxed_path,
+                        **report_paths,
+                    )
+                if not robot_status["relax"]:
                     print("Encountered error during " f"robot relax of {outname}.")
 
-                    # We can try to fix it -
-                    # this is usually a null value in a comment.
+                    # We can still try to fix it
+                    # if the problem wasn't one we know about.
                     print("Will attempt to repair file and try again.")
-                    repaired_outpath = remove_comments(tempname, robot_path, robot_env)
-                    if relax_ontology(
-                        robot_path, repaired_outpath, relaxed_outpath, robot_env
+                    with tracer.span(
+                        "robot_repair",
+                        inputs=relax_inputs,
+                        outputs=[staged_relaxed_path],
                     ):
-                        txs_complete[outname] = True
-                    else:
-                        print(
-                            "Encountered unresolvable error during "
-                            f"robot relax of {outname}."
+                        repaired_outpath = remove_comments(
+                            body_path,
+                            robot_path,
+                            robot_env,
+                            os.path.join(repair_dir, outname + "_nocomments.owl"),
                         )
-                        print("Will skip.")
-                        txs_complete[outname] = False
-                        os.remove(tempout.name)
-                        continue
-
-                if robot_validate and txs_complete[outname]:
-                    print("Generating ROBOT reports...")
-                    if not get_robot_reports(filepath, outdir, robot_path, robot_env):
-                        print(f"Could not get ROBOT reports for {outname}.")
-
-                if (
-                    get_bioportal_metadata
-                    and not have_bioportal_metadata
-                    and onto_md["name"]
-                ):
-                    primary_knowledge_source = onto_md["name"]
-                    have_bioportal_metadata = True
-                else:
-                    primary_knowledge_source = "False"
-
-                print(f"KGX transforming {outname}...")
-                do_kgx_tx = True
-                did_repair = False
-                while do_kgx_tx:
-                    try:
-                        # For unknown reasons, this doesn't always
-                        # add knowledge sources.
-                        # So we try to add them afterward, too,
-                        # before validating the KGX output.
-                        kgx.cli.transform(
-                            inputs=[relaxed_outpath],
-                            input_format="obojson",
-                            output=outpath,
-                            output_format="tsv",
-                            stream=True,
-                            knowledge_sources=[
-                                ("aggregator_knowledge_source", BIOPORTAL_SOURCE),
-                                ("primary_knowledge_source", primary_knowledge_source),
-                            ],
-                        )
-                        txs_complete[outname] = True
-                        do_kgx_tx = False
-                    except ValueError as e:
-                        print(
-                            "Encountered error during "
-                            f"KGX transform of {outname}: {e}"
+                        robot_status = robot_chain(
+                            robot_path,
+                            repaired_outpath,
+                            robot_env,
+                            staged_relaxed_path,
+                            **report_paths,
                         )
 
-                        # We can try to fix it
-                        # this is usually a malformed CURIE
-                        # (or something that looks like a CURIE)
-                        if not did_repair:
-                            print("Will attempt to repair and try again.")
-                            repaired_outpath = repair_bad_curie(relaxed_outpath)
-                            os.replace(repaired_outpath, relaxed_outpath)
-                            did_repair = True
-                        else:
-                            print("Could not repair.")
-                            break
-
-                if have_bioportal_metadata:
-                    print(f"Adding metadata to {outname}...")
-                    if manually_add_md(
-                        os.path.join(outdir, outname + "_edges.tsv"), onto_md
-                    ):
-                        print("Complete.")
-                    else:
-                        print("Something went wrong during metadata writing.")
-
-                # Validation
-                if kgx_validate and txs_complete[outname]:
-                    print("Validating graph files with KGX...")
-                    if not kgx_validate_transform(outdir):
-                        print(f"Validation did not complete for {outname}.")
-                        txs_complete[outname] = False
-                        txs_invalid.append(outname)
-
-            # Wrapped normalization steps all go here.
-            # Take the 'write_curies' param
-            # and pass the SSSOM map directory in the former case
-            print("Normalizing graph...")
-
-            if not clean_and_normalize_graph(
-                filepath=outdir,
+        if robot_status["relax"]:
+            commit_outputs(staging_dir, outdir)
+            mark_stage_done(state, outdir, "relax", {"fixes": fixes})
+            txs_complete[outname] = True
+        else:
+            print(
+                "Encountered unresolvable error during "
+                f"robot relax of {outname}."
+            )
+            print("Will skip.")
+            txs_complete[outname] = False
+            return result
+
+        if robot_validate and txs_complete[outname]:
+            if not all(robot_status.values()):
+                print(f"Could not get ROBOT reports for {outname}.")
+
+    if ok_to_transform:
+        if (
+            get_bioportal_metadata
+            and not have_bioportal_metadata
+            and onto_md["name"]
+        ):
+            primary_knowledge_source = onto_md["name"]
+            have_bioportal_metadata = True
+            md_to_add = onto_md
+        else:
+            primary_knowledge_source = "False"
+
+        knowledge_sources = [
+            ("aggregator_knowledge_source", BIOPORTAL_SOURCE),
+            ("primary_knowledge_source", primary_knowledge_source),
+        ]
+
+        if is_stage_done(state, "transform"):
+            print(f"Transform already finished for {outname}.")
+            txs_complete[outname] = True
+        elif use_native:
+            if robot_validate:
+                print(f"Generating ROBOT reports for {outname}...")
+                with tracer.span("robot_validation", inputs=[filepath]):
+                    reports_ok = get_robot_reports(
+                        filepath, outdir, robot_path, robot_env
+                    )
+                if not reports_ok:
+                    print(f"Could not get ROBOT reports for {outname}.")
+
+            print(f"Transforming {outname} without ROBOT...")
+            try:
+                staging_dir = make_staging_dir(outdir)
+                with tracer.span(
+                    "native_transform", inputs=[filepath], outputs=[staging_dir]
+                ):
+                    native_transform(
+                        filepath, os.path.join(staging_dir, outname), knowledge_sources
+                    )
+                commit_outputs(staging_dir, outdir)
+                mark_stage_done(state, outdir, "transform")
+                txs_complete[outname] = True
+            except ValueError as e:
+                print(
+                    "Encountered error during "
+                    f"native transform of {outname}: {e}"
+                )
+                print("Will skip.")
+                txs_complete[outname] = False
+                return result
+        else:
+            # Malformed CURIEs make KGX fail,
+            # so find and repair them before transforming
+            if not is_stage_done(state, "curie_repair"):
+                with tracer.span("curie_repair", inputs=[relaxed_outpath]) as span:
+                    repair_count = repair_bad_curies(relaxed_outpath, compress_threads)
+                    span["repairs"] = repair_count
+                if repair_count > 0:
+                    print(f"Repaired {repair_count} malformed CURIE(s) in {outname}.")
+                mark_stage_done(state, outdir, "curie_repair")
+
+            print(f"KGX transforming {outname}...")
+            try:
+                # For unknown reasons, this doesn't always
+                # add knowledge sources.
+                # So we try to add them afterward, too,
+                # before validating the KGX output.
+                staging_dir = make_staging_dir(outdir)
+                with tracer.span(
+                    "kgx_transform", inputs=[relaxed_outpath], outputs=[staging_dir]
+                ):
+                    kgx.cli.transform(
+                        inputs=[relaxed_outpath],
+                        input_format="obojson",
+                        input_compression="gz" if compression else None,
+                        output=os.path.join(staging_dir, outname),
+                        output_format="tsv",
+                        stream=True,
+                        knowledge_sources=knowledge_sources,
+                    )
+                commit_outputs(staging_dir, outdir)
+                mark_stage_done(state, outdir, "transform")
+                txs_complete[outname] = True
+            except ValueError as e:
+                print(
+                    "Encountered error during "
+                    f"KGX transform of {outname}: {e}"
+                )
+
+    # Wrapped normalization steps all go here.
+    # Take the 'write_curies' param
+    # and pass the SSSOM map directory in the former case
+    # Cached outputs have already been normalized,
+    # as have compressed outputs, which are only compressed
+    # after normalization.
+    # Graph files are normalized as copies, which then replace
+    # the originals, so a crash can't leave them half-normalized.
+    if (
+        not from_cache
+        and not is_stage_done(state, "normalization")
+        and not any(
+            get_compression(graph_filepath)
+            for graph_filepath in get_graph_files(outdir)
+        )
+    ):
+        print("Normalizing graph...")
+        staging_dir = make_staging_dir(outdir)
+        for graph_filepath in get_graph_files(outdir):
+            shutil.copyfile(
+                graph_filepath,
+                os.path.join(staging_dir, os.path.basename(graph_filepath)),
+            )
+        with tracer.span("normalization", inputs=[outdir], outputs=[staging_dir]):
+            normalized = clean_and_normalize_graph(
+                filepath=staging_dir,
                 compressed=False,
                 maps=[],
                 update_categories=write_curies,
                 contexts=["obo", "bioregistry.upper", "bioportal"],
                 namespace_cat_map="namespace_maps.tsv",
                 oak_lookup=False,
-            ):
-                print(f"Normalization did not complete for {outname}.")
-
-            # One last mandatory validation step - can pandas load it?
-            # Also gets node and edge counts in the process.
-            if txs_complete[outname]:
-                print("Validating graph files with pandas...")
-                counts = pandas_validate_transform(outdir)
-                if counts == (0, 0):
-                    print(f"Validation did not complete for {outname}.")
-                    txs_complete[outname] = False
-                    txs_invalid.append(outname)
-                else:
-                    nodecount, edgecount = counts
-
-            # Remove the tempfile
-            os.remove(tempout.name)
-
-            # Update the results dict
-            if outname not in txs_invalid and txs_complete[outname]:
-                status = "OK"
-            else:
-                status = "FAIL"
-            tx_result = {
-                "id": dataname,
-                "status": status,
-                "nodecount": nodecount,
-                "edgecount": edgecount,
-            }
-            tx_results.append(tx_result)
+            )
+        if normalized:
+            commit_outputs(staging_dir, outdir)
+            if state:
+                mark_stage_done(state, outdir, "normalization")
+        else:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            print(f"Normalization did not complete for {outname}.")
+
+    # One last mandatory validation step, in a single pass
+    # over each graph file: add any metadata to the edges,
+    # check rows against the header, and get node and edge counts.
+    # Normalization rewrites the files anyway, so it goes first.
+    file_stats = {}  # type: Dict[str, dict]
+    if txs_complete[outname]:
+        if md_to_add:
+            print(f"Adding metadata to {outname}...")
+        print("Checking graph files...")
+        with tracer.span("graph_check", inputs=[outdir], outputs=[outdir]):
+            file_stats = process_graph_files(
+                outdir, md_to_add, compression, compress_threads
+            )
+        for graph_filepath, stats in file_stats.items():
+            if stats["malformed_rows"] > 0:
+                print(
+                    f"Graph file {graph_filepath} has {stats['malformed_rows']} "
+                    "malformed row(s), first on line "
+                    f"{stats['first_malformed_line']}."
+                )
+            if is_node_file(graph_filepath):
+                nodecount = nodecount + stats["rows"]
+            elif is_edge_file(graph_filepath):
+                edgecount = edgecount + stats["rows"]
+        if len(file_stats) == 0:
+            print(f"Could not find graph files in {outdir}.")
+        if len(file_stats) == 0 or any(
+            stats["malformed_rows"] > 0 for stats in file_stats.values()
+        ):
+            print(f"Validation did not complete for {outname}.")
+            txs_complete[outname] = False
+            txs_invalid.append(outname)
+        elif state and not is_stage_done(state, COMPLETE_STAGE):
+            mark_stage_done(
+                state,
+                outdir,
+                COMPLETE_STAGE,
+                {"nodecount": nodecount, "edgecount": edgecount},
+            )
 
-    # Notify about any invalid transforms (i.e., completed but broken somehow)
-    if len(txs_invalid) > 0:
-        print(f"The following transforms may have issues:{txs_invalid}")
+    # Validate new transforms with KGX, and restored ones
+    # if they were cached without a validation log
+    if from_cache:
+        need_kgx_validation = not os.path.exists(
+            os.path.join(outdir, f"kgx_validate_{outname}.log")
+        )
+    else:
+        need_kgx_validation = ok_to_transform
+    if kgx_validate and need_kgx_validation and txs_complete[outname]:
+        print("Validating graph files with KGX...")
+        with tracer.span("kgx_validation", inputs=[outdir]):
+            kgx_valid = kgx_validate_transform(
+                outdir, file_stats, kgx_validate_params
+            )
+        if not kgx_valid:
+            print(f"Validation did not complete for {outname}.")
+            txs_complete[outname] = False
+            txs_invalid.append(outname)
+
+    # Update the results dict
+    if outname not in txs_invalid and txs_complete[outname]:
+        status = "OK"
+    else:
+        status = "FAIL"
+    tx_result = {
+        "id": dataname,
+        "status": status,
+        "nodecount": nodecount,
+        "edgecount": edgecount,
+        "fixes": fixes,
+    }
+    result["tx_result"] = tx_result
 
-    make_transform_stats(tx_results, "onto_status.yaml")
+    if cache_key and not from_cache and status == "OK":
+        with tracer.span("cache_store", inputs=[outdir]):
+            stored = store_in_cache(cache_dir, cache_key, outdir, outname, cache_params)
+        if stored:
+            print(f"Cached transform for {outname}.")
 
-    # TODO: clean up all remaining placeholders
-    return txs_complete
+    # Summarize time and resources last, to include everything
+    tx_result.update(tracer.summary())
+    result["stage_seconds"] = tracer.stage_seconds()
+
+    return result
 
 
 def pandas_validate_transform(in_path: str) -> tuple:
     """
-    Validate transforms by parsing them with pandas.
-
-    Will raise a caught error
-    if there's an issue with format rendering
-    the graph files un-parsible.
+    Validate transforms by checking they can be parsed as TSV.
+
+    Named for the pandas parser this used to use;
+    the files are now checked directly, in large blocks,
+    with nodes and edges checked concurrently.
+    Every row must have as many fields as the header.
+    The location of the first malformed row in each
+    file is reported, by line and byte offset.
     Also gets node and edge counts.
     :param in_path: str, path to directory
     :return: tuple of (nodecount, edgecount).
     If file is invalid, both values are zero.
     """
-    tx_filepaths = []
     nodecount = 0
     edgecount = 0
+    valid = True
 
-    for filepath in os.listdir(in_path):
-        if filepath.endswith("nodes.tsv") or filepath.endswith("edges.tsv"):
-            tx_filepaths.append(os.path.join(in_path, filepath))
+    all_stats = validate_graph_files(in_path)
 
-    if len(tx_filepaths) == 0:
+    if len(all_stats) == 0:
         print(f"Could not find graph files in {in_path}.")
         return (0, 0)
-    try:
-        linecount = 0
-        for filepath in tx_filepaths:
-            file_iter = pd.read_csv(
-                filepath,
-                dtype=str,
-                chunksize=10000,
-                low_memory=False,
-                keep_default_na=False,
-                quoting=3,
-                lineterminator="\n",
-                delimiter="\t",
+
+    for filepath, stats in all_stats.items():
+        if stats["columns"] == 0:
+            print(f"Encountered parsing error in {filepath}: no header.")
+            valid = False
+        elif stats["malformed_rows"] > 0:
+            print(
+                f"Encountered parsing error in {filepath}: "
+                f"{stats['malformed_rows']} row(s) without "
+                f"{stats['columns']} fields, first on line "
+                f"{stats['first_malformed_line']} "
+                f"(byte {stats['first_malformed_offset']})."
             )
-            for chunk in file_iter:
-                linecount = linecount + len(chunk)
-            if filepath.endswith("edges.tsv"):
-                edgecount = linecount
-            if filepath.endswith("nodes.tsv"):
-                nodecount = linecount
+            valid = False
+        else:
             print(f"Graph file {filepath} parses OK.")
+        if is_edge_file(filepath):
+            edgecount = edgecount + stats["rows"]
+        elif is_node_file(filepath):
+            nodecount = nodecount + stats["rows"]
 
-    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
-        print(f"Encountered parsing error in {filepath}: {e}")
+    if not valid:
+        return (0, 0)
 
     counts = (nodecount, edgecount)
 
@@ -418,12 +1064,14 @@ def get_robot_reports(
     filepath: str, outpath_dir: str, robot_path: str, robot_env: dict
 ) -> bool:
     """
-    Run both the ROBOT 'report' and 'measure' on an obojson.
+    Run both the ROBOT 'report' and 'measure' on an ontology.
 
     Saves both to the same directory as
     the input ontology.
-    Runs a convert command first to ensure
-    ROBOT can parse the input.
+    Both commands run in one ROBOT process,
+    so the ontology is only parsed once.
+    Both describe the body of the original dump file,
+    as when run along with relax.
     Returns True if successful,
     otherwise False - though any errors detected
     in the target ontology by the report command
@@ -434,48 +1082,63 @@ def get_robot_reports(
     :param robot_env: ROBOT environment parameters
     :return: True if success
     """
-    success = True
+    report_paths = {
+        "measure_path": os.path.join(outpath_dir, ROBOT_MEASURE_NAME),
+        "report_path": os.path.join(outpath_dir, ROBOT_REPORT_NAME),
+    }
 
-    report_path = os.path.join(outpath_dir, "robot.report")
-    measure_path = os.path.join(outpath_dir, "robot.measure")
+    with dump_body(filepath, get_header_offset(filepath)) as body_path:
+        robot_status = robot_chain(robot_path, body_path, robot_env, **report_paths)
 
-    # Will state 'Report failed!' if any errors present
-    if not robot_report(
-        robot_path=robot_path,
-        input_path=filepath,
-        output_path=report_path,
-        robot_env=robot_env,
-    ):
-        success = False
+    return all(robot_status.values())
 
-    if not robot_measure(
-        robot_path=robot_path,
-        input_path=filepath,
-        output_path=measure_path,
-        robot_env=robot_env,
-    ):
-        success = False
 
-    return success
-
-
-def kgx_validate_transform(in_path: str) -> bool:
+def kgx_validate_transform(
+    in_path: str,
+    file_stats: Optional[dict] = None,
+    validate_params: Optional[dict] = None,
+) -> bool:
     """
     Run KGX validation on a single set of node/edge files.
 
     Takes a input directory containing a transformed
     ontology. Writes log to that directory.
+    By default the whole graph is validated at once.
+    For large graphs, rows may instead be validated in
+    batches, in parallel, with memory use bounded by the
+    batch size, or only a random sample of rows may be validated.
+    Either way, the log has the same form.
     :param in_path: str, path to directory
+    :param file_stats: dict of file paths to stats,
+    as returned by process_graph_files. If provided,
+    these are used to skip short files without reading them again.
+    :param validate_params: dict with keys batch_rows (int,
+    rows per batch, or 0 to validate the whole graph at once),
+    workers (int, processes to validate batches with), and
+    sample_fraction (float, fraction of rows to validate,
+    which implies batches). Any key may be left out.
     :return: True if complete, False otherwise
     """
+    if not validate_params:
+        validate_params = {}
+    batch_rows = validate_params.get("batch_rows", 0)
+    sample_fraction = validate_params.get("sample_fraction", 1.0)
+    if sample_fraction < 1.0 and batch_rows == 0:
+        batch_rows = BATCH_ROWS
+
     tx_filepaths = []
 
     # Find node/edgefiles
     # and check if they are empty
     for filepath in os.listdir(in_path):
-        if filepath[-3:] == "tsv":
-            if not is_file_too_short(os.path.join(in_path, filepath)):
-                tx_filepaths.append(os.path.join(in_path, filepath))
+        if is_graph_file(filepath):
+            tx_filepath = os.path.join(in_path, filepath)
+            if file_stats and tx_filepath in file_stats:
+                too_short = file_stats[tx_filepath]["too_short"]
+            else:
+                too_short = is_file_too_short(tx_filepath)
+            if not too_short:
+                tx_filepaths.append(tx_filepath)
 
     if len(tx_filepaths) == 0:
         print(f"All transforms in {in_path} are blank or very short.")
@@ -484,28 +1147,44 @@ def kgx_validate_transform(in_path: str) -> bool:
     tx_filename = os.path.basename(tx_filepaths[0])
     tx_name = "_".join(tx_filename.split("_", 2)[:2])
     log_path = os.path.join(in_path, f"kgx_validate_{tx_name}.log")
+    # The log is only moved into place once complete,
+    # so a crash doesn't leave a partial log taken as finished
+    tmp_log_path = log_path + ".tmp"
 
-    # kgx validate output isn't working for some reason
-    # so there are some workarounds here
-    with open(log_path, "w") as log_file:
-        try:
-            json_dump(
-                (
-                    kgx.cli.validate(
-                        inputs=tx_filepaths,
-                        input_format="tsv",
-                        input_compression=None,
-                        output=None,
-                    )
-                ),
-                log_file,
-                indent=4,
+    try:
+        if batch_rows > 0:
+            sharded_validate(
+                tx_filepaths,
+                tmp_log_path,
+                batch_rows,
+                validate_params.get("workers", 1),
+                sample_fraction,
             )
-            print(f"Wrote validation errors to {log_path}")
-            return True
-        except TypeError as e:
-            print(f"Error while validating {tx_name}: {e}")
-            return False
+        else:
+            # kgx validate output isn't working for some reason
+            # so there are some workarounds here
+            with open(tmp_log_path, "w") as log_file:
+                json_dump(
+                    (
+                        kgx.cli.validate(
+                            inputs=tx_filepaths,
+                            input_format="tsv",
+                            input_compression=None,
+                            output=None,
+                        )
+                    ),
+                    log_file,
+                    indent=4,
+                )
+    except TypeError as e:
+        print(f"Error while validating {tx_name}: {e}")
+        if os.path.exists(tmp_log_path):
+            os.remove(tmp_log_path)
+        return False
+
+    os.replace(tmp_log_path, log_path)
+    print(f"Wrote validation errors to {log_path}")
+    return True
 
 
 def is_file_too_short(filepath: str) -> bool:
@@ -518,7 +1197,7 @@ def is_file_too_short(filepath: str) -> bool:
     :param filepath: str, path to file
     :return: bool, True if file is blank or too short
     """
-    with open(filepath, "r") as infile:
+    with open_file(filepath, "r") as infile:
         for count, _ in enumerate(infile):
             count = count + 1
 
@@ -528,30 +1207,9 @@ def is_file_too_short(filepath: str) -> bool:
         return True
 
 
-def repair_bad_curie(filepath: str) -> str:
-    """
-    Remove malformed CURIE prefixes.
-
-    Given the path to an obojson with a
-    CURIE causing KGX to fail transforms,
-    remove the offending prefix.
-    Save a new file and return.
-    :param filepath: str, path to file
-    :return: path to repaired file
-    """
-    repaired_filepath = filepath + ".repaired"
-
-    with open(filepath, "r") as infile:
-        with open(repaired_filepath, "w") as outfile:
-            for line in infile:
-                for pattern in ["file:C:", "file:"]:
-                    line = re.sub(pattern, "OBO:", line)
-                outfile.write(line)
-
-    return repaired_filepath
-
-
-def remove_comments(filepath: str, robot_path: str, robot_env: dict) -> str:
+def remove_comments(
+    filepath: str, robot_path: str, robot_env: dict, repaired_filepath: str = ""
+) -> str:
     """
     Remove comments.
 
@@ -567,9 +1225,12 @@ def remove_comments(filepath: str, robot_path: str, robot_env: dict) -> str:
     :param filepath: str, path to file
     :param robot_path: path to ROBOT itself
     :param robot_env: ROBOT environment parameters
+    :param repaired_filepath: path to write the repaired file to.
+    If not provided, it is written next to the input file.
     :return: path to repaired file
     """
-    repaired_filepath = (os.path.splitext(filepath)[0]) + "nocomments.owl"
+    if not repaired_filepath:
+        repaired_filepath = (os.path.splitext(filepath)[0]) + "nocomments.owl"
 
     comment_term = "rdfs:comment"
 
@@ -0,0 +1,571 @@
+"""Functions for collecting statistics on transformed ontologies in one pass."""
+
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from bioportal_to_kgx.cache_utils import write_json_atomic
+from bioportal_to_kgx.checkpoint import STATE_SUFFIX
+from bioportal_to_kgx.compress_utils import open_file, strip_compression
+from bioportal_to_kgx.graph_utils import is_edge_file, is_node_file
+
+# Size of blocks to read when scanning files
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Biolink classes and predicates reported for each ontology
+NODE_TYPES = [
+    "biolink:NamedThing",
+    "biolink:OntologyClass",
+    "biolink:BiologicalProcess",
+    "biolink:Cell",
+    "biolink:CellularComponent",
+    "biolink:ChemicalSubstance",
+    "biolink:Disease",
+    "biolink:Event",
+    "biolink:ExposureEvent",
+    "biolink:Gene",
+    "biolink:MolecularActivity",
+    "biolink:OrganismalEntity",
+    "biolink:Pathway",
+    "biolink:PhenotypicFeature",
+    "biolink:Protein",
+    "biolink:SequenceFeature",
+    "biolink:SexQualifier",
+    "biolink:Source",
+    "biolink:TaxonomicRank",
+    "biolink:Unit",
+    "biolink:AnatomicalEntity",
+]
+EDGE_TYPES = [
+    "biolink:related_to",
+    "biolink:subclass_of",
+    "biolink:part_of",
+    "biolink:inverseOf",
+    "biolink:subPropertyOf",
+    "biolink:has_part",
+    "biolink:has_participant",
+    "biolink:has_unit",
+    "biolink:preceded_by",
+    "biolink:has_attribute",
+    "biolink:positively_regulates",
+    "biolink:negatively_regulates",
+]
+
+# KGX validation error types, as they appear in logs
+ERROR_TYPES = [
+    "MISSING_NODE_PROPERTY",
+    "MISSING_EDGE_PROPERTY",
+    "INVALID_NODE_PROPERTY",
+    "INVALID_EDGE_PROPERTY",
+    "INVALID_NODE_PROPERTY_VALUE_TYPE",
+    "INVALID_NODE_PROPERTY_VALUE",
+    "INVALID_EDGE_PROPERTY_VALUE_TYPE",
+    "INVALID_EDGE_PROPERTY_VALUE",
+    "MISSING_CATEGORY",
+    "INVALID_CATEGORY",
+    "Category 'OntologyClass' is a mixin in the Biolink Model",
+    "MISSING_EDGE_PREDICATE",
+    "INVALID_EDGE_PREDICATE",
+    "MISSING_NODE_CURIE_PREFIX",
+    "DUPLICATE_NODE",
+    "MISSING_NODE",
+    "INVALID_EDGE_TRIPLE",
+    "VALIDATION_SYSTEM_ERROR",
+]
+
+# UMLS semantic types, each a prefix and a four-character code
+STY_PREFIX = b"http://purl.bioontology.org/ontology/STY/"
+STY_PATTERN = re.compile(re.escape(STY_PREFIX) + b".{4}")
+
+# Columns to count values of, with their positions if not named in the header
+TYPE_COLUMNS = {"nodes": ("category", 1), "edges": ("predicate", 2)}
+
+# Delimiter for multivalued fields, e.g., several categories
+MULTIVALUE_DELIMITER = "|"
+
+LOG_PREFIX = "kgx_validate_"
+LOG_SUFFIX = ".log"
+
+
+def is_validation_log(filepath: str) -> bool:
+    """
+    Check if a file is a KGX validation log.
+
+    :param filepath: str, path to file
+    :return: bool, True if file is named like a KGX validation log
+    """
+    filename = os.path.basename(filepath)
+
+    return filename.startswith(LOG_PREFIX) and filename.endswith(LOG_SUFFIX)
+
+
+def find_stats_files(tx_path: str) -> list:
+    """
+    Find node, edge and KGX log files in a tree of transforms.
+
+    :param tx_path: str, path to the transforms, usually
+    transformed/ontologies, with one directory per ontology
+    :return: sorted list of file paths as strings
+    """
+    filepaths = []
+
+    for dirpath, _, filenames in os.walk(tx_path):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            if (
+                is_node_file(filepath)
+                or is_edge_file(filepath)
+                or is_validation_log(filepath)
+            ):
+                filepaths.append(filepath)
+
+    return sorted(filepaths)
+
+
+def get_file_kind(filepath: str) -> str:
+    """
+    Get the kind of a file collected by find_stats_files.
+
+    :param filepath: str, path to file
+    :return: str, one of nodes, edges or log
+    """
+    if is_node_file(filepath):
+        return "nodes"
+    if is_edge_file(filepath):
+        return "edges"
+
+    return "log"
+
+
+def read_lines(filepath: str):
+    """
+    Read a file, compressed or not, in blocks of whole lines.
+
+    :param filepath: str, path to file
+    :return: iterator of bytes, each ending with a newline,
+    except possibly the last
+    """
+    with open_file(filepath, "rb") as infile:
+        remainder = b""
+        while True:
+            block = infile.read(BLOCK_SIZE)
+            if not block:
+                if remainder:
+                    yield remainder
+                return
+            data = remainder + block
+            end = data.rfind(b"\n") + 1
+            data, remainder = data[:end], data[end:]
+            if data:
+                yield data
+
+
+def get_graph_file_stats(filepath: str, kind: str) -> dict:
+    """
+    Count rows, types and UMLS semantic types in a node or edge file.
+
+    Types are the values of the category column in node files
+    and the predicate column in edge files, with multivalued
+    fields split so each value is counted.
+    :param filepath: str, path to the node or edge file
+    :param kind: str, nodes or edges
+    :return: dict with keys lines (int, newlines, as wc -l would count),
+    rows (int, rows after the header, ignoring blank lines),
+    types (dict of values to counts), and
+    sty (dict of UMLS semantic type IRIs to counts)
+    """
+    column_name, column = TYPE_COLUMNS[kind]
+    values = Counter()  # type: Counter
+    sty = Counter()  # type: Counter
+    lines = 0
+    rows = 0
+    header = True
+
+    for data in read_lines(filepath):
+        lines = lines + data.count(b"\n")
+        if STY_PREFIX in data:
+            sty.update(STY_PATTERN.findall(data))
+        for line in data.split(b"\n"):
+            line = line.rstrip(b"\r")
+            if header:
+                header = False
+                headings = line.split(b"\t")
+                if column_name.encode() in headings:
+                    column = headings.index(column_name.encode())
+                continue
+            if not line:
+                continue
+            rows = rows + 1
+            fields = line.split(b"\t", column + 1)
+            if len(fields) > column:
+                values[fields[column]] += 1
+
+    types = Counter()  # type: Counter
+    for value, count in values.items():
+        for part in value.decode("utf-8", "replace").split(MULTIVALUE_DELIMITER):
+            if part:
+                types[part] += count
+
+    return {
+        "lines": lines,
+        "rows": rows,
+        "types": dict(types),
+        "sty": {iri.decode("utf-8", "replace"): count for iri, count in sty.items()},
+    }
+
+
+def get_log_stats(filepath: str) -> dict:
+    """
+    Count KGX validation errors of each type in a log.
+
+    :param filepath: str, path to the KGX validation log
+    :return: dict with keys lines (int) and errors
+    (dict of error types to counts, only for those found)
+    """
+    errors = Counter()  # type: Counter
+    lines = 0
+    patterns = [(error, error.encode()) for error in ERROR_TYPES]
+
+    for data in read_lines(filepath):
+        lines = lines + data.count(b"\n")
+        for error, pattern in patterns:
+            count = data.count(pattern)
+            if count > 0:
+                errors[error] += count
+
+    return {"lines": lines, "errors": dict(errors)}
+
+
+def get_file_stats(filepath: str) -> dict:
+    """
+    Collect statistics for one file, reading it once.
+
+    :param filepath: str, path to a node, edge or KGX log file
+    :return: dict of stats, with kind (nodes, edges or log)
+    and the fields from get_graph_file_stats or get_log_stats
+    """
+    kind = get_file_kind(filepath)
+    if kind == "log":
+        stats = get_log_stats(filepath)
+    else:
+        stats = get_graph_file_stats(filepath, kind)
+    stats["kind"] = kind
+
+    return stats
+
+
+def read_stats_cache(cache_path: str) -> dict:
+    """
+    Read cached file statistics from disk.
+
+    :param cache_path: str, path to the cache JSON
+    :return: dict of file paths to cache entries, each with
+    size, mtime_ns and stats, empty if there is no usable cache
+    """
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+
+    try:
+        with open(cache_path) as cache_file:
+            return json.load(cache_file)
+    except ValueError:
+        print(f"Could not read stats cache at {cache_path} - will rebuild.")
+        return {}
+
+
+def update_file_stats(tx_path: str, cache_path: str = "", workers: int = 1) -> dict:
+    """
+    Collect statistics for all files in a tree of transforms.
+
+    Files already in the cache with the same size and
+    modification time are not read again.
+    New and changed files are read in parallel processes.
+    Files no longer in the tree are dropped from the cache.
+    :param tx_path: str, path to the transforms
+    :param cache_path: str, path to the cache JSON,
+    or empty string to read every file
+    :param workers: int, number of processes to read files with
+    :return: dict of file paths to stats, as returned by get_file_stats
+    """
+    old_cache = read_stats_cache(cache_path)
+    cache = {}
+    to_read = []
+
+    for filepath in find_stats_files(tx_path):
+        stat = os.stat(filepath)
+        entry = old_cache.get(filepath)
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            cache[filepath] = entry
+            continue
+        cache[filepath] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        to_read.append(filepath)
+
+    print(
+        f"Stats: {len(cache) - len(to_read)} file(s) unchanged, "
+        f"{len(to_read)} to read."
+    )
+
+    if workers > 1 and len(to_read) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            all_stats = list(executor.map(get_file_stats, to_read))
+    else:
+        all_stats = [get_file_stats(filepath) for filepath in to_read]
+    for filepath, stats in zip(to_read, all_stats):
+        cache[filepath]["stats"] = stats
+
+    if cache_path:
+        write_json_atomic(cache_path, cache)
+
+    return {filepath: entry["stats"] for filepath, entry in cache.items()}
+
+
+def get_ontology_dirs(tx_path: str) -> list:
+    """
+    List the directory for each ontology in a tree of transforms.
+
+    :param tx_path: str, path to the transforms
+    :return: sorted list of directory paths
+    """
+    if not os.path.isdir(tx_path):
+        return []
+
+    return sorted(
+        os.path.join(tx_path, name)
+        for name in os.listdir(tx_path)
+        if os.path.isdir(os.path.join(tx_path, name))
+    )
+
+
+def get_ontology_name(tx_path: str, filepath: str) -> str:
+    """
+    Get the name of the ontology directory a file is in.
+
+    :param tx_path: str, path to the transforms
+    :param filepath: str, path to a file within tx_path
+    :return: str, name of the top directory below tx_path
+    """
+    return os.path.relpath(filepath, tx_path).split(os.sep)[0]
+
+
+def biolink_report(tx_path: str, file_stats: dict) -> list:
+    """
+    Report node and edge counts for each ontology, in total and by type.
+
+    One row per ontology, with counts for each
+    type in NODE_TYPES and EDGE_TYPES.
+    :param tx_path: str, path to the transforms
+    :param file_stats: dict of file paths to stats
+    :return: list of TSV lines, starting with a header
+    """
+    headings = ["Ontology", "NodeCount", "EdgeCount"] + NODE_TYPES + EDGE_TYPES
+    lines = ["\t".join(headings)]
+
+    rows = Counter()  # type: Counter
+    types = {}  # type: Dict[tuple, Counter]
+    for filepath, stats in file_stats.items():
+        if stats["kind"] == "log":
+            continue
+        key = (get_ontology_name(tx_path, filepath), stats["kind"])
+        rows[key] += stats["rows"]
+        types.setdefault(key, Counter()).update(stats["types"])
+
+    for ontology_dir in get_ontology_dirs(tx_path):
+        ontology = os.path.basename(ontology_dir)
+        node_types = types.get((ontology, "nodes"), Counter())
+        edge_types = types.get((ontology, "edges"), Counter())
+        row = [ontology, rows[(ontology, "nodes")], rows[(ontology, "edges")]]
+        row.extend(node_types[node_type] for node_type in NODE_TYPES)
+        row.extend(edge_types[edge_type] for edge_type in EDGE_TYPES)
+        lines.append("\t".join(str(value) for value in row))
+
+    return lines
+
+
+def counts_report(tx_path: str, file_stats: dict) -> list:
+    """
+    Report the line count of each node and edge file.
+
+    :param tx_path: str, path to the transforms
+    :param file_stats: dict of file paths to stats
+    :return: list of lines, with a section each for nodes and edges
+    """
+    lines = []
+    for kind in ["node", "edge"]:
+        lines.append(f"*** Finding all {kind} counts...")
+        for filepath in sorted(file_stats):
+            if file_stats[filepath]["kind"] == kind + "s":
+                lines.append(f"{filepath}\t{file_stats[filepath]['lines']}")
+
+    return lines
+
+
+def types_report(tx_path: str, file_stats: dict) -> list:
+    """
+    Report the node categories and edge predicates used in each file.
+
+    :param tx_path: str, path to the transforms
+    :param file_stats: dict of file paths to stats
+    :return: list of lines, with a section each for nodes and edges,
+    each ending with all types used in any file
+    """
+    lines = []
+    for kind in ["node", "edge"]:
+        lines.append(f"*** Finding all {kind} types...")
+        all_types = set()
+        for filepath in sorted(file_stats):
+            stats = file_stats[filepath]
+            if stats["kind"] == kind + "s":
+                lines.append(f"{filepath}\t{' '.join(sorted(stats['types']))}")
+                all_types.update(stats["types"])
+        lines.append(f"All {kind} types:")
+        lines.append(" ".join(sorted(all_types)))
+
+    return lines
+
+
+def umls_report(tx_path: str, file_stats: dict) -> list:
+    """
+    Report which ontologies use UMLS semantic types, and how often.
+
+    :param tx_path: str, path to the transforms
+    :param file_stats: dict of file paths to stats
+    :return: list of lines, listing ontologies with edges and with nodes
+    using semantic types, then each semantic type with its count
+    across all nodes and edges, most used first
+    """
+    lines = []
+    for kind in ["edges", "nodes"]:
+        lines.append(f"*** Ontologies with {kind} involving UMLS semantic types:")
+        ontologies = set()
+        for filepath, stats in file_stats.items():
+            if stats["kind"] == kind and stats["sty"]:
+                ontologies.add(get_ontology_name(tx_path, filepath))
+        lines.extend(sorted(ontologies))
+
+    sty = Counter()  # type: Counter
+    for stats in file_stats.values():
+        sty.update(stats.get("sty", {}))
+    lines.append(
+        "*** The following codes are used, followed by their usage "
+        "(combined nodes+edges):"
+    )
+    for iri, count in sorted(sty.items(), key=lambda item: (-item[1], item[0])):
+        lines.append(f"{count}\t{iri}")
+    lines.append("Complete.")
+
+    return lines
+
+
+def transform_report(tx_path: str, file_stats: dict) -> list:
+    """
+    Report overall transform counts, validation errors, and types used.
+
+    Error and type counts are numbers of files with at least one.
+    :param tx_path: str, path to the transforms
+    :param file_stats: dict of file paths to stats
+    :return: list of TSV lines, in sections
+    """
+    ontology_dirs = get_ontology_dirs(tx_path)
+    json_count = 0
+    measure_count = 0
+    report_count = 0
+    failed = []
+    for ontology_dir in ontology_dirs:
+        # State files only record progress, so they aren't counted
+        filenames = [
+            filename
+            for filename in os.listdir(ontology_dir)
+            if not filename.endswith(STATE_SUFFIX)
+        ]
+        if len(filenames) == 1:
+            failed.append(ontology_dir)
+        for filename in filenames:
+            if strip_compression(filename).endswith(".json"):
+                json_count = json_count + 1
+            elif filename == "robot.measure":
+                measure_count = measure_count + 1
+            elif filename == "robot.report":
+                report_count = report_count + 1
+
+    kinds = Counter(stats["kind"] for stats in file_stats.values())
+    lines = [
+        "*** General ontology counts:",
+        f"All processed ontologies:\t{len(ontology_dirs)}",
+        f"All successful JSON transforms:\t{json_count}",
+        f"All successful KGX TSV transforms:\t{kinds['edges']}",
+        f"All transforms with KGX validation logs:\t{kinds['log']}",
+        f"All transforms with ROBOT measure reports:\t{measure_count}",
+        f"All transforms with ROBOT validation reports:\t{report_count}",
+        f"Ontologies with failed transforms:\t{' '.join(failed)}",
+    ]
+
+    sections = [
+        (
+            "*** Transforms with at least one of the following errors:",
+            "log",
+            "errors",
+            ERROR_TYPES,
+        ),
+        ("*** Node type counts:", "nodes", "types", NODE_TYPES),
+        ("*** Edge type counts (i.e., predicate types):", "edges", "types", EDGE_TYPES),
+    ]
+    for heading, kind, field, names in sections:
+        lines.append(heading)
+        with_name = Counter()  # type: Counter
+        for stats in file_stats.values():
+            if stats["kind"] == kind:
+                with_name.update(name for name in stats[field] if name in names)
+        lines.extend(f"{name}\t{with_name[name]}" for name in names)
+    lines.append("Complete.")
+
+    return lines
+
+
+# Reports, with the file each is written to
+REPORTS = {
+    "biolink": ("biolink_stats.tsv", biolink_report),
+    "counts": ("all_counts.tsv", counts_report),
+    "types": ("all_types.tsv", types_report),
+    "umls": ("umls_stats.tsv", umls_report),
+    "transform": ("all_transform_stats.tsv", transform_report),
+}
+
+
+def write_reports(
+    tx_path: str,
+    output_dir: str,
+    reports: list,
+    cache_path: str = "",
+    workers: int = 1,
+) -> list:
+    """
+    Collect statistics on a tree of transforms and write reports.
+
+    Each file is read at most once, however many reports are written.
+    :param tx_path: str, path to the transforms
+    :param output_dir: str, directory to write reports to
+    :param reports: list of report names, as in REPORTS
+    :param cache_path: str, path to the stats cache JSON, if using one
+    :param workers: int, number of processes to read files with
+    :return: list of paths to the reports written
+    """
+    file_stats = update_file_stats(tx_path, cache_path, workers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    report_paths = []  # type: List[str]
+    for name in reports:
+        filename, make_report = REPORTS[name]
+        report_path = os.path.join(output_dir, filename)
+        with open(report_path, "w") as report_file:
+            for line in make_report(tx_path, file_stats):
+                report_file.write(line + "\n")
+        report_paths.append(report_path)
+
+    return report_paths
@@ -0,0 +1,404 @@
+"""Functions for working with KGX node and edge files."""
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import Iterator, Optional
+
+from bioportal_to_kgx.bioportal_utils import MD_HEADINGS
+from bioportal_to_kgx.compress_utils import (compressed_path, open_file,
+                                             strip_compression)
+
+NODE_SUFFIX = "nodes.tsv"
+EDGE_SUFFIX = "edges.tsv"
+
+# Replaced by the metadata headings when they are added
+KS_HEADING = "knowledge_source"
+
+# Size of blocks to read when validating graph files
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def is_graph_file(filepath: str) -> bool:
+    """
+    Check if a file is a KGX node or edge file, compressed or not.
+
+    :param filepath: str, path to file
+    :return: bool, True if file is named like a node or edge file
+    """
+    filepath = strip_compression(filepath)
+
+    return filepath.endswith(NODE_SUFFIX) or filepath.endswith(EDGE_SUFFIX)
+
+
+def is_node_file(filepath: str) -> bool:
+    """
+    Check if a file is a KGX node file, compressed or not.
+
+    :param filepath: str, path to file
+    :return: bool, True if file is named like a node file
+    """
+    return strip_compression(filepath).endswith(NODE_SUFFIX)
+
+
+def is_edge_file(filepath: str) -> bool:
+    """
+    Check if a file is a KGX edge file, compressed or not.
+
+    :param filepath: str, path to file
+    :return: bool, True if file is named like an edge file
+    """
+    return strip_compression(filepath).endswith(EDGE_SUFFIX)
+
+
+def get_graph_files(in_path: str) -> list:
+    """
+    Find node and edge files in a directory.
+
+    Compressed files are included.
+    :param in_path: str, path to directory
+    :return: sorted list of file paths as strings
+    """
+    tx_filepaths = []
+
+    for filename in os.listdir(in_path):
+        if is_graph_file(filename):
+            tx_filepaths.append(os.path.join(in_path, filename))
+
+    return sorted(tx_filepaths)
+
+
+def validate_graph_file(filepath: str) -> dict:
+    """
+    Check that a KGX node or edge file can be parsed, and count its rows.
+
+    The file is read in large binary blocks, without decoding,
+    and may be compressed.
+    As with parsing the file as a TSV without quoting,
+    every row must have as many fields as the header,
+    and blank lines are skipped.
+    :param filepath: str, path to KGX format file
+    :return: dict of stats, with keys
+    rows (int), columns (int), malformed_rows (int),
+    first_malformed_line (int, or 0 if none),
+    first_malformed_offset (int, byte offset in the
+    uncompressed file, or 0 if none),
+    and too_short (bool).
+    A file without a header has zero columns.
+    """
+    stats = {
+        "rows": 0,
+        "columns": 0,
+        "malformed_rows": 0,
+        "first_malformed_line": 0,
+        "first_malformed_offset": 0,
+        "too_short": True,
+    }
+
+    rows = 0
+    malformed_rows = 0
+
+    with open_file(filepath, "rb") as infile:
+        header = infile.readline()
+        offset = len(header)
+        header = header.rstrip(b"\r\n")
+        if header == b"":
+            return stats
+        stats["columns"] = header.count(b"\t") + 1
+        tab_count = stats["columns"] - 1
+
+        line_number = 1
+        remainder = b""
+        while True:
+            block = infile.read(BLOCK_SIZE)
+            if block:
+                lines = (remainder + block).split(b"\n")
+                # The last piece may continue in the next block
+                remainder = lines.pop()
+            else:
+                # Last line may not end with a newline
+                lines = [remainder] if remainder else []
+
+            # Count fields without looping over lines in Python;
+            # blank lines are skipped, and have no tabs
+            tab_counts = list(map(bytes.count, lines, repeat(b"\t")))
+            blank_count = lines.count(b"") + lines.count(b"\r")
+            good_count = tab_counts.count(tab_count)
+            if tab_count == 0:
+                good_count = good_count - blank_count
+            rows = rows + len(lines) - blank_count
+            block_malformed = len(lines) - blank_count - good_count
+
+            if block_malformed > 0 and stats["first_malformed_line"] == 0:
+                block_offset = offset
+                for i, line in enumerate(lines):
+                    if tab_counts[i] != tab_count and line not in (b"", b"\r"):
+                        stats["first_malformed_line"] = line_number + i + 1
+                        stats["first_malformed_offset"] = block_offset
+                        break
+                    block_offset = block_offset + len(line) + 1
+            malformed_rows = malformed_rows + block_malformed
+            line_number = line_number + len(lines)
+            offset = offset + sum(map(len, lines)) + len(lines)
+
+            if not block:
+                break
+
+    stats["rows"] = rows
+    stats["malformed_rows"] = malformed_rows
+    stats["too_short"] = rows < 1
+
+    return stats
+
+
+def validate_graph_files(in_path: str) -> dict:
+    """
+    Check all node and edge files in a directory, concurrently.
+
+    :param in_path: str, path to directory
+    :return: dict of file paths to dicts of stats,
+    as returned by validate_graph_file
+    """
+    tx_filepaths = get_graph_files(in_path)
+    if len(tx_filepaths) == 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(tx_filepaths)) as executor:
+        all_stats = executor.map(validate_graph_file, tx_filepaths)
+
+    return dict(zip(tx_filepaths, all_stats))
+
+
+def process_graph_file(
+    filepath: str, md: Optional[dict] = None, compression: str = "", threads: int = 1
+) -> dict:
+    """
+    Check a KGX node or edge file, and optionally add metadata, in one pass.
+
+    Counts rows, checks that each row has as many
+    fields as the header, and checks whether the
+    file is blank or too short to contain a graph.
+    If metadata is provided, new columns are added
+    for each of the MD_HEADINGS, replacing the
+    knowledge_source column if present.
+    Metadata is not added again if the headings
+    are already present.
+    If a compression type is provided, the file is
+    compressed in the same pass, replacing the original.
+    With no metadata to add and no compression to change,
+    the file is only read, using validate_graph_file.
+    :param filepath: str, path to KGX format file, compressed or not
+    :param md: dict, the metadata, or None to leave the file as is
+    :param compression: str, compression type for the output,
+    or empty string to keep the file's current compression
+    :param threads: int, number of threads to compress with
+    :return: dict of stats, as returned by validate_graph_file,
+    plus md_added (bool) and path (str, path to the file afterwards)
+    """
+    out_filepath = compressed_path(filepath, compression) if compression else filepath
+
+    with open_file(filepath, "rb") as infile:
+        header_split = infile.readline().rstrip(b"\r\n").split(b"\t")
+
+    headings = [heading.encode() for heading in MD_HEADINGS]
+    have_md = any(heading in header_split for heading in headings)
+    if md and have_md:
+        print(f"Metadata already present in {filepath}.")
+    add_md = bool(md) and not have_md and header_split != [b""]
+    if not add_md and out_filepath == filepath:
+        stats = validate_graph_file(filepath)
+        stats["md_added"] = False
+        stats["path"] = filepath
+        return stats
+
+    stats = {
+        "rows": 0,
+        "columns": len(header_split),
+        "malformed_rows": 0,
+        "first_malformed_line": 0,
+        "first_malformed_offset": 0,
+        "too_short": True,
+        "md_added": False,
+        "path": filepath,
+    }
+
+    # Keep the compression extension last, so the temporary file
+    # is written the same way but isn't mistaken for a graph file
+    tmp_filepath = compressed_path(
+        strip_compression(out_filepath) + ".tmp", compression
+    )
+    try:
+        md_values = []
+        ks_index = -1
+        out_header_split = list(header_split)
+        if add_md:
+            md_values = [
+                md[MD_HEADINGS[heading]].encode()  # type: ignore
+                for heading in MD_HEADINGS
+            ]
+            if KS_HEADING.encode() in out_header_split:
+                ks_index = out_header_split.index(KS_HEADING.encode())
+                del out_header_split[ks_index]
+            out_header_split.extend(headings)
+
+        with open_file(filepath, "rb") as infile, open_file(
+            tmp_filepath, "wb", threads
+        ) as outfile:
+            offset = len(infile.readline())
+            outfile.write(b"\t".join(out_header_split) + b"\n")
+            for line_number, line in enumerate(infile, start=2):
+                line_split = line.rstrip(b"\r\n").split(b"\t")
+                if line_split != [b""]:
+                    stats["rows"] = stats["rows"] + 1
+                    if len(line_split) != stats["columns"]:
+                        stats["malformed_rows"] = stats["malformed_rows"] + 1
+                        if stats["first_malformed_line"] == 0:
+                            stats["first_malformed_line"] = line_number
+                            stats["first_malformed_offset"] = offset
+                    if 0 <= ks_index < len(line_split):
+                        del line_split[ks_index]
+                    outfile.write(b"\t".join(line_split + md_values) + b"\n")
+                offset = offset + len(line)
+
+        os.replace(tmp_filepath, out_filepath)
+        if out_filepath != filepath:
+            os.remove(filepath)
+        stats["md_added"] = add_md
+        stats["path"] = out_filepath
+    except (IOError, KeyError, AttributeError) as e:
+        print(f"Failed to process {filepath}: {e}")
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+    stats["too_short"] = stats["rows"] < 1
+
+    return stats
+
+
+def process_graph_files(
+    in_path: str, md: Optional[dict] = None, compression: str = "", threads: int = 1
+) -> dict:
+    """
+    Check all node and edge files in a directory in one pass each.
+
+    Files are processed concurrently.
+    Metadata, if provided, is only added to edge files.
+    :param in_path: str, path to directory
+    :param md: dict, the metadata, or None to leave files as they are
+    :param compression: str, compression type for the output,
+    or empty string to keep each file's current compression
+    :param threads: int, number of threads to compress each file with
+    :return: dict of file paths (after any compression)
+    to dicts of stats, as returned by process_graph_file
+    """
+    tx_filepaths = get_graph_files(in_path)
+    if len(tx_filepaths) == 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(tx_filepaths)) as executor:
+        futures = [
+            executor.submit(
+                process_graph_file,
+                filepath,
+                md if is_edge_file(filepath) else None,
+                compression,
+                threads,
+            )
+            for filepath in tx_filepaths
+        ]
+
+    all_stats = [future.result() for future in futures]
+
+    return {stats["path"]: stats for stats in all_stats}
+
+
+def split_graph_file(
+    filepath: str,
+    batch_dir: str,
+    batch_rows: int,
+    sample_fraction: float = 1.0,
+    seed: int = 0,
+) -> Iterator[str]:
+    """
+    Split a KGX node or edge file into batches, each with the header.
+
+    Batches are written one at a time, uncompressed, and each is
+    yielded once complete, so only one row is held in memory.
+    Batch files are named like the original, so they can be
+    read as node or edge files, e.g., BTO_1_00000_nodes.tsv.
+    Blank lines are skipped.
+    :param filepath: str, path to KGX format file, compressed or not
+    :param batch_dir: str, directory to write batches to
+    :param batch_rows: int, most rows to write to each batch
+    :param sample_fraction: float, fraction of rows to keep,
+    chosen at random, or 1.0 to keep every row
+    :param seed: int, seed for choosing rows, so samples can be repeated
+    :return: iterator of paths to batch files
+    """
+    suffix = NODE_SUFFIX if is_node_file(filepath) else EDGE_SUFFIX
+    stem = os.path.basename(strip_compression(filepath))[: -len(suffix)]
+    rng = random.Random(seed)
+    batch_count = 0
+    outfile = None
+
+    try:
+        with open_file(filepath, "rb") as infile:
+            header = infile.readline()
+            if not header.endswith(b"\n"):
+                header = header + b"\n"
+            rows = 0
+            for line in infile:
+                if line in (b"\n", b"\r\n"):
+                    continue
+                if sample_fraction < 1.0 and rng.random() >= sample_fraction:
+                    continue
+                if not outfile:
+                    batch_path = os.path.join(
+                        batch_dir, f"{stem}{batch_count:05d}_{suffix}"
+                    )
+                    outfile = open(batch_path, "wb")
+                    outfile.write(header)
+                    rows = 0
+                if not line.endswith(b"\n"):
+                    line = line + b"\n"
+                outfile.write(line)
+                rows = rows + 1
+                if rows >= batch_rows:
+                    outfile.close()
+                    outfile = None
+                    batch_count = batch_count + 1
+                    yield batch_path
+        if outfile:
+            outfile.close()
+            outfile = None
+            yield batch_path
+    finally:
+        if outfile:
+            outfile.close()
+
+
+def merge_validation_errors(merged: dict, errors: dict, max_entities: int) -> None:
+    """
+    Merge KGX validation errors into those already found.
+
+    Errors are indexed by message level, error type, and message,
+    each with a list of entities, as returned by KGX validation.
+    Entities are only listed once for each message,
+    and at most max_entities are kept, to bound memory use.
+    :param merged: dict of errors to merge into, changed in place
+    :param errors: dict of errors to add
+    :param max_entities: int, most entities to keep for each message
+    """
+    for level, error_types in errors.items():
+        for error_type, messages in error_types.items():
+            merged_messages = merged.setdefault(level, {}).setdefault(error_type, {})
+            for message, entities in messages.items():
+                merged_entities = merged_messages.setdefault(message, [])
+                known = set(merged_entities)
+                for entity in entities:
+                    if len(merged_entities) >= max_entities:
+                        break
+                    if entity not in known:
+                        merged_entities.append(entity)
+                        known.add(entity)
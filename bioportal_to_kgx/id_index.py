@@ -0,0 +1,314 @@
+"""Functions for indexing which ontologies define or reference each node ID."""
+
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from bioportal_to_kgx.graph_stats import get_ontology_dirs, read_lines
+from bioportal_to_kgx.graph_utils import get_graph_files, is_node_file
+from bioportal_to_kgx.prefix_utils import (get_native_status,
+                                           get_ontology_prefixes)
+
+# Roles of an ID in an ontology, stored by their index
+ROLES = ["referenced", "defined"]
+
+ID_HEADING = b"id"
+IRI_HEADING = b"iri"
+
+# Seconds to wait for another process writing to the index
+LOCK_TIMEOUT = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ontologies (
+    ontology_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    ontology_id INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ids (
+    key TEXT NOT NULL,
+    ontology_id INTEGER NOT NULL,
+    role INTEGER NOT NULL,
+    PRIMARY KEY (key, ontology_id)
+) WITHOUT ROWID;
+"""
+
+
+def open_index(index_path: str) -> sqlite3.Connection:
+    """
+    Open the ID index, creating it if needed.
+
+    :param index_path: str, path to the index (an SQLite database)
+    :return: sqlite3.Connection
+    """
+    connection = sqlite3.connect(index_path, timeout=LOCK_TIMEOUT)
+    connection.executescript(SCHEMA)
+
+    return connection
+
+
+def get_node_files(ontology_dir: str) -> dict:
+    """
+    Get the node files in an ontology's directory, with what identifies them.
+
+    :param ontology_dir: str, path to the ontology's transforms
+    :return: dict of file paths to (size, mtime_ns) tuples
+    """
+    node_files = {}
+    for filepath in get_graph_files(ontology_dir):
+        if is_node_file(filepath):
+            stat = os.stat(filepath)
+            node_files[os.path.abspath(filepath)] = (stat.st_size, stat.st_mtime_ns)
+
+    return node_files
+
+
+def get_defined_prefixes(ontology_dir: str, ontologies: set) -> list:
+    """
+    Find the prefixes of IDs an ontology defines itself.
+
+    These are the prefixes inferred for the ontology that are,
+    or end with, its acronym. If there are none, its most
+    used prefix is taken instead, unless that is another
+    ontology's acronym.
+    :param ontology_dir: str, path to the ontology's transforms
+    :param ontologies: set of all ontology acronyms, in upper case
+    :return: list of str prefixes, each with its delimiter
+    """
+    ontology = os.path.basename(ontology_dir)
+    statuses = [
+        (prefix + delimiter, count, get_native_status(ontology, prefix, ontologies))
+        for prefix, delimiter, count in get_ontology_prefixes(ontology_dir)
+    ]
+    defined = [prefix for prefix, _, status in statuses if status == "True"]
+    if not defined and statuses:
+        prefix, _, status = max(statuses, key=lambda item: (item[1], item[0]))
+        if status != "False":
+            defined = [prefix]
+
+    return defined
+
+
+def write_ontology_keys(ontology_dir: str, ontologies: set, out_path: str) -> int:
+    """
+    Write the ID and IRI of each of an ontology's nodes, with its role.
+
+    Keys are written to a file rather than returned,
+    so the largest ontologies don't need to fit in memory.
+    :param ontology_dir: str, path to the ontology's transforms
+    :param ontologies: set of all ontology acronyms, in upper case
+    :param out_path: str, path to write keys to, one per line,
+    each followed by a tab and the index of its role in ROLES
+    :return: int, number of keys written
+    """
+    defined = tuple(get_defined_prefixes(ontology_dir, ontologies))
+    key_count = 0
+    with open(out_path, "w") as outfile:
+        for filepath in sorted(get_node_files(ontology_dir)):
+            columns = []
+            header = True
+            for data in read_lines(filepath):
+                for line in data.split(b"\n"):
+                    fields = line.rstrip(b"\r").split(b"\t")
+                    if header:
+                        header = False
+                        columns = [
+                            fields.index(heading)
+                            for heading in [ID_HEADING, IRI_HEADING]
+                            if heading in fields
+                        ]
+                        continue
+                    keys = [fields[i] for i in columns if i < len(fields) and fields[i]]
+                    if not keys:
+                        continue
+                    node_id = keys[0].decode("utf-8", "replace")
+                    role = 1 if defined and node_id.startswith(defined) else 0
+                    for key in set(keys):
+                        outfile.write(f"{key.decode('utf-8', 'replace')}\t{role}\n")
+                        key_count = key_count + 1
+
+    return key_count
+
+
+def index_ontology(args: tuple) -> tuple:
+    """
+    Write the keys for one ontology, for use in a worker process.
+
+    :param args: tuple of (ontology_dir, ontologies, out_path),
+    as for write_ontology_keys
+    :return: tuple of (ontology_dir, out_path)
+    """
+    ontology_dir, ontologies, out_path = args
+    write_ontology_keys(ontology_dir, ontologies, out_path)
+
+    return (ontology_dir, out_path)
+
+
+def read_keys(keys_path: str, ontology_id: int):
+    """
+    Read the keys written by write_ontology_keys, as rows for the index.
+
+    :param keys_path: str, path to the keys
+    :param ontology_id: int, ID of the ontology in the index
+    :return: iterator of (key, ontology_id, role) tuples
+    """
+    with open(keys_path) as infile:
+        for line in infile:
+            key, role = line.rstrip("\n").rsplit("\t", 1)
+            yield (key, ontology_id, int(role))
+
+
+def replace_ontology(
+    connection: sqlite3.Connection, ontology: str, node_files: dict, keys_path: str
+) -> None:
+    """
+    Replace everything indexed for one ontology, in one transaction.
+
+    :param connection: sqlite3.Connection to the index
+    :param ontology: str, ontology acronym
+    :param node_files: dict of node file paths to (size, mtime_ns) tuples
+    :param keys_path: str, path to keys written by write_ontology_keys,
+    or empty string to only remove the ontology
+    """
+    with connection:
+        connection.execute(
+            "INSERT OR IGNORE INTO ontologies (name) VALUES (?)", (ontology,)
+        )
+        (ontology_id,) = connection.execute(
+            "SELECT ontology_id FROM ontologies WHERE name = ?", (ontology,)
+        ).fetchone()
+        connection.execute("DELETE FROM ids WHERE ontology_id = ?", (ontology_id,))
+        connection.execute("DELETE FROM files WHERE ontology_id = ?", (ontology_id,))
+        if keys_path:
+            connection.executemany(
+                "INSERT OR IGNORE INTO ids VALUES (?, ?, ?)",
+                read_keys(keys_path, ontology_id),
+            )
+        connection.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?)",
+            [
+                (path, ontology_id, size, mtime_ns)
+                for path, (size, mtime_ns) in node_files.items()
+            ],
+        )
+
+
+def get_indexed_files(connection: sqlite3.Connection) -> dict:
+    """
+    Get the node files in the index, by ontology.
+
+    :param connection: sqlite3.Connection to the index
+    :return: dict of ontology acronyms to dicts of
+    file paths to (size, mtime_ns) tuples
+    """
+    indexed = {}  # type: dict
+    for name, path, size, mtime_ns in connection.execute(
+        "SELECT name, path, size, mtime_ns FROM files "
+        "JOIN ontologies USING (ontology_id)"
+    ):
+        indexed.setdefault(name, {})[path] = (size, mtime_ns)
+
+    return indexed
+
+
+def update_id_index(tx_path: str, index_path: str, workers: int = 1) -> dict:
+    """
+    Update the index of node IDs and IRIs for a tree of transforms.
+
+    Only ontologies whose node files were added, removed, or changed
+    (by size or modification time) since they were last indexed
+    are read again, so re-transforming one ontology
+    only means indexing that one again.
+    Ontologies are read in parallel processes, and written
+    to the index one at a time, each in its own transaction.
+    :param tx_path: str, path to the transforms, with one directory per ontology
+    :param index_path: str, path to the index (an SQLite database)
+    :param workers: int, number of processes to read ontologies with
+    :return: dict with keys updated and removed, each a list of
+    ontology acronyms, and unchanged, an int count of ontologies
+    """
+    ontology_dirs = get_ontology_dirs(tx_path)
+    ontologies = set(os.path.basename(path).upper() for path in ontology_dirs)
+
+    connection = open_index(index_path)
+    try:
+        indexed = get_indexed_files(connection)
+        current = {path: get_node_files(path) for path in ontology_dirs}
+        changed = [
+            path
+            for path, node_files in current.items()
+            if indexed.get(os.path.basename(path), {}) != node_files
+        ]
+        names = set(os.path.basename(path) for path in ontology_dirs)
+        removed = sorted(name for name in indexed if name not in names)
+
+        for name in removed:
+            replace_ontology(connection, name, {}, "")
+
+        index_dir = os.path.dirname(os.path.abspath(index_path))
+        with tempfile.TemporaryDirectory(prefix=".index_", dir=index_dir) as keys_dir:
+            tasks = [
+                (path, ontologies, os.path.join(keys_dir, f"{i:05d}.tsv"))
+                for i, path in enumerate(changed)
+            ]
+            # Each ontology is written as soon as it's read,
+            # while workers read the next
+            executor = None
+            if workers > 1 and len(tasks) > 1:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                indexed_keys = executor.map(index_ontology, tasks)
+            else:
+                indexed_keys = map(index_ontology, tasks)
+            try:
+                for ontology_dir, keys_path in indexed_keys:
+                    replace_ontology(
+                        connection,
+                        os.path.basename(ontology_dir),
+                        current[ontology_dir],
+                        keys_path,
+                    )
+                    os.remove(keys_path)
+            finally:
+                if executor:
+                    executor.shutdown()
+    finally:
+        connection.close()
+
+    return {
+        "updated": [os.path.basename(path) for path in changed],
+        "removed": removed,
+        "unchanged": len(ontology_dirs) - len(changed),
+    }
+
+
+def lookup_ids(index_path: str, keys: list) -> dict:
+    """
+    Find the ontologies that define or reference node IDs or IRIs.
+
+    :param index_path: str, path to the index (an SQLite database)
+    :param keys: list of str node IDs (CURIEs) or IRIs
+    :return: dict of each key to a list of dicts with keys
+    ontology and role (defined or referenced), sorted with
+    defining ontologies first
+    """
+    connection = open_index(index_path)
+    results = {}
+    try:
+        for key in keys:
+            rows = connection.execute(
+                "SELECT name, role FROM ids JOIN ontologies USING (ontology_id) "
+                "WHERE key = ? ORDER BY role DESC, name",
+                (key,),
+            ).fetchall()
+            results[key] = [
+                {"ontology": name, "role": ROLES[role]} for name, role in rows
+            ]
+    finally:
+        connection.close()
+
+    return results
@@ -0,0 +1,121 @@
+"""Functions for validating large graphs with KGX, in bounded-size batches."""
+
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from json import dump as json_dump
+from typing import Dict, Optional
+
+from kgx.transformer import Transformer  # type: ignore
+from kgx.validator import Validator  # type: ignore
+
+from bioportal_to_kgx.graph_utils import (merge_validation_errors,
+                                          split_graph_file)
+
+# Rows in each batch, small enough for any one worker to validate
+BATCH_ROWS = 100000
+
+# Most entities listed for each validation message in the merged log
+MAX_ERROR_ENTITIES = 1000
+
+# Validator for each worker process, reused across batches
+worker_validator = None  # type: Optional[Validator]
+
+
+def init_validator() -> None:
+    """
+    Set up the validator for a worker process.
+
+    Building a Validator loads the Biolink Model,
+    so this is done once per worker rather than once per batch.
+    """
+    global worker_validator
+    worker_validator = Validator()
+
+
+def validate_batch(batch_path: str) -> dict:
+    """
+    Validate one batch of nodes or edges with KGX.
+
+    Records are streamed through the validator,
+    so the graph is never held in memory.
+    Errors and validated node IDs from any earlier batch
+    are cleared first, so each batch is checked on its own.
+    :param batch_path: str, path to an uncompressed node or edge file
+    :return: dict of errors, indexed by message level,
+    error type, and message, each with a list of entities
+    """
+    validator = worker_validator
+    if validator is None:  # Not in a worker started by sharded_validate
+        validator = Validator()
+    else:
+        validator.clear_errors()
+        validator.validated_nodes.clear()
+
+    transformer = Transformer(stream=True)
+    transformer.transform(
+        input_args={"filename": [batch_path], "format": "tsv", "compression": None},
+        output_args={"format": "null"},
+        inspector=validator,
+    )
+
+    return validator.get_errors()
+
+
+def sharded_validate(
+    filepaths: list,
+    log_path: str,
+    batch_rows: int = BATCH_ROWS,
+    workers: int = 1,
+    sample_fraction: float = 1.0,
+) -> dict:
+    """
+    Validate node and edge files with KGX, in batches, in parallel.
+
+    Each file is split into batches on disk as they're needed,
+    so at most two batches per worker exist at once.
+    Batches are validated in worker processes, and their
+    errors are merged into one log, in the same form
+    as a log from validating the whole graph at once.
+    Checks needing the whole graph (e.g., that edges refer
+    to nodes that exist) are not run, as with KGX streaming.
+    :param filepaths: list of paths to node and edge files
+    :param log_path: str, path to write the merged log to
+    :param batch_rows: int, most rows in each batch
+    :param workers: int, number of processes to validate with
+    :param sample_fraction: float, fraction of rows to validate,
+    chosen at random, or 1.0 to validate every row
+    :return: dict of merged errors
+    """
+    merged = {}  # type: Dict[str, dict]
+    pending = {}  # type: Dict
+    batch_count = 0
+
+    def merge_done() -> None:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            merge_validation_errors(merged, future.result(), MAX_ERROR_ENTITIES)
+            os.remove(pending.pop(future))
+
+    with tempfile.TemporaryDirectory() as batch_dir, ProcessPoolExecutor(
+        max_workers=workers, initializer=init_validator
+    ) as executor:
+        for filepath in filepaths:
+            for batch_path in split_graph_file(
+                filepath, batch_dir, batch_rows, sample_fraction
+            ):
+                while len(pending) >= workers * 2:
+                    merge_done()
+                pending[executor.submit(validate_batch, batch_path)] = batch_path
+                batch_count = batch_count + 1
+        while len(pending) > 0:
+            merge_done()
+
+    if sample_fraction < 1.0:
+        print(f"Validated a {sample_fraction:.1%} sample of rows.")
+    print(f"Validated {batch_count} batch(es) of up to {batch_rows} rows.")
+
+    with open(log_path, "w") as log_file:
+        json_dump(merged, log_file, indent=4)
+
+    return merged
@@ -0,0 +1,483 @@
+"""Functions for merging all transforms into one de-duplicated graph."""
+
+import heapq
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import groupby
+from typing import Dict, List
+
+from bioportal_to_kgx.compress_utils import (compressed_path, get_compression,
+                                             open_file, strip_compression)
+from bioportal_to_kgx.graph_stats import (MULTIVALUE_DELIMITER,
+                                          get_ontology_dirs)
+from bioportal_to_kgx.graph_utils import (EDGE_SUFFIX, NODE_SUFFIX,
+                                          get_graph_files, is_edge_file,
+                                          is_node_file)
+
+MERGED_NAME = "kg-bioportal"
+
+# Columns identifying each node or edge. Edge IDs differ
+# between transforms, so the same edge from two ontologies
+# is found by its subject, predicate and object instead.
+KEY_COLUMNS = {"nodes": ["id"], "edges": ["subject", "predicate", "object"]}
+
+# Columns that come first in the merged files, in this order
+FIRST_COLUMNS = {"nodes": ["id"], "edges": ["id", "subject", "predicate", "object"]}
+
+# Columns that may hold several values. All values from
+# duplicates are kept, sorted. For any other column,
+# the first value found is kept, in order of input file path.
+MULTIVALUED_COLUMNS = [
+    "category",
+    "xref",
+    "provided_by",
+    "synonym",
+    "same_as",
+    "subsets",
+    "knowledge_source",
+    "aggregator_knowledge_source",
+    "publications",
+]
+
+# Columns expected to differ between duplicates,
+# so they aren't counted as conflicts
+UNCHECKED_COLUMNS = {"nodes": [], "edges": ["id"]}
+
+# Rows are split by key into this many partitions, merged in parallel.
+# It doesn't depend on the number of workers, so neither does the output.
+PARTITIONS = 16
+
+# Sorted rows take about this many times their size on disk in memory
+ROW_OVERHEAD = 4
+
+# Most sorted runs to merge at once, to limit open files
+MAX_FANIN = 128
+
+# Joins the columns of an edge key
+KEY_DELIMITER = b"\x1f"
+
+# Bytes of each file to buffer while merging
+MERGE_BUFFER = 64 * 1024
+
+
+def find_merge_inputs(tx_path: str) -> dict:
+    """
+    Find the node and edge files to merge.
+
+    :param tx_path: str, path to the transforms, with one directory per ontology
+    :return: dict with keys nodes and edges, each a list of file paths,
+    sorted by path
+    """
+    inputs = {"nodes": [], "edges": []}  # type: Dict[str, List[str]]
+    for ontology_dir in get_ontology_dirs(tx_path):
+        for filepath in get_graph_files(ontology_dir):
+            if is_node_file(filepath):
+                inputs["nodes"].append(filepath)
+            elif is_edge_file(filepath):
+                inputs["edges"].append(filepath)
+
+    return {kind: sorted(filepaths) for kind, filepaths in inputs.items()}
+
+
+def read_header(filepath: str) -> list:
+    """
+    Read the column names of a node or edge file.
+
+    :param filepath: str, path to the file, compressed or not
+    :return: list of str column names
+    """
+    with open_file(filepath, "rb") as infile:
+        return infile.readline().decode("utf-8").rstrip("\r\n").split("\t")
+
+
+def get_merged_header(headers: list, kind: str) -> list:
+    """
+    Get the columns of the merged file.
+
+    :param headers: list of lists of column names, one for each input file
+    :param kind: str, nodes or edges
+    :return: list of column names, with the usual first columns
+    followed by any others, in the order first found
+    """
+    merged_header = list(FIRST_COLUMNS[kind])
+    for header in headers:
+        for column in header:
+            if column not in merged_header:
+                merged_header.append(column)
+
+    return merged_header
+
+
+def get_partition(key: bytes, partitions: int) -> int:
+    """
+    Choose the partition for a key, the same way in every process.
+
+    :param key: bytes, node or edge key
+    :param partitions: int, number of partitions
+    :return: int, partition index
+    """
+    return zlib.crc32(key) % partitions
+
+
+def write_run(lines: list, run_path: str) -> None:
+    """
+    Sort lines and write them to a run file.
+
+    :param lines: list of bytes lines, each ending in a newline
+    :param run_path: str, path to write to
+    """
+    lines.sort()
+    with open(run_path, "wb") as outfile:
+        outfile.writelines(lines)
+
+
+def sort_inputs(task: dict) -> dict:
+    """
+    Read input files and write their rows as sorted runs.
+
+    Each row is written as its key, the index of its input file,
+    and the row itself, so sorting rows brings duplicates
+    together in order of input file.
+    Rows are held in memory up to chunk_bytes,
+    then each partition's rows are sorted and written.
+    Rows without the key columns are skipped.
+    :param task: dict with keys kind (nodes or edges),
+    inputs (list of (index, path, header) tuples), run_dir,
+    partitions, chunk_bytes and name (unique to the task)
+    :return: dict with keys runs (list of (partition, path) tuples),
+    rows (int, rows read) and skipped (int, rows without keys)
+    """
+    partitions = task["partitions"]
+    buffers = [[] for _ in range(partitions)]  # type: List[List[bytes]]
+    buffered = 0
+    result = {"runs": [], "rows": 0, "skipped": 0}  # type: dict
+
+    def flush() -> None:
+        for partition, lines in enumerate(buffers):
+            if len(lines) == 0:
+                continue
+            run_path = os.path.join(
+                task["run_dir"],
+                f"{partition:03d}_{task['name']}_{len(result['runs']):04d}",
+            )
+            write_run(lines, run_path)
+            result["runs"].append((partition, run_path))
+            buffers[partition] = []
+
+    for index, filepath, header in task["inputs"]:
+        key_columns = [header.index(column) for column in KEY_COLUMNS[task["kind"]]]
+        last_key_column = max(key_columns)
+        prefix = b"\t%06d\t" % index
+        with open_file(filepath, "rb") as infile:
+            infile.readline()
+            for line in infile:
+                line = line.rstrip(b"\r\n")
+                if not line:
+                    continue
+                result["rows"] = result["rows"] + 1
+                fields = line.split(b"\t", last_key_column + 1)
+                if len(fields) <= last_key_column:
+                    result["skipped"] = result["skipped"] + 1
+                    continue
+                key = KEY_DELIMITER.join(fields[column] for column in key_columns)
+                if not key.strip(KEY_DELIMITER):
+                    result["skipped"] = result["skipped"] + 1
+                    continue
+                sort_line = key + prefix + line + b"\n"
+                buffers[get_partition(key, partitions)].append(sort_line)
+                buffered = buffered + len(sort_line)
+                if buffered >= task["chunk_bytes"]:
+                    flush()
+                    buffered = 0
+    flush()
+
+    return result
+
+
+def merge_runs(run_paths: list, out_path: str) -> None:
+    """
+    Merge sorted run files into one sorted run file.
+
+    :param run_paths: list of paths to sorted run files
+    :param out_path: str, path to write the merged run to
+    """
+    with ExitStack() as stack:
+        runs = [
+            stack.enter_context(open(run_path, "rb", buffering=MERGE_BUFFER))
+            for run_path in run_paths
+        ]
+        with open(out_path, "wb") as outfile:
+            outfile.writelines(heapq.merge(*runs))
+    for run_path in run_paths:
+        os.remove(run_path)
+
+
+def merge_rows(
+    rows: list, headers: dict, merged_header: list, unchecked: list
+) -> tuple:
+    """
+    Merge the rows for one node or edge.
+
+    :param rows: list of (input index, row) tuples, in order of input,
+    each row a str of tab-delimited values
+    :param headers: dict of input indices to lists of column names
+    :param merged_header: list of column names in the merged file
+    :param unchecked: list of column names not to count conflicts for
+    :return: tuple of (merged row as a list of str values,
+    int number of columns with conflicting single values)
+    """
+    values = {}  # type: Dict[str, list]
+    for index, row in rows:
+        for column, value in zip(headers[index], row.split("\t")):
+            if value:
+                values.setdefault(column, []).append(value)
+
+    merged = []
+    conflicts = 0
+    for column in merged_header:
+        column_values = values.get(column, [])
+        if column in MULTIVALUED_COLUMNS:
+            parts = set()
+            for value in column_values:
+                parts.update(part for part in value.split(MULTIVALUE_DELIMITER) if part)
+            merged.append(MULTIVALUE_DELIMITER.join(sorted(parts)))
+        else:
+            if len(set(column_values)) > 1 and column not in unchecked:
+                conflicts = conflicts + 1
+            merged.append(column_values[0] if column_values else "")
+
+    return (merged, conflicts)
+
+
+def merge_partition(task: dict) -> dict:
+    """
+    Merge the sorted runs of one partition, combining duplicates.
+
+    Runs are first merged in groups if there are too many
+    to open at once. Then the rows for each key, which are
+    next to each other, are merged into one.
+    :param task: dict with keys kind (nodes or edges), run_paths,
+    headers (dict of input indices to column names),
+    merged_header, out_path and work_dir
+    :return: dict with keys rows (int, rows written),
+    duplicates (int, rows merged into others) and
+    conflicts (int, columns with conflicting single values)
+    """
+    run_paths = task["run_paths"]
+    round_count = 0
+    while len(run_paths) > MAX_FANIN:
+        merged_paths = []
+        for i in range(0, len(run_paths), MAX_FANIN):
+            merged_path = os.path.join(
+                task["work_dir"],
+                f"{os.path.basename(task['out_path'])}_{round_count}_{i}",
+            )
+            merge_runs(run_paths[i : i + MAX_FANIN], merged_path)
+            merged_paths.append(merged_path)
+        run_paths = merged_paths
+        round_count = round_count + 1
+
+    result = {"rows": 0, "duplicates": 0, "conflicts": 0}
+    with ExitStack() as stack:
+        runs = [
+            stack.enter_context(open(run_path, "rb", buffering=MERGE_BUFFER))
+            for run_path in run_paths
+        ]
+        with open(task["out_path"], "wb") as outfile:
+            sorted_lines = heapq.merge(*runs)
+            for _, group in groupby(
+                sorted_lines, key=lambda line: line.split(b"\t", 1)[0]
+            ):
+                rows = []
+                for line in group:
+                    _, index, row = line.rstrip(b"\n").split(b"\t", 2)
+                    rows.append((int(index), row.decode("utf-8", "replace")))
+                merged, conflicts = merge_rows(
+                    rows,
+                    task["headers"],
+                    task["merged_header"],
+                    UNCHECKED_COLUMNS[task["kind"]],
+                )
+                outfile.write(("\t".join(merged) + "\n").encode("utf-8"))
+                result["rows"] = result["rows"] + 1
+                result["duplicates"] = result["duplicates"] + len(rows) - 1
+                result["conflicts"] = result["conflicts"] + conflicts
+
+    return result
+
+
+def run_tasks(function, tasks: list, workers: int) -> list:
+    """
+    Run a function on each task, in worker processes if there are several.
+
+    :param function: function taking a single task
+    :param tasks: list of tasks
+    :param workers: int, number of processes
+    :return: list of results, in the same order as tasks
+    """
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(function, tasks))
+
+    return [function(task) for task in tasks]
+
+
+def group_inputs(inputs: list, chunk_bytes: int) -> list:
+    """
+    Group small input files so each group fills about one sorted run.
+
+    :param inputs: list of (index, path, header) tuples
+    :param chunk_bytes: int, bytes of rows to hold before writing a run
+    :return: list of lists of (index, path, header) tuples
+    """
+    groups = []  # type: List[list]
+    group_size = 0
+    for merge_input in inputs:
+        size = os.path.getsize(merge_input[1])
+        if len(groups) == 0 or group_size + size > chunk_bytes:
+            groups.append([])
+            group_size = 0
+        groups[-1].append(merge_input)
+        group_size = group_size + size
+
+    return groups
+
+
+def merge_kind(
+    filepaths: list,
+    kind: str,
+    out_path: str,
+    work_dir: str,
+    memory_budget: int,
+    workers: int,
+) -> dict:
+    """
+    Merge all node files, or all edge files, into one de-duplicated file.
+
+    Rows are sorted externally: each worker sorts rows into runs
+    on disk, holding no more than its share of the memory budget,
+    with rows split into partitions by key.
+    Each partition's runs are then merged in parallel,
+    combining duplicates, and the partitions are joined.
+    :param filepaths: list of node or edge file paths, in merge order
+    :param kind: str, nodes or edges
+    :param out_path: str, path to write the merged file to,
+    compressed according to its extension
+    :param work_dir: str, directory for sorted runs
+    :param memory_budget: int, MB of memory to use for sorting
+    :param workers: int, number of processes
+    :return: dict with keys files, rows_read, skipped, rows,
+    duplicates and conflicts
+    """
+    headers = {index: read_header(filepath) for index, filepath in enumerate(filepaths)}
+    inputs = [
+        (index, filepath, headers[index])
+        for index, filepath in enumerate(filepaths)
+        if all(column in headers[index] for column in KEY_COLUMNS[kind])
+    ]
+    merged_header = get_merged_header(list(headers.values()), kind)
+
+    chunk_bytes = max(1, memory_budget * 1024 * 1024 // (workers * ROW_OVERHEAD))
+    run_dir = tempfile.mkdtemp(prefix=f"{kind}_", dir=work_dir)
+    sort_tasks = [
+        {
+            "kind": kind,
+            "inputs": group,
+            "run_dir": run_dir,
+            "partitions": PARTITIONS,
+            "chunk_bytes": chunk_bytes,
+            "name": f"{i:05d}",
+        }
+        for i, group in enumerate(group_inputs(inputs, chunk_bytes))
+    ]
+    sort_results = run_tasks(sort_inputs, sort_tasks, workers)
+
+    partition_runs = [[] for _ in range(PARTITIONS)]  # type: List[list]
+    for sort_result in sort_results:
+        for partition, run_path in sort_result["runs"]:
+            partition_runs[partition].append(run_path)
+    merge_tasks = [
+        {
+            "kind": kind,
+            "run_paths": run_paths,
+            "headers": headers,
+            "merged_header": merged_header,
+            "out_path": os.path.join(run_dir, f"part_{partition:03d}"),
+            "work_dir": run_dir,
+        }
+        for partition, run_paths in enumerate(partition_runs)
+    ]
+    merge_results = run_tasks(merge_partition, merge_tasks, workers)
+
+    # The merged file is only moved into place once complete
+    tmp_path = compressed_path(
+        strip_compression(out_path) + ".tmp", get_compression(out_path)
+    )
+    with open_file(tmp_path, "wb", workers) as outfile:
+        outfile.write(("\t".join(merged_header) + "\n").encode("utf-8"))
+        for merge_task in merge_tasks:
+            with open(merge_task["out_path"], "rb") as part_file:
+                shutil.copyfileobj(part_file, outfile)
+            os.remove(merge_task["out_path"])
+    os.replace(tmp_path, out_path)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    stats = {
+        "files": len(inputs),
+        "rows_read": sum(result["rows"] for result in sort_results),
+        "skipped": sum(result["skipped"] for result in sort_results),
+    }
+    for field in ["rows", "duplicates", "conflicts"]:
+        stats[field] = sum(result[field] for result in merge_results)
+
+    return stats
+
+
+def merge_graph(
+    tx_path: str,
+    output_dir: str,
+    name: str = MERGED_NAME,
+    memory_budget: int = 1024,
+    workers: int = 1,
+    compression: str = "",
+) -> dict:
+    """
+    Merge all transforms into one graph, without duplicate nodes or edges.
+
+    Nodes with the same ID, and edges with the same subject,
+    predicate and object, are merged into one, as KGX would
+    otherwise flag them as duplicates.
+    The output is the same for any number of workers.
+    :param tx_path: str, path to the transforms, with one directory per ontology
+    :param output_dir: str, directory to write the merged graph to
+    :param name: str, name of the merged graph, used in file names
+    :param memory_budget: int, MB of memory to use for sorting,
+    shared between workers
+    :param workers: int, number of processes
+    :param compression: str, compression type for the merged graph
+    (gzip or zstd), or empty string to not compress it
+    :return: dict with keys nodes and edges, each a dict of counts,
+    as returned by merge_kind, and paths (list of merged file paths)
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    inputs = find_merge_inputs(tx_path)
+    stats = {"paths": []}  # type: dict
+    # Runs may be as large as the graph, so they're kept with the output
+    with tempfile.TemporaryDirectory(prefix=".merge_", dir=output_dir) as work_dir:
+        for kind, suffix in [("nodes", NODE_SUFFIX), ("edges", EDGE_SUFFIX)]:
+            out_path = compressed_path(
+                os.path.join(output_dir, f"{name}_{suffix}"), compression
+            )
+            print(f"Merging {len(inputs[kind])} {kind} files...")
+            stats[kind] = merge_kind(
+                inputs[kind], kind, out_path, work_dir, memory_budget, workers
+            )
+            stats["paths"].append(out_path)
+
+    return stats
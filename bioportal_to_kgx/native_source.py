@@ -0,0 +1,92 @@
+"""A KGX source reading ontologies directly from 4store dump files."""
+
+import os
+import tempfile
+import typing
+from typing import Any, Optional
+
+import kgx.cli  # type: ignore
+from kgx.source.obograph_source import ObographSource  # type: ignore
+from kgx.transformer import SOURCE_MAP  # type: ignore
+
+from bioportal_to_kgx.dump_utils import get_header_offset
+from bioportal_to_kgx.ntriples_utils import (get_obograph_edges,
+                                             get_obograph_nodes, load_triples,
+                                             open_triple_store)
+
+# Input format name to use with KGX
+NATIVE_FORMAT = "bioportal-nt"
+
+
+class NativeObographSource(ObographSource):
+    """
+    Read a dump file as if it were OBO Graph JSON.
+
+    Nodes and edges are built straight from the N-Triples
+    in the dump body, rather than from a JSON written by ROBOT.
+    Everything else, including how IDs, categories and
+    predicates are assigned, is as in ObographSource.
+    """
+
+    def parse(
+        self,
+        filename: str,
+        format: str = NATIVE_FORMAT,
+        compression: Optional[str] = None,
+        **kwargs: Any,
+    ) -> typing.Generator:
+        """
+        Read a dump file and yield records.
+
+        The dump body is loaded into a temporary triple store
+        on disk, then nodes are yielded, followed by edges.
+        :param filename: str, path to the dump file
+        :param format: str, the format (bioportal-nt)
+        :param compression: not used
+        :param kwargs: any additional arguments
+        :return: generator of node and edge records
+        """
+        self.set_provenance_map(kwargs)
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            conn = open_triple_store(os.path.join(store_dir, "triples.db"))
+            try:
+                counts = load_triples(filename, get_header_offset(filename), conn)
+                if counts["malformed"] > 0:
+                    print(f"Skipped {counts['malformed']} malformed triple(s).")
+                if counts["unsupported"] > 0:
+                    print(
+                        f"Skipped {counts['unsupported']} triple(s) using "
+                        "class expressions not handled by the native engine "
+                        "(e.g., equivalentClass) - ROBOT relax may find "
+                        "more edges for this ontology."
+                    )
+                for node in get_obograph_nodes(conn):
+                    yield self.read_node(node)
+                for edge in get_obograph_edges(conn):
+                    yield self.read_edge(edge)
+            finally:
+                conn.close()
+
+
+def native_transform(filepath: str, outpath: str, knowledge_sources: list) -> None:
+    """
+    Transform a dump file to KGX TSV without ROBOT.
+
+    Handles subclasses, labels, definitions, synonyms, xrefs
+    and simple existential restrictions. Raises the same errors
+    as a KGX transform.
+    :param filepath: str, path to the dump file
+    :param outpath: str, path and prefix for the node and edge files
+    :param knowledge_sources: list of (knowledge source field, value) tuples
+    """
+    SOURCE_MAP[NATIVE_FORMAT] = NativeObographSource
+
+    kgx.cli.transform(
+        inputs=[filepath],
+        input_format=NATIVE_FORMAT,
+        output=outpath,
+        output_format="tsv",
+        stream=True,
+        knowledge_sources=knowledge_sources,
+    )
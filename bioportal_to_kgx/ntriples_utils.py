@@ -0,0 +1,336 @@
+"""Functions for reading ontologies directly from N-Triples dump bodies."""
+
+import io
+import os
+import re
+import sqlite3
+from itertools import groupby
+from typing import Iterator, Optional
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+RDFS_SUBCLASS_OF = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+OWL = "http://www.w3.org/2002/07/owl#"
+OBO_IN_OWL = "http://www.geneontology.org/formats/oboInOwl#"
+IAO_DEFINITION = "http://purl.obolibrary.org/obo/IAO_0000115"
+SKOS_EXACT_MATCH = "http://www.w3.org/2004/02/skos/core#exactMatch"
+
+# Declared entity types, and the OBO Graph node types they become
+ENTITY_TYPES = {
+    OWL + "Class": "CLASS",
+    OWL + "ObjectProperty": "PROPERTY",
+    OWL + "DatatypeProperty": "PROPERTY",
+    OWL + "AnnotationProperty": "PROPERTY",
+    OWL + "NamedIndividual": "INDIVIDUAL",
+}
+
+SYNONYM_PREDICATES = {
+    OBO_IN_OWL + "hasExactSynonym": "hasExactSynonym",
+    OBO_IN_OWL + "hasRelatedSynonym": "hasRelatedSynonym",
+    OBO_IN_OWL + "hasBroadSynonym": "hasBroadSynonym",
+    OBO_IN_OWL + "hasNarrowSynonym": "hasNarrowSynonym",
+}
+
+# Kept as OBO Graph basicPropertyValues, as KGX uses them
+BASIC_PROPERTY_PREDICATES = {OBO_IN_OWL + "hasOBONamespace", SKOS_EXACT_MATCH}
+
+# Parts of simple existential restrictions
+RESTRICTION_PREDICATES = {
+    OWL + "onProperty": "onProperty",
+    OWL + "someValuesFrom": "someValuesFrom",
+}
+
+# Constructs that ROBOT relax would turn into edges,
+# but are not handled here - counted so they can be reported
+UNSUPPORTED_PREDICATES = {
+    OWL + "equivalentClass",
+    OWL + "intersectionOf",
+    OWL + "unionOf",
+}
+
+# Parses lines not split by single spaces
+TRIPLE_PATTERN = re.compile(
+    r'^\s*(<[^>]*>|_:\S+)\s+(<[^>]*>)\s+'
+    r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[\w-]+|\^\^<[^>]*>)?)\s*\.\s*$'
+)
+ESCAPE_PATTERN = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+
+# Rows to insert at once while loading
+BATCH_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE entities (iri TEXT, type TEXT);
+CREATE TABLE annotations (iri TEXT, kind TEXT, pred TEXT, val TEXT);
+CREATE TABLE subclasses (sub TEXT, obj TEXT);
+CREATE TABLE restrictions (bnode TEXT, part TEXT, obj TEXT);
+"""
+
+INDEXES = """
+CREATE INDEX annotations_iri ON annotations (iri);
+CREATE INDEX restrictions_bnode ON restrictions (bnode, part);
+"""
+
+
+def unescape(value: str) -> str:
+    """
+    Decode N-Triples escape sequences in a literal.
+
+    :param value: str, literal value between its quotes
+    :return: str, decoded value
+    """
+    if "\\" not in value:
+        return value
+
+    def decode(match: re.Match) -> str:
+        escape = match.group(1)
+        if escape[0] in "uU":
+            return chr(int(escape[1:], 16))
+        return ESCAPES.get(escape, escape)
+
+    return ESCAPE_PATTERN.sub(decode, value)
+
+
+def parse_object(term: str) -> tuple:
+    """
+    Parse the object of a triple.
+
+    :param term: str, object as written in N-Triples
+    :return: tuple of (value, language tag), where IRIs lose their
+    angle brackets, blank nodes keep their _: prefix,
+    and literals are decoded. Language tag is empty if not given.
+    """
+    if term.startswith("<"):
+        return (term[1:-1], "")
+    if term.startswith('"'):
+        end = term.rfind('"')
+        suffix = term[end + 1 :]
+        lang = suffix[1:] if suffix.startswith("@") else ""
+        return (unescape(term[1:end]), lang)
+
+    return (term, "")
+
+
+def parse_triple(line: str) -> Optional[tuple]:
+    """
+    Split a line of N-Triples into its parts.
+
+    Most lines are split by single spaces,
+    so that is tried before a full pattern match.
+    :param line: str, one line of N-Triples
+    :return: tuple of (subject, predicate IRI, object as written),
+    or None if the line is blank, a comment, or malformed
+    """
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+        return None
+
+    parts = line.split(" ", 2)
+    if (
+        len(parts) == 3
+        and parts[1].startswith("<")
+        and parts[1].endswith(">")
+        and parts[2].endswith(" .")
+    ):
+        subject, predicate, term = parts[0], parts[1], parts[2][:-2].rstrip()
+    else:
+        match = TRIPLE_PATTERN.match(line)
+        if not match:
+            return None
+        subject, predicate, term = match.groups()
+
+    if subject.startswith("<"):
+        subject = subject[1:-1]
+
+    return (subject, predicate[1:-1], term)
+
+
+def open_triple_store(db_path: str) -> sqlite3.Connection:
+    """
+    Create a store for the parts of an ontology used in transforms.
+
+    The store is a sqlite database on disk,
+    so memory use stays bounded for large ontologies.
+    :param db_path: str, path to database file to create
+    :return: sqlite3 connection
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+
+    return conn
+
+
+def load_triples(
+    filepath: str, header_offset: int, conn: sqlite3.Connection
+) -> dict:
+    """
+    Read a dump body into a triple store, in one pass.
+
+    Only triples describing entities, labels, definitions,
+    synonyms, xrefs, deprecation, subclasses and simple
+    existential restrictions are kept.
+    :param filepath: str, path to the dump file
+    :param header_offset: int, byte offset of the first line after the header
+    :param conn: sqlite3 connection, from open_triple_store
+    :return: dict of counts, with keys
+    triples (int), malformed (int), and unsupported (int)
+    """
+    counts = {"triples": 0, "malformed": 0, "unsupported": 0}
+    rows = {"entities": [], "annotations": [], "subclasses": [], "restrictions": []}
+    inserts = {
+        "entities": "INSERT INTO entities VALUES (?, ?)",
+        "annotations": "INSERT INTO annotations VALUES (?, ?, ?, ?)",
+        "subclasses": "INSERT INTO subclasses VALUES (?, ?)",
+        "restrictions": "INSERT INTO restrictions VALUES (?, ?, ?)",
+    }
+
+    def flush(table: str) -> None:
+        conn.executemany(inserts[table], rows[table])
+        rows[table].clear()
+
+    with open(filepath, "rb") as rawfile:
+        rawfile.seek(header_offset)
+        infile = io.TextIOWrapper(rawfile, encoding="utf-8", errors="replace")
+        for line in infile:
+            triple = parse_triple(line)
+            if not triple:
+                if line.strip() and not line.lstrip().startswith("#"):
+                    counts["malformed"] = counts["malformed"] + 1
+                continue
+            counts["triples"] = counts["triples"] + 1
+            subject, predicate, term = triple
+
+            if predicate in UNSUPPORTED_PREDICATES:
+                counts["unsupported"] = counts["unsupported"] + 1
+                continue
+
+            if predicate == RDF_TYPE:
+                value = parse_object(term)[0]
+                if value in ENTITY_TYPES and not subject.startswith("_:"):
+                    rows["entities"].append((subject, ENTITY_TYPES[value]))
+                table = "entities"
+            elif predicate == RDFS_SUBCLASS_OF:
+                rows["subclasses"].append((subject, parse_object(term)[0]))
+                table = "subclasses"
+            elif predicate in RESTRICTION_PREDICATES:
+                rows["restrictions"].append(
+                    (subject, RESTRICTION_PREDICATES[predicate], parse_object(term)[0])
+                )
+                table = "restrictions"
+            else:
+                value, lang = parse_object(term)
+                if predicate == RDFS_LABEL:
+                    annotation = (subject, "lbl", lang, value)
+                elif predicate == IAO_DEFINITION:
+                    annotation = (subject, "definition", "", value)
+                elif predicate in SYNONYM_PREDICATES:
+                    annotation = (
+                        subject,
+                        "synonym",
+                        SYNONYM_PREDICATES[predicate],
+                        value,
+                    )
+                elif predicate == OBO_IN_OWL + "hasDbXref":
+                    annotation = (subject, "xref", "", value)
+                elif predicate == OWL + "deprecated":
+                    annotation = (subject, "deprecated", "", value)
+                elif predicate in BASIC_PROPERTY_PREDICATES:
+                    annotation = (subject, "basic", predicate, value)
+                else:
+                    continue
+                rows["annotations"].append(annotation)
+                table = "annotations"
+
+            if len(rows[table]) >= BATCH_SIZE:
+                flush(table)
+
+        infile.detach()
+
+    for table in rows:
+        flush(table)
+    conn.executescript(INDEXES)
+    conn.commit()
+
+    return counts
+
+
+def get_obograph_nodes(conn: sqlite3.Connection) -> Iterator[dict]:
+    """
+    Get nodes from a triple store, as OBO Graph node objects.
+
+    These are shaped like the nodes ROBOT writes to OBO Graph JSON,
+    so they may be read by KGX in the same way.
+    Every declared class, property and individual is a node.
+    :param conn: sqlite3 connection to a loaded triple store
+    :return: iterator of dicts
+    """
+    cursor = conn.execute(
+        "SELECT e.iri, e.type, a.kind, a.pred, a.val "
+        "FROM (SELECT iri, MIN(type) AS type FROM entities GROUP BY iri) AS e "
+        "LEFT JOIN annotations AS a ON a.iri = e.iri "
+        "ORDER BY e.iri, a.rowid"
+    )
+
+    for (iri, node_type), rows in groupby(cursor, key=lambda row: row[:2]):
+        node = {"id": iri, "type": node_type}  # type: dict
+        meta = {}  # type: dict
+        labels = []
+        for _, _, kind, pred, val in rows:
+            if kind == "lbl":
+                labels.append((pred, val))
+            elif kind == "definition":
+                meta["definition"] = {"val": val}
+            elif kind == "synonym":
+                meta.setdefault("synonyms", []).append({"pred": pred, "val": val})
+            elif kind == "xref":
+                meta.setdefault("xrefs", []).append({"val": val})
+            elif kind == "deprecated":
+                if val.lower() == "true":
+                    meta["deprecated"] = True
+            elif kind == "basic":
+                meta.setdefault("basicPropertyValues", []).append(
+                    {"pred": pred, "val": val}
+                )
+        if labels:
+            # Prefer English or untagged labels, as there's only one per node
+            preferred = [val for lang, val in labels if lang in ("", "en")]
+            node["lbl"] = preferred[0] if preferred else labels[0][1]
+        if meta:
+            node["meta"] = meta
+        yield node
+
+
+def get_obograph_edges(conn: sqlite3.Connection) -> Iterator[dict]:
+    """
+    Get edges from a triple store, as OBO Graph edge objects.
+
+    Subclass axioms between named classes become is_a edges.
+    Subclass axioms with a simple existential restriction
+    (i.e., X subClassOf P some Y) become edges with the property
+    as predicate, as ROBOT relax and OBO Graphs would produce.
+    :param conn: sqlite3 connection to a loaded triple store
+    :return: iterator of dicts
+    """
+    cursor = conn.execute(
+        "SELECT sub, 'is_a', obj FROM subclasses "
+        "WHERE sub NOT LIKE '\\_:%' ESCAPE '\\' AND obj NOT LIKE '\\_:%' ESCAPE '\\' "
+        "ORDER BY rowid"
+    )
+    for sub, pred, obj in cursor:
+        yield {"sub": sub, "pred": pred, "obj": obj}
+
+    cursor = conn.execute(
+        "SELECT s.sub, p.obj, f.obj FROM subclasses AS s "
+        "JOIN restrictions AS p ON p.bnode = s.obj AND p.part = 'onProperty' "
+        "JOIN restrictions AS f ON f.bnode = s.obj AND f.part = 'someValuesFrom' "
+        "WHERE s.sub NOT LIKE '\\_:%' ESCAPE '\\' "
+        "AND p.obj NOT LIKE '\\_:%' ESCAPE '\\' "
+        "AND f.obj NOT LIKE '\\_:%' ESCAPE '\\' "
+        "ORDER BY s.rowid"
+    )
+    for sub, pred, obj in cursor:
+        yield {"sub": sub, "pred": pred, "obj": obj}
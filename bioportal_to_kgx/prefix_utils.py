@@ -0,0 +1,276 @@
+"""Functions for inferring the IRI and CURIE prefixes used in transforms."""
+
+import csv
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from bioportal_to_kgx.graph_stats import get_ontology_dirs, read_lines
+from bioportal_to_kgx.graph_utils import is_node_file
+
+PREFIX_FIELDS = ["ontology", "prefix", "delimiter", "native"]
+
+# Characters that may separate a prefix from a local ID.
+# Dots are left out, as they are usually part of hostnames.
+DELIMITERS = "#/:_="
+DELIMITER_PATTERN = re.compile(f"([{re.escape(DELIMITERS)}])")
+
+# Delimiters that may also join words within a local ID, e.g., has_part
+WORD_DELIMITERS = "_="
+
+# A node is a namespace if at least this share of the IDs
+# below it end right after it, e.g., BTO in BTO:0000001
+TERMINAL_SHARE = 0.5
+
+# Children kept for each trie node. IDs past this are only counted,
+# as a node with this many children is clearly a namespace.
+MAX_CHILDREN = 1000
+
+ID_HEADING = b"id"
+
+# Numbers ending IDs, which are collapsed so IDs differing only
+# by number (e.g., most OBO and NCIT IDs) are added to the trie once
+TRAILING_DIGITS = re.compile(r"[0-9]+$")
+
+
+class TrieNode:
+    """A node in a trie of ID tokens, each a delimiter and what follows it."""
+
+    __slots__ = ["count", "ends", "terminal", "children", "spill", "spill_delimiters"]
+
+    def __init__(self) -> None:
+        """Create an empty node."""
+        self.count = 0  # IDs passing through or ending here
+        self.ends = 0  # IDs ending here
+        self.terminal = 0  # IDs with a local ID following this node
+        self.children = {}  # type: Dict[str, TrieNode]
+        self.spill = 0  # IDs below here not stored, past MAX_CHILDREN
+        self.spill_delimiters = Counter()  # type: Counter
+
+
+def tokenize_id(node_id: str) -> list:
+    """
+    Split a node ID into tokens at each delimiter.
+
+    The first token is everything before the first delimiter,
+    and each token after starts with its delimiter, so
+    joining the tokens gives the ID again.
+    :param node_id: str, node ID (a CURIE or IRI)
+    :return: list of str tokens
+    """
+    parts = DELIMITER_PATTERN.split(node_id)
+    tokens = [parts[0]]
+    for i in range(1, len(parts), 2):
+        tokens.append(parts[i] + parts[i + 1])
+
+    return tokens
+
+
+def get_local_starts(tokens: list) -> list:
+    """
+    Find which tokens of an ID could each be the whole local ID.
+
+    A token is the whole local ID if it is the last token,
+    or if it is only followed by words joined with word
+    delimiters, e.g., has in has_part.
+    Numbers following a word delimiter are instead taken as
+    the local ID, as in OBO IDs like PATO_0000001.
+    :param tokens: list of str tokens, as from tokenize_id
+    :return: list of bools, one for each token
+    """
+    local_starts = [False] * len(tokens)
+    words = False
+    for i in range(len(tokens) - 1, -1, -1):
+        local_starts[i] = i == len(tokens) - 1 or words
+        token = tokens[i]
+        if i == 0 or token[:1] not in WORD_DELIMITERS:
+            break
+        if not token[1:].isdigit():
+            words = True
+        elif i == len(tokens) - 1:
+            break
+
+    return local_starts
+
+
+def insert_id(root: TrieNode, node_id: str, count: int = 1) -> None:
+    """
+    Add a node ID to a trie.
+
+    :param root: TrieNode, root of the trie
+    :param node_id: str, node ID
+    :param count: int, number of times to add it
+    """
+    tokens = tokenize_id(node_id)
+    local_starts = get_local_starts(tokens)
+    node = root
+    node.count = node.count + count
+    for i, token in enumerate(tokens):
+        if local_starts[i]:
+            node.terminal = node.terminal + count
+        child = node.children.get(token)
+        if child is None:
+            if len(node.children) >= MAX_CHILDREN:
+                node.spill = node.spill + count
+                node.spill_delimiters[token[:1]] += count
+                return
+            child = TrieNode()
+            node.children[token] = child
+        child.count = child.count + count
+        node = child
+    node.ends = node.ends + count
+
+
+def find_namespaces(root: TrieNode) -> list:
+    """
+    Choose the namespace splits in a trie of node IDs.
+
+    Starting from the root, a node is taken as a namespace
+    if most IDs below it have a local ID right after it,
+    or if it has too many children to store.
+    Otherwise its children are checked in turn,
+    so each ID is assigned to at most one namespace.
+    :param root: TrieNode, root of the trie
+    :return: list of (prefix, delimiter, count) tuples,
+    where count is the number of IDs in the namespace
+    """
+    namespaces = []
+    pending = [(root, "")]
+    while len(pending) > 0:
+        node, path = pending.pop()
+        below = node.count - node.ends
+        if below == 0:
+            continue
+        if path and (node.spill > 0 or node.terminal / below >= TERMINAL_SHARE):
+            delimiters = node.spill_delimiters.copy()
+            for token, child in node.children.items():
+                delimiters[token[:1]] += child.count
+            namespaces.append((path, delimiters.most_common(1)[0][0], below))
+            continue
+        for token, child in node.children.items():
+            pending.append((child, path + token))
+
+    return sorted(namespaces)
+
+
+def get_native_status(ontology: str, prefix: str, ontologies: set) -> str:
+    """
+    Guess whether a prefix refers to an ontology's own classes.
+
+    :param ontology: str, ontology acronym
+    :param prefix: str, the prefix
+    :param ontologies: set of all ontology acronyms, in upper case
+    :return: str, True if the prefix is, or ends with, the acronym,
+    False if it is instead another ontology's acronym, or otherwise Unknown
+    """
+    last_token = tokenize_id(prefix)[-1].lstrip(DELIMITERS).upper()
+    if last_token == ontology.upper():
+        return "True"
+    if last_token in ontologies or last_token == "ID":
+        return "False"
+
+    return "Unknown"
+
+
+def get_node_ids(filepath: str):
+    """
+    Read the IDs from a node file, compressed or not.
+
+    :param filepath: str, path to the node file
+    :return: iterator of str IDs
+    """
+    column = 0
+    header = True
+    for data in read_lines(filepath):
+        for line in data.split(b"\n"):
+            line = line.rstrip(b"\r")
+            if header:
+                header = False
+                headings = line.split(b"\t")
+                if ID_HEADING in headings:
+                    column = headings.index(ID_HEADING)
+                continue
+            fields = line.split(b"\t", column + 1)
+            if len(fields) > column and fields[column]:
+                yield fields[column].decode("utf-8", "replace")
+
+
+def get_ontology_prefixes(ontology_dir: str) -> list:
+    """
+    Infer the prefixes used by an ontology's nodes.
+
+    Every node file in the directory is read once,
+    into a single trie. IDs are first counted with
+    any trailing number replaced by 0, so each
+    distinct pattern is only added once.
+    :param ontology_dir: str, path to the ontology's transforms
+    :return: list of (prefix, delimiter, count) tuples,
+    as returned by find_namespaces
+    """
+    patterns = Counter()  # type: Counter
+    for filename in sorted(os.listdir(ontology_dir)):
+        filepath = os.path.join(ontology_dir, filename)
+        if is_node_file(filepath):
+            patterns.update(
+                TRAILING_DIGITS.sub("0", node_id) for node_id in get_node_ids(filepath)
+            )
+
+    root = TrieNode()
+    for pattern, count in patterns.items():
+        insert_id(root, pattern, count)
+
+    return find_namespaces(root)
+
+
+def infer_prefixes(tx_path: str, workers: int = 1, min_count: int = 1) -> list:
+    """
+    Infer the prefixes used by each ontology in a tree of transforms.
+
+    Ontologies are read in parallel processes.
+    :param tx_path: str, path to the transforms, with one directory per ontology
+    :param workers: int, number of processes to read ontologies with
+    :param min_count: int, leave out prefixes used by fewer nodes than this
+    :return: list of dicts with the keys in PREFIX_FIELDS
+    """
+    ontology_dirs = get_ontology_dirs(tx_path)
+    ontologies = set(os.path.basename(path).upper() for path in ontology_dirs)
+
+    if workers > 1 and len(ontology_dirs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            all_prefixes = list(executor.map(get_ontology_prefixes, ontology_dirs))
+    else:
+        all_prefixes = [get_ontology_prefixes(path) for path in ontology_dirs]
+
+    rows = []  # type: List[dict]
+    for ontology_dir, prefixes in zip(ontology_dirs, all_prefixes):
+        ontology = os.path.basename(ontology_dir)
+        for prefix, delimiter, count in prefixes:
+            if count < min_count:
+                continue
+            rows.append(
+                {
+                    "ontology": ontology,
+                    "prefix": prefix,
+                    "delimiter": delimiter,
+                    "native": get_native_status(ontology, prefix, ontologies),
+                }
+            )
+
+    return rows
+
+
+def write_prefixes(rows: list, output_path: str) -> None:
+    """
+    Write inferred prefixes, in the same format as the curated prefixes.
+
+    :param rows: list of dicts, as returned by infer_prefixes
+    :param output_path: str, path to the TSV to write
+    """
+    with open(output_path, "w", newline="") as outfile:
+        writer = csv.DictWriter(
+            outfile, fieldnames=PREFIX_FIELDS, delimiter="\t", lineterminator="\n"
+        )
+        writer.writeheader()
+        writer.writerows(rows)
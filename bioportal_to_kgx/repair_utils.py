@@ -0,0 +1,226 @@
+"""Functions for finding and repairing known problems in transform inputs."""
+
+import os
+import re
+from typing import Dict
+
+from bioportal_to_kgx.compress_utils import (compressed_path, get_compression,
+                                             open_file, strip_compression)
+from bioportal_to_kgx.ntriples_utils import parse_triple
+
+# Size of blocks to read when scanning files
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# IRIs with the file scheme get turned into CURIEs with a "file"
+# prefix (or "file:C" on Windows paths), which KGX can't parse.
+# Only string values starting with the scheme are matched,
+# so text merely mentioning a file is left alone.
+BAD_CURIE_START = b'"file:'
+BAD_CURIE_PATTERN = re.compile(rb'"file:(?:C:)?')
+BAD_CURIE_REPLACEMENT = b'"OBO:'
+
+# Longest possible match of BAD_CURIE_PATTERN
+BAD_CURIE_MAX_LENGTH = len(b'"file:C:')
+
+# Comments are the usual cause of failed ROBOT relax runs,
+# typically due to null values or broken literals
+COMMENT_PREDICATE = b"<http://www.w3.org/2000/01/rdf-schema#comment>"
+NULL_LITERAL_MARKERS = [b"\x00", b"\\u0000", b"^^<null>", b"^^<>"]
+
+# Lines following a broken literal that don't start like a triple
+# are assumed to be the rest of that literal
+TRIPLE_STARTS = (b"<", b"_:", b"#")
+
+
+def has_bad_curie(filepath: str) -> bool:
+    """
+    Check if an obojson file has malformed CURIEs KGX will fail on.
+
+    The file is read in binary blocks, without parsing,
+    and may be compressed. Reading stops at the first match.
+    :param filepath: str, path to file
+    :return: bool, True if any value starts with a file: prefix
+    """
+    overlap = len(BAD_CURIE_START) - 1
+    with open_file(filepath, "rb") as infile:
+        remainder = b""
+        while True:
+            block = infile.read(BLOCK_SIZE)
+            if not block:
+                return False
+            data = remainder + block
+            if BAD_CURIE_START in data:
+                return True
+            remainder = data[-overlap:]
+
+
+def repair_blocks(infile, outfile) -> int:
+    """
+    Copy a file in blocks, replacing malformed CURIE prefixes.
+
+    Matches spanning two blocks are held back until
+    the next block is read, so they are replaced too.
+    :param infile: binary file object to read
+    :param outfile: binary file object to write
+    :return: int, number of prefixes replaced
+    """
+    count = 0
+    remainder = b""
+    while True:
+        block = infile.read(BLOCK_SIZE)
+        data = remainder + block
+        remainder = b""
+        if block:
+            # Every match starts with a quote, so a match can only
+            # be cut off if it starts near the end of the block
+            cut = data.rfind(b'"')
+            if cut != -1 and len(data) - cut < BAD_CURIE_MAX_LENGTH:
+                remainder = data[cut:]
+                data = data[:cut]
+        data, replaced = BAD_CURIE_PATTERN.subn(BAD_CURIE_REPLACEMENT, data)
+        count = count + replaced
+        outfile.write(data)
+        if not block:
+            return count
+
+
+def repair_bad_curies(filepath: str, threads: int = 1) -> int:
+    """
+    Replace malformed CURIE prefixes in an obojson file, if it has any.
+
+    The file is only rewritten if has_bad_curie finds a problem.
+    The repaired file is written to a temporary file,
+    with the same compression, which then replaces the original,
+    so the original is left as it was if the repair is interrupted.
+    :param filepath: str, path to file
+    :param threads: int, number of threads to compress with
+    :return: int, number of prefixes replaced
+    """
+    if not has_bad_curie(filepath):
+        return 0
+
+    compression = get_compression(filepath)
+    tmp_filepath = compressed_path(strip_compression(filepath) + ".tmp", compression)
+    try:
+        with open_file(filepath, "rb") as infile, open_file(
+            tmp_filepath, "wb", threads
+        ) as outfile:
+            count = repair_blocks(infile, outfile)
+        os.replace(tmp_filepath, filepath)
+    finally:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+    return count
+
+
+def get_comment_fix(line: bytes) -> str:
+    """
+    Check a comment triple for problems known to make ROBOT fail.
+
+    :param line: bytes, one line of N-Triples with an rdfs:comment predicate
+    :return: str, name of the fix needed (null_comment or
+    malformed_comment), or empty string if the line is fine
+    """
+    if any(null in line for null in NULL_LITERAL_MARKERS):
+        return "null_comment"
+    try:
+        if parse_triple(line.decode("utf-8")) is None:
+            return "malformed_comment"
+    except UnicodeDecodeError:
+        return "malformed_comment"
+
+    return ""
+
+
+def copy_range(filepath: str, outfile, start: int, end: int) -> None:
+    """
+    Copy part of a file to an open file, in blocks.
+
+    :param filepath: str, path to the file to copy from
+    :param outfile: binary file object to write
+    :param start: int, byte offset to start copying from
+    :param end: int, byte offset to stop copying at
+    """
+    with open(filepath, "rb") as infile:
+        infile.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = infile.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            outfile.write(block)
+            remaining = remaining - len(block)
+
+
+def sanitize_dump(filepath: str, header_offset: int, out_filepath: str) -> dict:
+    """
+    Remove triples known to make ROBOT fail from the body of a dump file.
+
+    The body is scanned in one pass, in large blocks.
+    Only blocks containing comment triples are checked line by line,
+    for null values and malformed literals.
+    Broken comment triples are removed, as are any lines
+    following one that look like the rest of a broken literal.
+    Nothing is written unless a fix is needed:
+    the sanitized body is only written to out_filepath
+    once the first problem is found, starting with a copy
+    of everything before it.
+    :param filepath: str, path to the dump file
+    :param header_offset: int, byte offset of the first line after the header
+    :param out_filepath: str, path to write the sanitized body to
+    :return: dict of fix names to counts of lines removed,
+    empty if the body was fine and nothing was written
+    """
+    fixes = {}  # type: Dict[str, int]
+    outfile = None
+    offset = header_offset
+    continuing = ""  # Fix applied to the previous line, if it may continue
+
+    try:
+        with open(filepath, "rb") as infile:
+            infile.seek(header_offset)
+            remainder = b""
+            while True:
+                block = infile.read(BLOCK_SIZE)
+                data = remainder + block
+                if block:
+                    # The last piece may continue in the next block
+                    end = data.rfind(b"\n") + 1
+                    data, remainder = data[:end], data[end:]
+                else:
+                    remainder = b""
+                    if data and not data.endswith(b"\n"):
+                        data = data + b"\n"
+
+                if not continuing and COMMENT_PREDICATE not in data:
+                    if outfile:
+                        outfile.write(data)
+                    offset = offset + len(data)
+                else:
+                    kept = []
+                    for line in data.split(b"\n")[:-1]:
+                        fix = ""
+                        if COMMENT_PREDICATE in line:
+                            fix = get_comment_fix(line)
+                        elif continuing and not line.startswith(TRIPLE_STARTS):
+                            fix = continuing
+                        continuing = fix if fix == "malformed_comment" else ""
+                        if fix:
+                            fixes[fix] = fixes.get(fix, 0) + 1
+                            if not outfile:
+                                outfile = open(out_filepath, "wb")
+                                copy_range(filepath, outfile, header_offset, offset)
+                        elif outfile:
+                            kept.append(line)
+                        offset = offset + len(line) + 1
+                    if outfile and kept:
+                        outfile.write(b"\n".join(kept) + b"\n")
+
+                if not block:
+                    break
+    finally:
+        if outfile:
+            outfile.close()
+
+    return fixes
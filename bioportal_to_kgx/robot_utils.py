@@ -1,6 +1,7 @@
 """Functions for working with ROBOT."""
 
 import os
+import re
 
 import sh  # type: ignore
 from sh import chmod  # type: ignore
@@ -10,6 +11,15 @@ from post_setup.post_setup import robot_setup
 # Note that sh module can take environment variables, see
 # https://amoffat.github.io/sh/sections/special_arguments.html#env
 
+# Bounds for ROBOT heap sizes (in MB) when sizing by input
+MIN_JAVA_HEAP_MB = 2048
+DEFAULT_JAVA_HEAP_MB = 12288
+
+# Approximate heap needed (in MB) per MB of N-Triples input.
+# OWLAPI holds the full ontology in memory while relaxing,
+# and object overhead is much larger than the serialized triples.
+HEAP_MB_PER_INPUT_MB = 12
+
 
 def initialize_robot(robot_path: str) -> list:
     """
@@ -42,46 +52,53 @@ def initialize_robot(robot_path: str) -> list:
     return [robot_command, env]
 
 
-def relax_ontology(
-    robot_path: str, input_path: str, output_path: str, robot_env: dict
-) -> bool:
+def estimate_robot_heap(input_path: str, max_heap_mb: int) -> int:
     """
-    Run the ROBOT relax command on a single ontology.
+    Estimate the Java heap size ROBOT needs for a single ontology.
+
+    Scales with the size of the input file,
+    but never goes beyond the given maximum.
+    :param input_path: Ontology file to be processed
+    :param max_heap_mb: int, largest heap size to return, in MB
+    :return: int, heap size in MB
+    """
+    input_mb = os.path.getsize(input_path) / (1024 * 1024)
+    heap_mb = int(MIN_JAVA_HEAP_MB + (HEAP_MB_PER_INPUT_MB * input_mb))
+
+    return min(heap_mb, max_heap_mb)
+
+
+def set_robot_heap(robot_env: dict, heap_mb: int) -> dict:
+    """
+    Get a copy of the ROBOT environment with a different heap size.
 
-    Has a three-hour timeout limit - process is killed if it takes this long.
-    :param robot_path: Path to ROBOT files
-    :param input_owl: Ontology file to be relaxed
-    :param output_owl: Ontology file to be created (needs valid ROBOT suffix)
     :param robot_env: dict of environment variables, including ROBOT_JAVA_ARGS
-    :return: True if completed without errors, False if errors
+    :param heap_mb: int, heap size in MB
+    :return: dict of environment variables
     """
-    success = False
+    env = robot_env.copy()
+    env["ROBOT_JAVA_ARGS"] = f"-Xmx{heap_mb}m -XX:+UseG1GC"
 
-    print(f"Relaxing {input_path} to {output_path}...")
+    return env
 
-    robot_command = sh.Command(robot_path)
 
-    try:
-        robot_command(
-            "relax",
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-            "-vvv",
-            _env=robot_env,
-            _timeout=10800,
-        )
-        print("Complete.")
-        success = True
-    except sh.ErrorReturnCode_1 as e:  # If ROBOT runs but returns an error
-        print(f"ROBOT encountered an error: {e}")
-        success = False
-    except sh.SignalException_SIGKILL as e:  # If ROBOT encounters severe error
-        print(f"ROBOT crashed! {e}")
-        success = False
+def get_robot_heap(robot_env: dict) -> int:
+    """
+    Get the maximum heap size set in a ROBOT environment.
 
-    return success
+    :param robot_env: dict of environment variables, including ROBOT_JAVA_ARGS
+    :return: int, heap size in MB
+    """
+    units = {"k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+
+    match = re.search(r"-Xmx(\d+)([kmgt]?)", robot_env.get("ROBOT_JAVA_ARGS", ""), re.I)
+    if not match:
+        return DEFAULT_JAVA_HEAP_MB
+    size, unit = match.groups()
+    if unit == "":  # Plain bytes
+        return int(int(size) / (1024 * 1024))
+
+    return int(int(size) * units[unit.lower()])
 
 
 def robot_convert(
@@ -167,47 +184,6 @@ def merge_and_convert_ontology(
     return success
 
 
-def measure_ontology(
-    robot_path: str, input_path: str, output_log: str, robot_env: dict
-) -> bool:
-    """
-    Run the ROBOT measure command on a single ontology.
-
-    Yield all metrics as string and as a log file.
-    :param robot_path: Path to ROBOT files
-    :param input_owl: Ontology file to be validated
-    :param output_owl: Location of log file to be created
-    :param robot_env: dict of environment variables, including ROBOT_JAVA_ARGS
-    :return: True if completed without errors, False if errors
-    """
-    success = False
-
-    print(f"Obtaining metrics for {input_path}...")
-
-    robot_command = sh.Command(robot_path)
-
-    try:
-        robot_command(
-            "measure",
-            "--input",
-            input_path,
-            "--format",
-            "tsv",
-            "--metrics",
-            "all",
-            "--output",
-            output_log,
-            _env=robot_env,
-        )
-        print(f"Complete. See log in {output_log}")
-        success = True
-    except sh.ErrorReturnCode_1 as e:  # If ROBOT runs but returns an error
-        print(f"ROBOT encountered an error: {e}")
-        success = False
-
-    return success
-
-
 def robot_remove(
     robot_path: str,
     input_path: str,
@@ -252,82 +228,88 @@ def robot_remove(
     return success
 
 
-def robot_report(
-    robot_path: str, input_path: str, output_path: str, robot_env: dict
-) -> bool:
+def report_has_errors(report_path: str) -> bool:
     """
-    Run the ROBOT report command on a single ontology.
+    Check if a ROBOT report lists any errors.
 
-    :param robot_path: Path to ROBOT files
-    :param input_path: Ontology file for input
-    :param output_path: Path to create report at
-    :param robot_env: dict of environment variables, including ROBOT_JAVA_ARGS
-    :return: True if completed without errors, False if errors
+    :param report_path: str, path to a ROBOT report, as TSV
+    :return: bool, True if any row has the ERROR level
     """
-    success = False
+    with open(report_path) as report_file:
+        return any(line.startswith("ERROR\t") for line in report_file)
 
-    print(f"Generating ROBOT report for {input_path}...")
-
-    robot_command = sh.Command(robot_path)
-
-    try:
-        robot_command(
-            "report",
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-            "--format",
-            "tsv",
-            _env=robot_env,
-        )
-        print(f"No errors here! See {output_path}")
-        success = True
-    except sh.ErrorReturnCode_1 as e:  # If ROBOT runs but returns an error
-        # For report, this is expected, as the error may be
-        # in the target ontology.
-        print(f"ROBOT report results: {e}\nSee {output_path}")
-        success = False
 
-    return success
-
-
-def robot_measure(
-    robot_path: str, input_path: str, output_path: str, robot_env: dict
-) -> bool:
+def robot_chain(
+    robot_path: str,
+    input_path: str,
+    robot_env: dict,
+    relaxed_path: str = "",
+    measure_path: str = "",
+    report_path: str = "",
+) -> dict:
     """
-    Run the ROBOT measure command on a single ontology, returning all metrics.
-
+    Run ROBOT measure, report, and relax as one chained command.
+
+    The input ontology is only parsed once, in a single ROBOT process.
+    Each command is optional and is run if its output path is provided.
+    Measure and report don't change the ontology, so they go first,
+    and describe the ontology as input rather than the relaxed one.
+    Report is told not to fail on problems in the target ontology,
+    so relax still runs, but is recorded as unsuccessful if it
+    lists any errors, as it would have failed on its own.
+    Has a three-hour timeout limit - process is killed if it takes this long.
     :param robot_path: Path to ROBOT files
     :param input_path: Ontology file for input
-    :param output_path: Path to create measure log at
     :param robot_env: dict of environment variables, including ROBOT_JAVA_ARGS
-    :return: True if completed without errors, False if errors
+    :param relaxed_path: Relaxed ontology file to be created
+    (needs valid ROBOT suffix)
+    :param measure_path: Path to create measure log at
+    :param report_path: Path to create report at
+    :return: dict with the name of each command run as key,
+    and True as value if it completed without errors
     """
-    success = False
-
-    print(f"Generating ROBOT measure log for {input_path}...")
+    steps = []
+    if measure_path:
+        steps.append(("measure", measure_path, ["--format", "tsv", "--metrics", "all"]))
+    if report_path:
+        steps.append(("report", report_path, ["--format", "tsv", "--fail-on", "none"]))
+    if relaxed_path:
+        steps.append(("relax", relaxed_path, []))
+
+    status = {command: False for command, _, _ in steps}
+    if len(steps) == 0:
+        return status
+
+    args = []
+    for command, output_path, options in steps:
+        args.append(command)
+        if len(args) == 1:
+            args.extend(["-vvv", "--input", input_path])
+        args.extend(options + ["--output", output_path])
+        # Clear out old outputs so we can tell which commands finished
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    print(f"Running ROBOT {', '.join(status)} on {input_path}...")
 
     robot_command = sh.Command(robot_path)
 
     try:
-        robot_command(
-            "measure",
-            "-vvv",
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-            "--format",
-            "tsv",
-            "--metrics",
-            "all",
-            _env=robot_env,
-        )
-        print(f"Complete. See {output_path}")
-        success = True
+        robot_command(*args, _env=robot_env, _timeout=10800)
+        print("Complete.")
+        for command in status:
+            status[command] = True
     except sh.ErrorReturnCode_1 as e:  # If ROBOT runs but returns an error
+        # Commands before the one with the error will have written output
         print(f"ROBOT encountered an error: {e}")
-        success = False
+        for command, output_path, _ in steps:
+            status[command] = os.path.exists(output_path)
+    except sh.SignalException_SIGKILL as e:  # If ROBOT encounters severe error
+        print(f"ROBOT crashed! {e}")
 
-    return success
+    if status.get("report") and report_has_errors(report_path):
+        # This is expected if the error is in the target ontology.
+        print(f"ROBOT report found errors in the ontology. See {report_path}")
+        status["report"] = False
+
+    return status
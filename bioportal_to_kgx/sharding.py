@@ -0,0 +1,113 @@
+"""Functions for splitting a dump run into shards, e.g., for several hosts."""
+
+import glob
+import heapq
+import os
+import re
+
+# Inserted before the extension of each shard's own outputs,
+# e.g., onto_status.shard_1_of_4.yaml
+SHARD_INFIX = ".shard_{index}_of_{count}"
+SHARD_PATTERN = re.compile(r"\.shard_(\d+)_of_(\d+)$")
+
+
+def parse_shard(value: str) -> tuple:
+    """
+    Parse a shard, given as i/N.
+
+    Shards are numbered from 1, so 1/4 to 4/4 cover a whole run.
+    :param value: str, shard index and count, e.g., 2/4
+    :return: tuple of (index, count), both ints
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be given as i/N, e.g., 1/4, not {value}.")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be from 1 to {count}, not {index}.")
+
+    return (index, count)
+
+
+def assign_shards(sizes: dict, count: int) -> list:
+    """
+    Assign files to shards, balancing their total size.
+
+    Files are taken largest first, each going to the shard
+    with the fewest bytes so far (the longest-processing-time rule),
+    with ties going to the lower shard.
+    Files of the same size are taken in order of path,
+    so every host assigns files the same way,
+    regardless of the order it found them in.
+    :param sizes: dict of file paths to sizes in bytes
+    :param count: int, number of shards
+    :return: list of lists of file paths, one for each shard
+    """
+    shards = [[] for _ in range(count)]  # type: list
+    totals = [(0, index) for index in range(count)]
+    for filepath in sorted(sizes, key=lambda path: (-sizes[path], path)):
+        total, index = heapq.heappop(totals)
+        shards[index].append(filepath)
+        heapq.heappush(totals, (total + sizes[filepath], index))
+
+    return shards
+
+
+def get_shard_files(filepaths: list, index: int, count: int) -> list:
+    """
+    Get the dump files for one shard.
+
+    :param filepaths: list of all dump file paths in the run
+    :param index: int, shard index, from 1 to count
+    :param count: int, number of shards
+    :return: list of file paths, in the order given
+    """
+    sizes = {filepath: os.path.getsize(filepath) for filepath in filepaths}
+    shard = set(assign_shards(sizes, count)[index - 1])
+    shard_filepaths = [filepath for filepath in filepaths if filepath in shard]
+
+    shard_size = sum(sizes[filepath] for filepath in shard_filepaths)
+    print(
+        f"Shard {index} of {count}: {len(shard_filepaths)} of "
+        f"{len(filepaths)} files, {shard_size / 1024 ** 2:.1f} MB."
+    )
+
+    return shard_filepaths
+
+
+def get_shard_path(filepath: str, index: int, count: int) -> str:
+    """
+    Get the path to one shard's version of an output file.
+
+    :param filepath: str, path to the output for a whole run,
+    e.g., onto_status.yaml
+    :param index: int, shard index, from 1 to count
+    :param count: int, number of shards
+    :return: str, path with the shard before the extension,
+    e.g., onto_status.shard_1_of_4.yaml
+    """
+    stem, extension = os.path.splitext(filepath)
+
+    return stem + SHARD_INFIX.format(index=index, count=count) + extension
+
+
+def find_shard_paths(filepath: str) -> dict:
+    """
+    Find the shard versions of an output file.
+
+    :param filepath: str, path to the output for a whole run
+    :return: dict of shard counts to dicts of shard
+    indices to paths, as shards from runs split
+    different ways may be found together
+    """
+    stem, extension = os.path.splitext(filepath)
+    shard_paths = {}  # type: dict
+    for shard_path in glob.glob(glob.escape(stem) + ".shard_*" + extension):
+        shard_stem = os.path.splitext(shard_path)[0]
+        match = SHARD_PATTERN.search(shard_stem)
+        if not match or shard_stem[: match.start()] != stem:
+            continue
+        index, count = int(match.group(1)), int(match.group(2))
+        shard_paths.setdefault(count, {})[index] = shard_path
+
+    return shard_paths
@@ -1,19 +1,85 @@
 """Functions to produce transform statistics."""
 
+from typing import Optional
+
 import yaml
 
 
-def make_transform_stats(results: list, output_file: str) -> None:
+def make_transform_stats(results: list, output_file: str,
+                         shard: Optional[tuple] = None) -> None:
     """Produce a simple YAML output containing select transform statistics.
 
     :param results: list of dicts, each with
     key:value of [id:str, status:str,
-    nodecount:int, edgecount:int]
+    nodecount:int, edgecount:int, fixes:dict,
+    wall_seconds:float, cpu_seconds:float,
+    peak_rss_mb:float, slowest_stage:str],
+    though ontologies that did not finish
+    may only have some of these
+    :param output_file: str, path to write to
+    :param shard: tuple of (index, count) if the results
+    are only for one shard of a run, to be merged later
+    with merge_transform_stats
     :return: None
     """
-    stats = {"ontologies": results}
+    stats = {}  # type: dict
+    if shard:
+        stats["shard"] = {"index": shard[0], "count": shard[1]}
+    stats["ontologies"] = results
 
     with open(output_file, 'w') as stats_file:
         stats_file.write(yaml.dump(stats,
                                    default_flow_style=False,
                                    sort_keys=False))
+
+
+def merge_transform_stats(fragment_paths: dict, count: int,
+                          output_file: str, summary_file: str = "") -> dict:
+    """Merge the transform statistics written by each shard of a run.
+
+    Ontologies are listed in shard order, then in the
+    order each shard transformed them.
+    If an ontology was transformed by more than one shard
+    (e.g., a shard was rerun after the run was split
+    differently), a successful transform is kept over a
+    failed one, and otherwise the last one is kept.
+    :param fragment_paths: dict of shard indices to paths
+    of their transform statistics
+    :param count: int, number of shards in the run
+    :param output_file: str, path to write merged statistics to
+    :param summary_file: str, path to also write the summary to,
+    as YAML, or empty string to not write it
+    :return: dict with keys ok and failed (lists of ontology ids),
+    and missing_shards (list of shard indices without statistics)
+    """
+    merged = {}  # type: dict
+    for index in sorted(fragment_paths):
+        with open(fragment_paths[index]) as stats_file:
+            stats = yaml.safe_load(stats_file) or {}
+        for result in stats.get("ontologies") or []:
+            previous = merged.get(result["id"])
+            if previous:
+                print(f"{result['id']} appears in more than one shard.")
+                if previous["status"] == "OK" and result["status"] != "OK":
+                    continue
+                del merged[result["id"]]
+            merged[result["id"]] = result
+
+    make_transform_stats(list(merged.values()), output_file)
+
+    summary = {
+        "ok": [ontology_id for ontology_id, result in merged.items()
+               if result["status"] == "OK"],
+        "failed": [ontology_id for ontology_id, result in merged.items()
+                   if result["status"] != "OK"],
+        "missing_shards": [index for index in range(1, count + 1)
+                           if index not in fragment_paths],
+    }
+
+    if summary_file:
+        with open(summary_file, 'w') as summary_out:
+            summary_out.write(yaml.dump({"shards": count, **summary},
+                                        default_flow_style=False,
+                                        sort_keys=False))
+
+    return summary
@@ -0,0 +1,292 @@
+"""Functions for generating synthetic 4store dumps and a stand-in for ROBOT."""
+
+import hashlib
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+from typing import Iterator
+
+from bioportal_to_kgx.compress_utils import open_file
+from bioportal_to_kgx.dump_utils import DATA_FILENAME_LENGTH, NAMESPACE
+from bioportal_to_kgx.ntriples_utils import (IAO_DEFINITION, OBO_IN_OWL, OWL,
+                                             RDF_TYPE, RDFS_LABEL,
+                                             RDFS_SUBCLASS_OF,
+                                             get_obograph_edges,
+                                             get_obograph_nodes, load_triples,
+                                             open_triple_store)
+
+OBO = "http://purl.obolibrary.org/obo/"
+RDFS_COMMENT = "http://www.w3.org/2000/01/rdf-schema#comment"
+PART_OF = OBO + "BFO_0000050"
+
+# Columns of synthetic KGX node and edge files
+NODE_COLUMNS = [
+    "id",
+    "category",
+    "name",
+    "description",
+    "xref",
+    "provided_by",
+    "synonym",
+    "iri",
+    "same_as",
+]
+EDGE_COLUMNS = ["id", "subject", "predicate", "object", "relation", "knowledge_source"]
+
+# ROBOT commands the stand-in handles
+FAKE_ROBOT_COMMANDS = ["relax", "measure", "report", "remove", "convert", "merge"]
+
+FAKE_ROBOT_SCRIPT = """#!{python}
+# Stand-in for ROBOT, for testing and benchmarks without Java
+import sys
+
+sys.path.insert(0, {root!r})
+from bioportal_to_kgx.synthetic import fake_robot_main
+
+sys.exit(fake_robot_main(sys.argv[1:]))
+"""
+
+
+def make_ontology_triples(
+    acronym: str,
+    classes: int,
+    rng: random.Random,
+    branching: int = 4,
+    annotations: int = 2,
+    restriction_fraction: float = 0.1,
+    file_iri_fraction: float = 0.0,
+    bad_comment_fraction: float = 0.0,
+) -> Iterator[str]:
+    """
+    Generate the N-Triples for a synthetic ontology.
+
+    Classes form a single hierarchy, each with a label,
+    some annotations (definitions, synonyms and comments, in turn),
+    and possibly an existential restriction on another class.
+    Some classes may have file: IRIs, which become malformed CURIEs,
+    or comments with null values, which make ROBOT fail,
+    so repairs can be exercised too.
+    :param acronym: str, ontology acronym, used in class IRIs
+    :param classes: int, number of classes
+    :param rng: random.Random, source of randomness
+    :param branching: int, number of subclasses per class,
+    or 0 to choose each superclass at random
+    :param annotations: int, number of annotations per class,
+    besides its label
+    :param restriction_fraction: float, fraction of classes
+    with an existential restriction
+    :param file_iri_fraction: float, fraction of classes with file: IRIs
+    :param bad_comment_fraction: float, fraction of classes
+    with a comment containing a null value
+    :return: iterator of lines of N-Triples
+    """
+    yield f"<{OBO}{acronym.lower()}.owl> <{RDF_TYPE}> <{OWL}Ontology> .\n"
+    yield f"<{PART_OF}> <{RDF_TYPE}> <{OWL}ObjectProperty> .\n"
+    yield f'<{PART_OF}> <{RDFS_LABEL}> "part of" .\n'
+
+    iris = []
+    for i in range(classes):
+        if rng.random() < file_iri_fraction:
+            iri = f"file:/synthetic/{acronym.lower()}.owl#{acronym}_{i:07d}"
+        else:
+            iri = f"{OBO}{acronym}_{i:07d}"
+        iris.append(iri)
+
+        yield f"<{iri}> <{RDF_TYPE}> <{OWL}Class> .\n"
+        yield f'<{iri}> <{RDFS_LABEL}> "{acronym} class {i}" .\n'
+        for j in range(annotations):
+            if j % 3 == 0:
+                text = f"A synthetic class, number {i}, for testing."
+                yield f'<{iri}> <{IAO_DEFINITION}> "{text}" .\n'
+            elif j % 3 == 1:
+                text = f"{acronym} term {i}"
+                yield f'<{iri}> <{OBO_IN_OWL}hasExactSynonym> "{text}"@en .\n'
+            else:
+                text = f'Comment {j} on class {i}, with \\"quotes\\".'
+                yield f'<{iri}> <{RDFS_COMMENT}> "{text}" .\n'
+        if rng.random() < bad_comment_fraction:
+            yield f'<{iri}> <{RDFS_COMMENT}> "null\\u0000" .\n'
+
+        if i > 0:
+            if branching > 0:
+                parent = iris[(i - 1) // branching]
+            else:
+                parent = iris[rng.randrange(i)]
+            yield f"<{iri}> <{RDFS_SUBCLASS_OF}> <{parent}> .\n"
+
+        if i > 0 and rng.random() < restriction_fraction:
+            bnode = f"_:r{i}"
+            target = iris[rng.randrange(i)]
+            yield f"{bnode} <{RDF_TYPE}> <{OWL}Restriction> .\n"
+            yield f"{bnode} <{OWL}onProperty> <{PART_OF}> .\n"
+            yield f"{bnode} <{OWL}someValuesFrom> <{target}> .\n"
+            yield f"<{iri}> <{RDFS_SUBCLASS_OF}> {bnode} .\n"
+
+
+def get_dump_path(out_dir: str, acronym: str) -> str:
+    """
+    Get the path for a synthetic dump file, as 4store would name it.
+
+    Files are named with 28-character hashes,
+    in directories named for the start of the hash.
+    :param out_dir: str, root of the dump
+    :param acronym: str, ontology acronym
+    :return: str, path to the dump file
+    """
+    name = hashlib.sha1(acronym.encode()).hexdigest()[:DATA_FILENAME_LENGTH]
+
+    return os.path.join(out_dir, name[0:2], name[2:4], name)
+
+
+def write_synthetic_dump(out_dir: str, sizes: list, seed: int = 0, **shape) -> list:
+    """
+    Write a synthetic 4store dump, with one file per ontology.
+
+    Each file has the usual metadata header,
+    followed by the N-Triples for the ontology.
+    :param out_dir: str, root of the dump to create
+    :param sizes: list of ints, number of classes in each ontology
+    :param seed: int, seed for randomness, so dumps can be recreated
+    :param shape: any options for make_ontology_triples
+    :return: list of paths to dump files, in the order of sizes
+    """
+    rng = random.Random(seed)
+    filepaths = []
+
+    for i, classes in enumerate(sizes):
+        acronym = f"SYN{i}"
+        version = i % 3 + 1
+        filepath = get_dump_path(out_dir, acronym)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w") as outfile:
+            outfile.write(
+                f"## http://{NAMESPACE}/ontologies/{acronym}/submissions/{version}\n"
+            )
+            outfile.writelines(make_ontology_triples(acronym, classes, rng, **shape))
+        filepaths.append(filepath)
+
+    return filepaths
+
+
+def write_graph_files(out_dir: str, name: str, rows: int) -> list:
+    """
+    Write synthetic KGX node and edge files.
+
+    :param out_dir: str, directory to write to
+    :param name: str, name to start each file with
+    :param rows: int, number of nodes, and of edges
+    :return: list of paths to the node and edge files
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    nodes_path = os.path.join(out_dir, f"{name}_nodes.tsv")
+    edges_path = os.path.join(out_dir, f"{name}_edges.tsv")
+
+    with open(nodes_path, "w") as outfile:
+        outfile.write("\t".join(NODE_COLUMNS) + "\n")
+        for i in range(rows):
+            outfile.write(
+                f"SYN:{i:07d}\tbiolink:NamedThing\tclass {i}\t"
+                f"A synthetic class, number {i}.\t\tBioPortal\t"
+                f"term {i}\t{OBO}SYN_{i:07d}\t\n"
+            )
+    with open(edges_path, "w") as outfile:
+        outfile.write("\t".join(EDGE_COLUMNS) + "\n")
+        for i in range(rows):
+            outfile.write(
+                f"urn:uuid:{i:012d}\tSYN:{i + 1:07d}\tbiolink:subclass_of\t"
+                f"SYN:{i // 4:07d}\trdfs:subClassOf\tBioPortal\n"
+            )
+
+    return [nodes_path, edges_path]
+
+
+def relax_to_obojson(input_path: str, output_path: str) -> None:
+    """
+    Convert N-Triples to OBO Graph JSON, as ROBOT relax would.
+
+    Only what the native transform engine handles is included.
+    The input may be a dump file (e.g., from dump_utils.dump_body),
+    as its header is an N-Triples comment.
+    :param input_path: str, path to read
+    :param output_path: str, path to write, compressed if it ends in .gz
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        conn = open_triple_store(os.path.join(work_dir, "triples.db"))
+        try:
+            load_triples(input_path, 0, conn)
+            graph = {
+                "id": "http://example.org/synthetic.owl",
+                "meta": {},
+                "nodes": list(get_obograph_nodes(conn)),
+                "edges": list(get_obograph_edges(conn)),
+            }
+        finally:
+            conn.close()
+
+    with open_file(output_path, "w") as outfile:
+        json.dump({"graphs": [graph]}, outfile, indent=2)
+
+
+def fake_robot_main(args: list) -> int:
+    """
+    Run a chain of ROBOT commands, without ROBOT.
+
+    relax writes OBO Graph JSON with relax_to_obojson,
+    measure and report write empty TSVs, and the
+    other commands copy their input to their output.
+    :param args: list of command-line arguments, as for ROBOT
+    :return: int, exit code
+    """
+    steps = []
+    input_path = ""
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in FAKE_ROBOT_COMMANDS:
+            steps.append([arg, ""])
+        elif arg in ["--input", "-i"] and i + 1 < len(args):
+            input_path = args[i + 1]
+            i = i + 1
+        elif arg in ["--output", "-o"] and i + 1 < len(args) and steps:
+            steps[-1][1] = args[i + 1]
+            i = i + 1
+        i = i + 1
+
+    if not input_path or not steps:
+        print("Usage: robot COMMAND --input INPUT --output OUTPUT", file=sys.stderr)
+        return 1
+
+    for command, output_path in steps:
+        if not output_path:
+            continue
+        if command == "relax":
+            relax_to_obojson(input_path, output_path)
+        elif command == "measure":
+            with open(output_path, "w") as outfile:
+                outfile.write("metric\tmetric_value\tmetric_type\n")
+        elif command == "report":
+            with open(output_path, "w") as outfile:
+                outfile.write("Level\tRule Name\tSubject\tProperty\tValue\n")
+        else:
+            shutil.copyfile(input_path, output_path)
+
+    return 0
+
+
+def write_fake_robot(robot_path: str) -> None:
+    """
+    Write an executable stand-in for ROBOT.
+
+    It runs fake_robot_main with this Python,
+    so transforms can be tested and timed without Java.
+    :param robot_path: str, path to write the script to
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(robot_path, "w") as outfile:
+        outfile.write(FAKE_ROBOT_SCRIPT.format(python=sys.executable, root=root))
+    mode = os.stat(robot_path).st_mode
+    os.chmod(robot_path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
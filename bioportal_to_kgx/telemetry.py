@@ -0,0 +1,247 @@
+"""Functions for recording the time and resources used by each transform stage."""
+
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Seconds between memory samples while a stage runs
+SAMPLE_INTERVAL = 0.5
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# ru_maxrss is in KB on Linux
+MAXRSS_UNIT = 1024
+
+
+def get_tree_rss(pid: int) -> int:
+    """
+    Get the memory in use by a process and all of its descendants.
+
+    Reads /proc, so this only works on Linux.
+    Descendants include ROBOT JVMs started by the process.
+    :param pid: int, process ID
+    :return: int, total resident set size in bytes,
+    or 0 if it could not be read
+    """
+    total = 0
+    pending = [pid]
+    while len(pending) > 0:
+        this_pid = pending.pop()
+        try:
+            with open(f"/proc/{this_pid}/statm") as infile:
+                total = total + int(infile.read().split()[1]) * PAGE_SIZE
+            for task in os.listdir(f"/proc/{this_pid}/task"):
+                with open(f"/proc/{this_pid}/task/{task}/children") as infile:
+                    pending.extend(int(child) for child in infile.read().split())
+        except (OSError, ValueError, IndexError):
+            # The process may have just exited
+            continue
+
+    return total
+
+
+def get_cpu_seconds() -> tuple:
+    """
+    Get CPU time used so far by this process and its finished children.
+
+    :return: tuple of (own CPU seconds, children's CPU seconds),
+    each user plus system time
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return (own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime)
+
+
+def get_path_size(path: str) -> int:
+    """
+    Get the size of a file, or of all files in a directory.
+
+    :param path: str, path to a file or directory
+    :return: int, size in bytes, or 0 if the path doesn't exist
+    """
+    if os.path.isdir(path):
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total = total + os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+        return total
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class MemorySampler:
+    """Track peak memory use of this process and its descendants."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        """
+        Start sampling in a background thread.
+
+        :param interval: float, seconds between samples
+        """
+        self.pid = os.getpid()
+        self.interval = interval
+        self.peak = get_tree_rss(self.pid)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Take samples until stopped."""
+        while not self.stopping.wait(self.interval):
+            self.peak = max(self.peak, get_tree_rss(self.pid))
+
+    def stop(self) -> int:
+        """
+        Stop sampling.
+
+        :return: int, peak resident set size in bytes
+        """
+        self.stopping.set()
+        self.thread.join()
+        self.peak = max(self.peak, get_tree_rss(self.pid))
+
+        return self.peak
+
+
+class Tracer:
+    """
+    Record spans for each stage of transforming one ontology.
+
+    Each span is appended to a JSONL trace as it ends,
+    so the trace is useful even if the transform crashes.
+    Spans from several processes may share the same trace.
+    """
+
+    def __init__(self, trace_path: str, ontology: str) -> None:
+        """
+        Start tracing.
+
+        :param trace_path: str, path to the JSONL trace,
+        or empty string to only keep spans in memory
+        :param ontology: str, name of the ontology being transformed
+        """
+        self.trace_path = trace_path
+        self.ontology = ontology
+        self.spans = []  # type: List[dict]
+        self.start_wall = time.perf_counter()
+        self.start_cpu = sum(get_cpu_seconds())
+
+    @contextmanager
+    def span(
+        self,
+        stage: str,
+        inputs: Optional[list] = None,
+        outputs: Optional[list] = None,
+    ) -> Iterator[dict]:
+        """
+        Record the time and resources used by a stage.
+
+        The span dict is provided so stages may add
+        their own fields to it, e.g., counts.
+        Spans should not be nested, as the
+        summary adds them up.
+        :param stage: str, name of the stage
+        :param inputs: list of paths to files or directories read
+        :param outputs: list of paths to files or directories written,
+        measured once the stage ends
+        :return: iterator yielding the span dict
+        """
+        span = {
+            "ontology": self.ontology,
+            "stage": stage,
+            "pid": os.getpid(),
+            "start": time.time(),
+            "input_bytes": sum(get_path_size(path) for path in inputs or []),
+        }
+        start_wall = time.perf_counter()
+        start_own_cpu, start_child_cpu = get_cpu_seconds()
+        start_child_maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        sampler = MemorySampler()
+        span["ok"] = False
+        try:
+            yield span
+            span["ok"] = True
+        finally:
+            peak_rss = sampler.stop()
+            own_cpu, child_cpu = get_cpu_seconds()
+            # Children that finish between samples may be missed,
+            # but their peak is recorded once they're waited for
+            child_maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            if child_maxrss > start_child_maxrss:
+                peak_rss = max(peak_rss, child_maxrss * MAXRSS_UNIT)
+            if peak_rss == 0:
+                peak_rss = (
+                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+                )
+            span.update(
+                {
+                    "wall_seconds": round(time.perf_counter() - start_wall, 3),
+                    "cpu_seconds": round(own_cpu - start_own_cpu, 3),
+                    "child_cpu_seconds": round(child_cpu - start_child_cpu, 3),
+                    "output_bytes": sum(
+                        get_path_size(path) for path in outputs or []
+                    ),
+                    "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+                }
+            )
+            self.spans.append(span)
+            self.write_span(span)
+
+    def write_span(self, span: dict) -> None:
+        """
+        Append a span to the trace.
+
+        Each span is written with a single append,
+        so lines from different processes don't mix.
+        :param span: dict, the span
+        """
+        if not self.trace_path:
+            return
+        line = (json.dumps(span) + "\n").encode()
+        fd = os.open(self.trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def summary(self) -> dict:
+        """
+        Summarize spans so far, for the transform status.
+
+        :return: dict with keys wall_seconds (total since tracing
+        started), cpu_seconds (including children), peak_rss_mb
+        (largest of any stage), and slowest_stage (name of the
+        stage with the longest wall time, or empty string if none)
+        """
+        slowest = max(self.spans, key=lambda span: span["wall_seconds"], default={})
+
+        return {
+            "wall_seconds": round(time.perf_counter() - self.start_wall, 1),
+            "cpu_seconds": round(sum(get_cpu_seconds()) - self.start_cpu, 1),
+            "peak_rss_mb": max((span["peak_rss_mb"] for span in self.spans), default=0),
+            "slowest_stage": slowest.get("stage", ""),
+        }
+
+    def stage_seconds(self) -> dict:
+        """
+        Add up the wall time of spans for each stage.
+
+        :return: dict of stage names to wall seconds
+        """
+        seconds = {}  # type: Dict[str, float]
+        for span in self.spans:
+            seconds[span["stage"]] = round(
+                seconds.get(span["stage"], 0) + span["wall_seconds"], 3
+            )
+
+        return seconds
@@ -7,14 +7,41 @@ Checks first row of each dump file to
 verify if it contains a comment.
 """
 
+import os
 import sys
 
 import click
 
+from bioportal_to_kgx.compress_utils import check_compression  # type: ignore
+from bioportal_to_kgx.cost_model import (  # type: ignore
+    format_plan,
+    plan_transforms,
+    read_cost_history,
+)
 from bioportal_to_kgx.functions import (  # type: ignore
+    TXDIR,
     do_transforms,
     examine_data_directory,
 )
+from bioportal_to_kgx.id_index import update_id_index  # type: ignore
+from bioportal_to_kgx.sharding import (  # type: ignore
+    get_shard_files,
+    get_shard_path,
+    parse_shard,
+)
+
+DEFAULT_CATALOG = "dump_catalog.tsv"
+DEFAULT_STATUS = "onto_status.yaml"
+
+
+def parse_shard_option(_, __, value: str):
+    """Parse a shard, given as i/N, if one was."""
+    if not value:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
 
 
 @click.command()
@@ -35,6 +62,34 @@ from bioportal_to_kgx.functions import (  # type: ignore
                         without a validation log,
                         a new validation will be run.""",
 )
+@click.option(
+    "--kgx_validate_batch",
+    default=0,
+    type=click.IntRange(min=0),
+    help="""If more than 0, KGX validation reads nodes and edges
+                      in batches of this many rows, so memory use is
+                      bounded, and validates batches in parallel
+                      (see --kgx_validate_workers). Errors from all
+                      batches are merged into one log. Checks needing
+                      the whole graph are skipped. Defaults to 0,
+                      to validate each graph at once.""",
+)
+@click.option(
+    "--kgx_validate_workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="""Number of processes to validate batches with,
+                      for each ontology. Defaults to 1.""",
+)
+@click.option(
+    "--kgx_validate_sample",
+    default=1.0,
+    type=click.FloatRange(min=0.0, max=1.0, min_open=True),
+    help="""Fraction of nodes and edges to validate with KGX,
+                      chosen at random, for quick checks of very large
+                      ontologies. Uses batches. Defaults to 1.0, i.e.,
+                      validate everything.""",
+)
 @click.option(
     "--robot_validate",
     is_flag=True,
@@ -48,8 +103,9 @@ from bioportal_to_kgx.functions import (  # type: ignore
     "--pandas_validate",
     is_flag=True,
     help="""If used, will verify that each new and existing transform
-                        can be parsed with pandas without encountering
-                        format errors.""",
+                        can be parsed as TSV without encountering
+                        format errors, i.e., every row has as many
+                        fields as the header.""",
 )
 @click.option(
     "--get_bioportal_metadata",
@@ -62,6 +118,24 @@ from bioportal_to_kgx.functions import (  # type: ignore
                         e.g., BTO_1_nodes_metadata.tsv""",
 )
 @click.option("--ncbo_key", help="""Key for the NCBO API.""")
+@click.option(
+    "--metadata_cache",
+    default="",
+    help="""Path to a cache of BioPortal API responses.
+                      If used, responses are reused for up to a week,
+                      so reruns don't need to retrieve metadata again.
+                      By default, responses are not cached.""",
+)
+@click.option(
+    "--metadata_snapshot",
+    default="",
+    help="""Path to a snapshot of BioPortal records,
+                      made with python tools.py prefetch_metadata.
+                      If used with --get_bioportal_metadata,
+                      metadata is read from the snapshot rather than
+                      the BioPortal API, so no network access
+                      or API key is needed.""",
+)
 @click.option(
     "--write_curies",
     is_flag=True,
@@ -83,25 +157,206 @@ from bioportal_to_kgx.functions import (  # type: ignore
                       comma-delimited and named by their hashed file ID,
                       e.g., dabd4d902360003975fb25ae56f8.""",
 )
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="""Number of ontologies to transform in parallel,
+                      each in its own worker process.
+                      Defaults to 1 (one at a time).""",
+)
+@click.option(
+    "--memory_budget",
+    default=0,
+    type=click.IntRange(min=0),
+    help="""Total memory, in GB, that may be reserved by ROBOT
+                      at once. If used, each ROBOT heap is sized
+                      according to its input file, and ontologies are
+                      only started while the total fits this budget.
+                      By default, each ROBOT call uses a 12 GB heap.""",
+)
+@click.option(
+    "--cache_dir",
+    default="",
+    help="""Path to a cache of transform outputs.
+                      If used, outputs of each successful transform are
+                      stored here, keyed by the contents of the dump file
+                      and the versions of ROBOT, KGX and universalizer,
+                      and reused in later runs when the dump file
+                      hasn't changed. May be shared between hosts.""",
+)
+@click.option(
+    "--compress",
+    default="",
+    type=click.Choice(["", "gzip", "zstd"]),
+    help="""If used, compress the relaxed JSON and the node
+                      and edge files for each transform, with gzip or zstd.
+                      The relaxed JSON is always compressed with gzip,
+                      as that's what ROBOT and KGX support.
+                      zstd requires the zstandard package.""",
+)
+@click.option(
+    "--compress_threads",
+    default=4,
+    type=click.IntRange(min=1),
+    help="""Number of threads to use when compressing
+                      each node or edge file. Defaults to 4.""",
+)
+@click.option(
+    "--native",
+    callback=lambda _, __, x: x.split(",") if x else [],
+    help="""One or more ontologies to transform directly from
+                      the dump file, without ROBOT relax,
+                      comma-delimited and named by their BioPortal acronym,
+                      e.g., BTO,PO - or all to do this for every ontology.
+                      Handles subclasses, labels, definitions, synonyms,
+                      xrefs and simple existential restrictions,
+                      so it's best for plain class hierarchies.""",
+)
+@click.option(
+    "--trace",
+    default="",
+    help="""If used, path to write a trace of each transform
+                      stage to, as JSON lines, with the wall time, CPU
+                      time (including ROBOT), bytes read and written,
+                      and peak memory use of each, e.g.,
+                      transform_trace.jsonl. Totals for each ontology
+                      are added to onto_status.yaml either way.""",
+)
+@click.option(
+    "--discovery_threads",
+    default=1,
+    type=click.IntRange(min=1),
+    help="""Number of threads to use when listing the dump
+                      directory and reading dump file headers.
+                      More may help on network filesystems.""",
+)
+@click.option(
+    "--catalog",
+    default="",
+    help="""Path to a catalog of the dump files (a TSV).
+                      If used, the catalog is created or refreshed
+                      (only reading new or changed files), and may be
+                      used to choose ontologies with --ontologies.""",
+)
+@click.option(
+    "--ontologies",
+    callback=lambda _, __, x: x.split(",") if x else [],
+    help="""One or more ontologies to transform, and only these,
+                      comma-delimited and named by their BioPortal acronym,
+                      optionally with a submission version,
+                      e.g., BTO,GO:1523. Uses the dump catalog
+                      (dump_catalog.tsv unless --catalog is specified).""",
+)
+@click.option(
+    "--shard",
+    default="",
+    callback=parse_shard_option,
+    help="""Only transform one shard of the dump files,
+                      given as i/N, e.g., 2/4 for the second of four.
+                      Files are assigned to shards the same way on every
+                      host, balanced by size. Each shard writes its own
+                      onto_status.shard_i_of_N.yaml (and trace), to be
+                      combined with python tools.py merge-status.""",
+)
+@click.option(
+    "--cost_history",
+    default="",
+    help="""If used, path to a record of the time and peak memory
+                      each ontology took to transform in earlier runs,
+                      e.g., transform_costs.json, updated after each run.
+                      Used to start the longest transforms first;
+                      ontologies without history are estimated from
+                      their size. With --shard, each shard records costs
+                      in its own file, e.g.,
+                      transform_costs.shard_1_of_4.json, and all are
+                      read when planning. By default, costs are not
+                      recorded and all ontologies are estimated.""",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="""If used, only show the order ontologies would be
+                      transformed in, with the predicted time and peak
+                      memory of each and of the whole run, then exit
+                      without transforming anything.""",
+)
+@click.option(
+    "--id_index",
+    default="",
+    help="""If used, update an index of which ontologies
+                      define or reference each node ID and IRI at this
+                      path after transforming, e.g., id_index.sqlite.
+                      Only ontologies whose node files changed are
+                      indexed again. Search it with python tools.py lookup.""",
+)
 def run(
     input: str,
     kgx_validate: bool,
+    kgx_validate_batch: int,
+    kgx_validate_workers: int,
+    kgx_validate_sample: float,
     robot_validate: bool,
     pandas_validate: bool,
     get_bioportal_metadata: bool,
     write_curies: bool,
+    workers: int,
+    memory_budget: int,
+    cache_dir: str,
+    compress: str,
+    compress_threads: int,
+    discovery_threads: int,
+    catalog: str,
+    metadata_cache: str,
+    metadata_snapshot: str,
+    trace: str,
+    cost_history: str,
+    plan: bool,
+    id_index: str,
+    shard=None,
+    ontologies=[],
+    native=[],
     ncbo_key=None,
     include_only=[],
     exclude=[],
 ):
 
-    if get_bioportal_metadata and not ncbo_key:
+    if get_bioportal_metadata and not ncbo_key and not metadata_snapshot:
         sys.exit(
             "Cannot access BioPortal metadata without API key. "
-            "Specify in --ncbo_key parameter."
+            "Specify in --ncbo_key parameter, "
+            "or use a snapshot with --metadata_snapshot."
         )
 
-    data_filepaths = examine_data_directory(input, include_only, exclude)
+    try:
+        check_compression(compress)
+    except ImportError as e:
+        sys.exit(str(e))
+
+    if ontologies and not catalog:
+        catalog = DEFAULT_CATALOG
+
+    data_filepaths = examine_data_directory(
+        input, include_only, exclude, discovery_threads, catalog, ontologies
+    )
+
+    # Each shard keeps its own status and trace,
+    # as shards may run at once in the same directory
+    status_path = DEFAULT_STATUS
+    if shard:
+        data_filepaths = get_shard_files(data_filepaths, *shard)
+        status_path = get_shard_path(status_path, *shard)
+        if trace:
+            trace = get_shard_path(trace, *shard)
+
+    if plan:
+        history = read_cost_history(cost_history) if cost_history else {}
+        print(
+            format_plan(
+                plan_transforms(data_filepaths, history, workers, memory_budget * 1024)
+            )
+        )
+        return
     transform_status = do_transforms(
         data_filepaths,
         kgx_validate,
@@ -110,6 +365,23 @@ def run(
         get_bioportal_metadata,
         ncbo_key,
         write_curies,
+        workers,
+        memory_budget * 1024,
+        cache_dir,
+        compress,
+        compress_threads,
+        native,
+        metadata_cache,
+        metadata_snapshot,
+        trace,
+        {
+            "batch_rows": kgx_validate_batch,
+            "workers": kgx_validate_workers,
+            "sample_fraction": kgx_validate_sample,
+        },
+        status_path,
+        shard,
+        cost_history,
     )
 
     successes = ", ".join(
@@ -124,6 +396,12 @@ def run(
     if failures != "":
         print(f"Failed transforms: {failures}")
 
+    if id_index:
+        result = update_id_index(os.path.join(TXDIR, "ontologies"), id_index, workers)
+        print(
+            f"Updated ID index at {id_index} for {len(result['updated'])} ontologies."
+        )
+
 
 if __name__ == "__main__":
     run()
@@ -27,7 +27,8 @@ test_deps = [
 ]
 
 extras = {
-    'test': test_deps
+    'test': test_deps,
+    'zstd': ['zstandard']
 }
 
 setup(
@@ -0,0 +1,204 @@
+"""Tests for retrieving metadata from BioPortal."""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qs, urlparse
+
+from bioportal_to_kgx.bioportal_utils import (BIOPORTAL_SOURCE, MetadataClient,
+                                              read_metadata_snapshot,
+                                              snapshot_metadata,
+                                              write_metadata_snapshot)
+
+API_KEY = "test-key"
+RECORDS = {
+    "/ontologies/TST/": {"name": "Test Ontology", "ontologyType": "ONTOLOGY"},
+    "/ontologies/TST/latest_submission": {
+        "submissionId": 3,
+        "creationDate": "2022-07-20T00:00:00-07:00",
+    },
+    "/ontologies/FLAKY/": {"name": "Flaky Ontology", "ontologyType": "ONTOLOGY"},
+    "/ontologies/FLAKY/latest_submission": {
+        "submissionId": 1,
+        "creationDate": "2022-07-20T00:00:00-07:00",
+    },
+}
+
+# List endpoints: ontologies all at once, submissions paged
+COLLECTIONS = {
+    "/ontologies": [
+        {"acronym": "TST", **RECORDS["/ontologies/TST/"]},
+        {"acronym": "FLAKY", **RECORDS["/ontologies/FLAKY/"]},
+    ],
+    "/submissions": [
+        {
+            "page": 1,
+            "nextPage": 2,
+            "collection": [
+                {
+                    "ontology": {"acronym": "TST"},
+                    **RECORDS["/ontologies/TST/latest_submission"],
+                }
+            ],
+        },
+        {
+            "page": 2,
+            "nextPage": None,
+            "collection": [
+                {
+                    "ontology": "http://data.bioontology.org/ontologies/FLAKY",
+                    **RECORDS["/ontologies/FLAKY/latest_submission"],
+                }
+            ],
+        },
+    ],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve canned BioPortal API responses."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Send a record, an error, or nothing found."""
+        url = urlparse(self.path)
+        server = self.server
+        with server.lock:  # type: ignore
+            server.requests.append(url.path)  # type: ignore
+            attempts = server.requests.count(url.path)  # type: ignore
+
+        if parse_qs(url.query).get("apikey") != [API_KEY]:
+            self.send_response(401)
+            self.end_headers()
+        elif url.path.startswith("/ontologies/FLAKY/") and attempts < 3:
+            self.send_response(503)
+            self.end_headers()
+        elif url.path in RECORDS or url.path in COLLECTIONS:
+            if url.path == "/submissions":
+                page = int(parse_qs(url.query).get("page", ["1"])[0])
+                content = COLLECTIONS[url.path][page - 1]
+            else:
+                content = COLLECTIONS.get(url.path, RECORDS.get(url.path))
+            body = json.dumps(content).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        """Don't log each request."""
+        pass
+
+
+class TestMetadataClient(TestCase):
+    """Test the BioPortal metadata client against a stub server."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []  # type: ignore
+        self.server.lock = threading.Lock()  # type: ignore
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self.api_url = f"http://{host}:{port}/"
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.tempdir.cleanup()
+
+    def make_client(self, **kwargs) -> MetadataClient:
+        """Make a client for the stub server, with short waits."""
+        client = MetadataClient(
+            API_KEY,
+            api_url=self.api_url,
+            cache_dir=self.tempdir.name,
+            rate=0,
+            backoff=0.01,
+            **kwargs,
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_get_metadata(self):
+        """Test assembling metadata from both records."""
+        md = self.make_client().get_metadata("TST")
+        self.assertEqual(md["name"], "Test Ontology")
+        self.assertEqual(md["full_name"], "Test Ontology - submission 3")
+        self.assertEqual(md["bp_version"], BIOPORTAL_SOURCE)
+
+    def test_missing_ontology(self):
+        """Test that a missing ontology has an empty name, without retries."""
+        md = self.make_client().get_metadata("NONE")
+        self.assertEqual(md["name"], "")
+        self.assertEqual(len(self.server.requests), 2)  # type: ignore
+
+    def test_retries(self):
+        """Test retrying server errors, and giving up after too many."""
+        md = self.make_client(retries=0).get_metadata("FLAKY")
+        self.assertEqual(md["name"], "")
+        md = self.make_client(retries=2).get_metadata("FLAKY")
+        self.assertEqual(md["name"], "Flaky Ontology")
+
+    def test_cache(self):
+        """Test that cached responses are reused until they expire."""
+        all_md = self.make_client(threads=4).get_all_metadata(["TST", "FLAKY", "TST"])
+        self.assertEqual(sorted(all_md), ["FLAKY", "TST"])
+        request_count = len(self.server.requests)  # type: ignore
+
+        self.assertEqual(self.make_client().get_all_metadata(["TST", "FLAKY"]), all_md)
+        self.assertEqual(len(self.server.requests), request_count)  # type: ignore
+
+        self.make_client(ttl=0).get_metadata("TST")
+        self.assertEqual(len(self.server.requests), request_count + 2)  # type: ignore
+
+
+class TestMetadataSnapshot(TestCase):
+    """Test bulk retrieval of records into a snapshot."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []  # type: ignore
+        self.server.lock = threading.Lock()  # type: ignore
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self.api_url = f"http://{host}:{port}/"
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tempdir.name, "snapshot.json")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.tempdir.cleanup()
+
+    def test_snapshot(self):
+        """Test writing a snapshot, then reading metadata from it."""
+        client = MetadataClient(API_KEY, api_url=self.api_url, rate=0)
+        self.addCleanup(client.close)
+        snapshot = client.get_snapshot()
+        self.assertEqual(sorted(snapshot), ["FLAKY", "TST"])
+        # Three requests in all, across two pages of submissions
+        self.assertEqual(
+            sorted(self.server.requests),  # type: ignore
+            ["/ontologies", "/submissions", "/submissions"],
+        )
+
+        write_metadata_snapshot(snapshot, self.snapshot_path)
+        all_md = snapshot_metadata(
+            read_metadata_snapshot(self.snapshot_path), ["TST", "FLAKY", "NONE"]
+        )
+        self.assertEqual(all_md["TST"]["full_name"], "Test Ontology - submission 3")
+        self.assertEqual(all_md["FLAKY"]["full_name"], "Flaky Ontology - submission 1")
+        self.assertEqual(all_md["NONE"]["name"], "")
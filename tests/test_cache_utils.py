@@ -0,0 +1,82 @@
+"""Tests for transform cache utility functions."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.cache_utils import (get_body_digest, get_cache_key,
+                                          restore_from_cache, store_in_cache)
+
+HEADER = "## http://data.bioontology.org/ontologies/TEST/submissions/1\n"
+BODY = "<http://example.org/A> <http://example.org/p> <http://example.org/B> .\n"
+
+
+class TestCacheUtils(TestCase):
+    """Test caching transform outputs."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tempdir.name, "cache")
+        self.dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(self.dump_path, "w") as outfile:
+            outfile.write(HEADER + BODY)
+        self.params = {"kgx": "1.0", "write_curies": False}
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_body_digest(self):
+        """Test that the digest ignores the header and is reused."""
+        digest = get_body_digest(self.dump_path, len(HEADER), self.cache_dir)
+        other_path = os.path.join(self.tempdir.name, "b" * 28)
+        with open(other_path, "w") as outfile:
+            outfile.write(HEADER.replace("1", "2") + BODY)
+        self.assertEqual(
+            digest, get_body_digest(other_path, len(HEADER), self.cache_dir)
+        )
+        # Same size and mtime, so the recorded digest is used
+        self.assertEqual(
+            digest, get_body_digest(self.dump_path, len(HEADER), self.cache_dir)
+        )
+
+    def test_cache_key(self):
+        """Test that cache keys change with tool versions, ontology and metadata."""
+        key = get_cache_key("abc", self.params)
+        self.assertEqual(key, get_cache_key("abc", dict(self.params)))
+        self.assertNotEqual(key, get_cache_key("abc", {**self.params, "kgx": "2.0"}))
+        params = {**self.params, "ontology": "TEST", "metadata": {"full_name": "A"}}
+        self.assertNotEqual(
+            get_cache_key("abc", params),
+            get_cache_key("abc", {**params, "ontology": "OTHER"}),
+        )
+        self.assertNotEqual(
+            get_cache_key("abc", params),
+            get_cache_key("abc", {**params, "metadata": {"full_name": "B"}}),
+        )
+
+    def test_store_and_restore(self):
+        """Test storing outputs and restoring them under a new name."""
+        outdir = os.path.join(self.tempdir.name, "TEST")
+        os.makedirs(outdir)
+        for filename in ["TEST_1_nodes.tsv", "TEST_1_edges.tsv", "robot.report"]:
+            with open(os.path.join(outdir, filename), "w") as outfile:
+                outfile.write(filename)
+        with open(os.path.join(outdir, "TEST_10_nodes.tsv"), "w") as outfile:
+            outfile.write("not this one")
+
+        key = get_cache_key("abc", self.params)
+        self.assertFalse(restore_from_cache(self.cache_dir, key, outdir, "TEST_2"))
+        self.assertTrue(store_in_cache(self.cache_dir, key, outdir, "TEST_1", {}))
+        self.assertFalse(store_in_cache(self.cache_dir, key, outdir, "TEST_1", {}))
+
+        newdir = os.path.join(self.tempdir.name, "NEW")
+        os.makedirs(newdir)
+        self.assertTrue(restore_from_cache(self.cache_dir, key, newdir, "TEST_2"))
+        self.assertEqual(
+            sorted(os.listdir(newdir)),
+            ["TEST_2_edges.tsv", "TEST_2_nodes.tsv", "robot.report"],
+        )
+        with open(os.path.join(newdir, "TEST_2_nodes.tsv")) as infile:
+            self.assertEqual(infile.read(), "TEST_1_nodes.tsv")
@@ -0,0 +1,59 @@
+"""Tests for the dump catalog."""
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx import catalog
+from bioportal_to_kgx.catalog import (filter_catalog, read_catalog,
+                                      update_catalog)
+
+HEADER = "## http://data.bioontology.org/ontologies/{}/submissions/{}\n"
+BODY = "<http://example.org/A> <http://example.org/p> <http://example.org/B> .\n"
+
+
+class TestCatalog(TestCase):
+    """Test building and filtering the dump catalog."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dump_dir = os.path.join(self.tempdir.name, "data")
+        self.catalog_path = os.path.join(self.tempdir.name, "catalog.tsv")
+        self.paths = {}
+        for i, (acronym, version) in enumerate([("BTO", "1"), ("GO", "5")]):
+            subdir = os.path.join(self.dump_dir, str(i))
+            os.makedirs(subdir)
+            self.paths[acronym] = os.path.join(subdir, str(i) * 28)
+            with open(self.paths[acronym], "w") as outfile:
+                outfile.write(HEADER.format(acronym, version) + BODY * 10)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_update_catalog(self):
+        """Test that the catalog is built and refreshed incrementally."""
+        built = update_catalog(self.dump_dir, self.catalog_path)
+        self.assertEqual(built, read_catalog(self.catalog_path))
+        entry = built[self.paths["BTO"]]
+        self.assertEqual(entry["acronym"], "BTO")
+        self.assertEqual(entry["version"], "1")
+        self.assertEqual(entry["line_estimate"], 10)
+
+        with open(self.paths["GO"], "w") as outfile:
+            outfile.write(HEADER.format("GO", "6") + BODY)
+        with mock.patch.object(
+            catalog, "catalog_entry", wraps=catalog.catalog_entry
+        ) as entry_mock:
+            refreshed = update_catalog(self.dump_dir, self.catalog_path, threads=2)
+        entry_mock.assert_called_once_with(self.paths["GO"])
+        self.assertEqual(refreshed[self.paths["GO"]]["version"], "6")
+
+    def test_filter_catalog(self):
+        """Test choosing files by acronym and version."""
+        built = update_catalog(self.dump_dir, self.catalog_path)
+        self.assertEqual(filter_catalog(built, ["GO"]), [self.paths["GO"]])
+        self.assertEqual(filter_catalog(built, ["BTO:1"]), [self.paths["BTO"]])
+        self.assertEqual(filter_catalog(built, ["BTO:2"]), [])
+        self.assertEqual(len(filter_catalog(built, [])), 2)
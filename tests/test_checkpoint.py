@@ -0,0 +1,105 @@
+"""Tests for recording transform stages and resuming."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.checkpoint import (clear_partial_outputs, commit_outputs,
+                                         get_last_stage, get_stage_details,
+                                         get_state_path, is_stage_done,
+                                         make_staging_dir, mark_stage_done,
+                                         read_state, start_state)
+
+OUTNAME = "AAA_1"
+PARAMS = {"compression": False, "native": False}
+
+
+class TestCheckpoint(TestCase):
+    """Test writing, reading and invalidating transform state."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.outdir = os.path.join(self.tempdir.name, "AAA")
+        os.makedirs(self.outdir)
+        self.dump_path = os.path.join(self.tempdir.name, "AAA.json")
+        with open(self.dump_path, "w") as outfile:
+            outfile.write("{}\n")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def write_file(self, filepath: str, content: str = "x\n") -> None:
+        """Write a small file."""
+        with open(filepath, "w") as outfile:
+            outfile.write(content)
+
+    def test_read_state(self):
+        """Test that finished stages are kept until the dump or options change."""
+        self.assertEqual(read_state(self.outdir, OUTNAME, self.dump_path, PARAMS), {})
+
+        state = start_state(self.outdir, OUTNAME, self.dump_path, PARAMS)
+        mark_stage_done(state, self.outdir, "relax", {"fixes": {"comments": 2}})
+        mark_stage_done(state, self.outdir, "curie_repair")
+
+        state = read_state(self.outdir, OUTNAME, self.dump_path, PARAMS)
+        self.assertTrue(is_stage_done(state, "relax"))
+        self.assertFalse(is_stage_done(state, "transform"))
+        self.assertEqual(get_last_stage(state), "curie_repair")
+        self.assertEqual(get_stage_details(state, "relax")["fixes"], {"comments": 2})
+
+        changed_params = {**PARAMS, "compression": True}
+        self.assertEqual(
+            read_state(self.outdir, OUTNAME, self.dump_path, changed_params), {}
+        )
+
+        with open(self.dump_path, "a") as outfile:
+            outfile.write("{}\n")
+        self.assertEqual(read_state(self.outdir, OUTNAME, self.dump_path, PARAMS), {})
+
+        self.write_file(get_state_path(self.outdir, OUTNAME), "{")
+        self.assertEqual(read_state(self.outdir, OUTNAME, self.dump_path, PARAMS), {})
+
+    def test_commit_outputs(self):
+        """Test that staged outputs replace existing ones."""
+        nodes_path = os.path.join(self.outdir, f"{OUTNAME}_nodes.tsv")
+        self.write_file(nodes_path, "old\n")
+
+        staging_dir = make_staging_dir(self.outdir)
+        self.write_file(os.path.join(staging_dir, f"{OUTNAME}_nodes.tsv"), "new\n")
+        self.write_file(os.path.join(staging_dir, f"{OUTNAME}_edges.tsv"))
+        out_filepaths = commit_outputs(staging_dir, self.outdir)
+
+        self.assertEqual(len(out_filepaths), 2)
+        self.assertFalse(os.path.exists(staging_dir))
+        with open(nodes_path) as infile:
+            self.assertEqual(infile.read(), "new\n")
+
+    def test_clear_partial_outputs(self):
+        """Test removing what a crashed transform left behind."""
+        staging_dir = make_staging_dir(self.outdir)
+        self.write_file(os.path.join(staging_dir, f"{OUTNAME}_nodes.tsv"))
+        for filename in [
+            f"{OUTNAME}_nodes.tsv",
+            f"{OUTNAME}_edges.tsv.tmp.gz",
+            f"{OUTNAME}_relaxed.json",
+            "robot.report",
+        ]:
+            self.write_file(os.path.join(self.outdir, filename))
+        start_state(self.outdir, OUTNAME, self.dump_path, PARAMS)
+
+        clear_partial_outputs(self.outdir, graph_files=False)
+        self.assertEqual(
+            sorted(os.listdir(self.outdir)),
+            [
+                f"{OUTNAME}.state.json",
+                f"{OUTNAME}_nodes.tsv",
+                f"{OUTNAME}_relaxed.json",
+                "robot.report",
+            ],
+        )
+
+        clear_partial_outputs(self.outdir, graph_files=True)
+        self.assertNotIn(f"{OUTNAME}_nodes.tsv", os.listdir(self.outdir))
+        self.assertIn(f"{OUTNAME}_relaxed.json", os.listdir(self.outdir))
@@ -0,0 +1,58 @@
+"""Tests for reading and writing compressed files."""
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock, skipIf
+
+from bioportal_to_kgx import compress_utils
+from bioportal_to_kgx.compress_utils import (compressed_path, get_compression,
+                                             open_file)
+
+LINES = [f"A:{i}\tbiolink:NamedThing\tnode {i}\n" for i in range(10000)]
+
+
+class TestCompressUtils(TestCase):
+    """Test compressed file handling."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_paths(self):
+        """Test that compression is read from and added to paths."""
+        self.assertEqual(get_compression("x_nodes.tsv.gz"), "gzip")
+        self.assertEqual(get_compression("x_nodes.tsv.zst"), "zstd")
+        self.assertEqual(get_compression("x_nodes.tsv"), "")
+        self.assertEqual(compressed_path("x_nodes.tsv.gz", "zstd"), "x_nodes.tsv.zst")
+        self.assertEqual(compressed_path("x_nodes.tsv.gz", ""), "x_nodes.tsv")
+
+    def test_parallel_gzip(self):
+        """Test that gzip written in parallel chunks reads back whole."""
+        filepath = os.path.join(self.tempdir.name, "x_nodes.tsv.gz")
+        with mock.patch.object(compress_utils, "CHUNK_SIZE", 1000):
+            with open_file(filepath, "w", threads=4) as outfile:
+                outfile.writelines(LINES)
+        with gzip.open(filepath, "rt") as infile:
+            self.assertEqual(infile.readlines(), LINES)
+
+    def test_empty_parallel_gzip(self):
+        """Test that an empty file is still valid gzip."""
+        filepath = os.path.join(self.tempdir.name, "x_nodes.tsv.gz")
+        with open_file(filepath, "wb", threads=4):
+            pass
+        with gzip.open(filepath, "rb") as infile:
+            self.assertEqual(infile.read(), b"")
+
+    @skipIf(compress_utils.zstandard is None, "zstandard not installed")
+    def test_zstd(self):
+        """Test that zstd files are written and read by line."""
+        filepath = os.path.join(self.tempdir.name, "x_nodes.tsv.zst")
+        with open_file(filepath, "w", threads=2) as outfile:
+            outfile.writelines(LINES)
+        with open_file(filepath, "r") as infile:
+            self.assertEqual(infile.readlines(), LINES)
@@ -0,0 +1,129 @@
+"""Tests for predicting transform costs and planning runs."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.cost_model import (format_plan, plan_transforms,
+                                         predict_cost, read_cost_history,
+                                         update_cost_history)
+from bioportal_to_kgx.dump_utils import NAMESPACE
+from bioportal_to_kgx.sharding import get_shard_path
+
+MB = 1024 * 1024
+
+
+class TestCostModel(TestCase):
+    """Test recording costs and ordering transforms by them."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.history_path = os.path.join(self.tempdir.name, "costs.json")
+        self.paths = {}
+        for acronym, size in [("AAA", 1 * MB), ("BBB", 2 * MB), ("CCC", 4 * MB)]:
+            filepath = os.path.join(self.tempdir.name, acronym.lower())
+            with open(filepath, "w") as outfile:
+                outfile.write(
+                    f"## http://{NAMESPACE}/ontologies/{acronym}/submissions/1\n"
+                )
+                outfile.write("x" * (size - outfile.tell()))
+            self.paths[acronym] = filepath
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def get_result(self, acronym: str, status: str, stage_seconds: dict) -> dict:
+        """Make a result as transform_ontology would."""
+        return {
+            "tx_result": {"id": acronym, "status": status, "peak_rss_mb": 500.0},
+            "stage_seconds": stage_seconds,
+        }
+
+    def test_update_cost_history(self):
+        """Test that only transforms that really ran are recorded."""
+        paths = [self.paths["AAA"], self.paths["BBB"], self.paths["CCC"]]
+        results = [
+            self.get_result("AAA", "OK", {"robot_relax": 10.0, "kgx_transform": 20.0}),
+            self.get_result("BBB", "FAIL", {"robot_relax": 1.0}),
+            self.get_result("CCC", "OK", {"cache_lookup": 1.0}),
+        ]
+        self.assertEqual(update_cost_history(self.history_path, paths, results), 1)
+        history = read_cost_history(self.history_path)
+        self.assertEqual(list(history), ["AAA"])
+        self.assertEqual(history["AAA"]["input_bytes"], MB)
+
+        # A resumed transform keeps times from stages it didn't repeat
+        results = [self.get_result("AAA", "OK", {"kgx_transform": 30.0})]
+        update_cost_history(self.history_path, paths[:1], results)
+        history = read_cost_history(self.history_path)
+        self.assertEqual(
+            history["AAA"]["stage_seconds"],
+            {"robot_relax": 10.0, "kgx_transform": 30.0},
+        )
+
+    def test_update_sharded_cost_history(self):
+        """Test that shards record costs separately, and are read together."""
+        results = [self.get_result("AAA", "OK", {"robot_relax": 10.0})]
+        update_cost_history(self.history_path, [self.paths["AAA"]], results)
+        for shard, acronym in [((1, 2), "AAA"), ((2, 2), "BBB")]:
+            results = [self.get_result(acronym, "OK", {"kgx_transform": 20.0})]
+            update_cost_history(
+                self.history_path, [self.paths[acronym]], results, shard
+            )
+
+        self.assertEqual(list(read_cost_history(self.history_path)), ["AAA", "BBB"])
+        shard_path = get_shard_path(self.history_path, 2, 2)
+        self.assertEqual(list(read_cost_history(shard_path)), ["BBB"])
+        with open(self.history_path) as infile:
+            self.assertNotIn("BBB", infile.read())
+
+        # The shard's costs are newer, and keep times from the whole run
+        history = read_cost_history(self.history_path)
+        self.assertEqual(
+            history["AAA"]["stage_seconds"],
+            {"robot_relax": 10.0, "kgx_transform": 20.0},
+        )
+
+    def test_predict_cost(self):
+        """Test predicting from history, scaled by size, or from size alone."""
+        history = {
+            "BBB": {
+                "input_bytes": MB,
+                "stage_seconds": {"robot_relax": 10.0, "kgx_transform": 20.0},
+                "peak_rss_mb": 1000.0,
+            }
+        }
+        cost = predict_cost(self.paths["BBB"], "BBB", history, 1.0)
+        self.assertEqual(
+            cost, {"seconds": 60.0, "peak_rss_mb": 2000.0, "source": "history"}
+        )
+        cost = predict_cost(self.paths["CCC"], "CCC", history, 1.0)
+        self.assertEqual(cost["seconds"], 4.0)
+        self.assertEqual(cost["source"], "size")
+
+    def test_plan_transforms(self):
+        """Test starting the longest transforms first."""
+        history = {
+            "AAA": {
+                "input_bytes": MB,
+                "stage_seconds": {"native_transform": 100.0},
+                "peak_rss_mb": 100.0,
+            }
+        }
+        paths = list(self.paths.values())
+        plan = plan_transforms(paths, history, workers=2)
+        # Without their own history, others are estimated
+        # at the same time per MB as AAA
+        self.assertEqual(
+            [job["ontology"] for job in plan["jobs"]], ["CCC", "BBB", "AAA"]
+        )
+        self.assertEqual(plan["jobs"][2]["start"], 200.0)
+        self.assertEqual(plan["total_seconds"], 400.0)
+        self.assertEqual(plan["peak_rss_mb"], 2096 + 2072)
+
+        # Too little memory for two heaps at once means one at a time
+        plan = plan_transforms(paths, history, workers=2, memory_budget=2100)
+        self.assertEqual(plan["total_seconds"], 700.0)
+        self.assertIn("Predicted total time: 0:11:40", format_plan(plan))
@@ -0,0 +1,81 @@
+"""Tests for 4store dump file utility functions."""
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx.dump_utils import (dump_body, find_dump_files,
+                                         get_header_offset, is_body_empty)
+
+HEADER = "## http://data.bioontology.org/ontologies/TEST/submissions/1\n"
+BODY = (
+    "<http://example.org/A> "
+    "<http://www.w3.org/2000/01/rdf-schema#subClassOf> "
+    "<http://example.org/B> .\n"
+)
+
+
+class TestDumpUtils(TestCase):
+    """Test reading 4store dump files."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(self.dump_path, "w") as outfile:
+            outfile.write(HEADER + BODY)
+        self.empty_path = os.path.join(self.tempdir.name, "b" * 28)
+        with open(self.empty_path, "w") as outfile:
+            outfile.write(HEADER)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_header_offset(self):
+        """Test finding the end of the header."""
+        self.assertEqual(get_header_offset(self.dump_path), len(HEADER))
+
+    def test_is_body_empty(self):
+        """Test detecting files with only a header."""
+        self.assertFalse(
+            is_body_empty(self.dump_path, get_header_offset(self.dump_path))
+        )
+        self.assertTrue(
+            is_body_empty(self.empty_path, get_header_offset(self.empty_path))
+        )
+
+    def test_dump_body(self):
+        """Test reading the dump as N-Triples, without copying it."""
+        with dump_body(self.dump_path, len(HEADER)) as body_path:
+            self.assertTrue(body_path.endswith(".nt"))
+            self.assertEqual(
+                os.path.realpath(body_path), os.path.realpath(self.dump_path)
+            )
+            # The header is read as a comment
+            with open(body_path) as infile:
+                self.assertEqual(infile.read(), HEADER + BODY)
+        self.assertFalse(os.path.exists(body_path))
+
+    def test_dump_body_copy(self):
+        """Test copying the body where the dump can't be linked to."""
+        with mock.patch("os.symlink", side_effect=OSError):
+            with dump_body(self.dump_path, len(HEADER)) as body_path:
+                with open(body_path) as infile:
+                    self.assertEqual(infile.read(), BODY)
+        self.assertFalse(os.path.exists(body_path))
+
+    def test_find_dump_files(self):
+        """Test finding data files in nested directories."""
+        nested_dir = os.path.join(self.tempdir.name, "da", "bd")
+        os.makedirs(nested_dir)
+        nested_path = os.path.join(nested_dir, "c" * 28)
+        with open(nested_path, "w") as outfile:
+            outfile.write(HEADER)
+        with open(os.path.join(nested_dir, "notes.txt"), "w") as outfile:
+            outfile.write("Not a data file.")
+        os.makedirs(os.path.join(self.tempdir.name, "d" * 28))
+
+        expected = sorted([self.dump_path, self.empty_path, nested_path])
+        for threads in [1, 4]:
+            self.assertEqual(find_dump_files(self.tempdir.name, threads), expected)
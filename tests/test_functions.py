@@ -0,0 +1,162 @@
+"""Tests for running transforms, alone and in a pool of worker processes."""
+
+import os
+import tempfile
+from unittest import TestCase, mock, skipIf
+
+from bioportal_to_kgx.checkpoint import (COMPLETE_STAGE, STAGES,
+                                         get_stage_details, read_state)
+
+try:
+    from bioportal_to_kgx import functions
+except ImportError:  # Needs KGX and universalizer
+    functions = None  # type: ignore
+
+HEADER = "## http://data.bioontology.org/ontologies/{name}/submissions/1\n"
+
+
+def fake_transform(filepath: str, marker_dir: str, robot_env: dict) -> dict:
+    """
+    Stand in for transform_ontology, killing the worker for some inputs.
+
+    Inputs named crash_once kill their worker the first time only,
+    and inputs named crash kill it every time.
+    """
+    name = os.path.basename(filepath)
+    marker_path = os.path.join(marker_dir, name)
+    if name == "crash" or (name == "crash_once" and not os.path.exists(marker_path)):
+        open(marker_path, "w").close()
+        os._exit(1)
+
+    return {"txs_complete": {}, "txs_invalid": [], "tx_result": {"id": name}}
+
+
+@skipIf(functions is None, "Needs KGX and universalizer.")
+class TestTransformInPool(TestCase):
+    """Test retrying after worker crashes, and keeping input order."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.marker_dir = os.path.join(self.tempdir.name, "markers")
+        os.makedirs(self.marker_dir)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def write_dumps(self, names: list) -> list:
+        """Write a dump file with only a header for each name."""
+        paths = []
+        for name in names:
+            filepath = os.path.join(self.tempdir.name, name)
+            with open(filepath, "w") as outfile:
+                outfile.write(HEADER.format(name=name.upper()))
+            paths.append(filepath)
+        return paths
+
+    def transform(self, paths: list) -> list:
+        """Transform in a pool, with the fake transform."""
+        with mock.patch.object(functions, "transform_ontology", fake_transform):
+            return functions.transform_in_pool(paths, (self.marker_dir,), {}, 2)
+
+    def test_retry_lost_worker(self):
+        """Test that an ontology whose worker died is tried again."""
+        paths = self.write_dumps(["aaa", "crash_once", "bbb", "ccc"])
+        results = self.transform(paths)
+        self.assertEqual(
+            [result["tx_result"]["id"] for result in results],
+            ["aaa", "crash_once", "bbb", "ccc"],
+        )
+
+    def test_fail_crashing_worker(self):
+        """Test that an ontology whose worker always dies is recorded as failed."""
+        paths = self.write_dumps(["aaa", "crash", "bbb"])
+        results = self.transform(paths)
+        self.assertEqual(results[0]["tx_result"]["id"], "aaa")
+        self.assertEqual(results[1]["tx_result"]["id"], "CRASH")
+        self.assertEqual(results[1]["tx_result"]["status"], "FAIL")
+        self.assertEqual(results[1]["txs_complete"], {"CRASH_1": False})
+        self.assertEqual(results[2]["tx_result"]["id"], "bbb")
+
+
+@skipIf(functions is None, "Needs KGX and universalizer.")
+class TestRestoreFromCache(TestCase):
+    """Test the stages recorded for transforms restored from the cache."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(self.dump_path, "w") as outfile:
+            outfile.write(HEADER.format(name="TST"))
+            outfile.write("<http://x/TST_1> <http://x/p> <http://x/TST_2> .\n")
+        self.outdir = os.path.join(self.tempdir.name, "ontologies", "TST")
+        self.edges = (
+            "id\tsubject\tpredicate\tobject\n"
+            "e1\tTST:1\tbiolink:related_to\tTST:2\n"
+        )
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def fake_restore(
+        self, cache_dir: str, cache_key: str, outdir: str, outname: str
+    ) -> bool:
+        """Stand in for restore_from_cache, writing graph files."""
+        with open(os.path.join(outdir, f"{outname}_nodes.tsv"), "w") as outfile:
+            outfile.write("id\tcategory\nTST:1\tbiolink:NamedThing\n")
+        with open(os.path.join(outdir, f"{outname}_edges.tsv"), "w") as outfile:
+            outfile.write(self.edges)
+        return True
+
+    def transform(self) -> dict:
+        """Transform the dump, restoring outputs from the fake cache."""
+        with mock.patch.object(functions, "TXDIR", self.tempdir.name):
+            with mock.patch.object(functions, "restore_from_cache", self.fake_restore):
+                return functions.transform_ontology(
+                    filepath=self.dump_path,
+                    kgx_validate=False,
+                    robot_validate=False,
+                    pandas_validate=False,
+                    get_bioportal_metadata=False,
+                    ncbo_key="",
+                    write_curies=False,
+                    robot_path="",
+                    cache_dir=os.path.join(self.tempdir.name, "cache"),
+                    cache_params={},
+                    compression="",
+                    compress_threads=1,
+                    native_ontologies=[],
+                    onto_metadata={},
+                    trace_path="",
+                    kgx_validate_params={},
+                    robot_env={},
+                )
+
+    def get_state(self) -> dict:
+        """Read the state of the transform."""
+        return read_state(
+            self.outdir, "TST_1", self.dump_path, {"compression": "", "native": False}
+        )
+
+    def test_restore_checked(self):
+        """Test that the final check records itself after a restore."""
+        result = self.transform()
+        self.assertEqual(result["tx_result"]["status"], "OK")
+
+        state = self.get_state()
+        for stage in STAGES:
+            if stage != COMPLETE_STAGE:
+                self.assertTrue(get_stage_details(state, stage)["from_cache"])
+        details = get_stage_details(state, COMPLETE_STAGE)
+        self.assertNotIn("from_cache", details)
+        self.assertEqual((details["nodecount"], details["edgecount"]), (1, 1))
+
+    def test_restore_malformed(self):
+        """Test that a restore failing the final check isn't marked complete."""
+        self.edges = self.edges.replace("\tTST:2\n", "\n")
+        result = self.transform()
+        self.assertEqual(result["tx_result"]["status"], "FAIL")
+        self.assertEqual(get_stage_details(self.get_state(), COMPLETE_STAGE), {})
@@ -0,0 +1,122 @@
+"""Tests for collecting statistics on transformed ontologies."""
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx import graph_stats
+from bioportal_to_kgx.graph_stats import (NODE_TYPES, biolink_report,
+                                          get_file_stats, transform_report,
+                                          umls_report, update_file_stats,
+                                          write_reports)
+
+STY = "http://purl.bioontology.org/ontology/STY/"
+
+NODES = (
+    "id\tcategory\tname\tiri\n"
+    "A:1\tbiolink:NamedThing\tone\thttp://example.org/A_1\n"
+    "A:2\tbiolink:Cell|biolink:NamedThing\ttwo\thttp://example.org/A_2\n"
+    "\n"
+    f"A:3\tbiolink:CellularComponent\tthree\t{STY}T047\n"
+)
+EDGES = (
+    "id\tsubject\tpredicate\tobject\n"
+    "e1\tA:2\tbiolink:subclass_of\tA:1\n"
+    f"e2\tA:3\tbiolink:related_to\t{STY}T047\n"
+)
+LOG = (
+    "[KGX][MISSING_NODE_PROPERTY] A:1 missing name\n"
+    "[KGX][MISSING_NODE_PROPERTY] A:2 missing name\n"
+    "[KGX][INVALID_CATEGORY] A:3\n"
+)
+
+
+class TestGraphStats(TestCase):
+    """Test reading node, edge and log files once for all reports."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.tx_path = os.path.join(self.tempdir.name, "ontologies")
+        self.cache_path = os.path.join(self.tempdir.name, "stats_cache.json")
+        onto_dir = os.path.join(self.tx_path, "AAA")
+        os.makedirs(onto_dir)
+        self.nodes_path = os.path.join(onto_dir, "AAA_1_nodes.tsv")
+        with open(self.nodes_path, "w") as outfile:
+            outfile.write(NODES)
+        with gzip.open(os.path.join(onto_dir, "AAA_1_edges.tsv.gz"), "wt") as outfile:
+            outfile.write(EDGES)
+        with open(os.path.join(onto_dir, "kgx_validate_AAA_1.log"), "w") as outfile:
+            outfile.write(LOG)
+
+        # An ontology that failed, with only a log of its own
+        failed_dir = os.path.join(self.tx_path, "BBB")
+        os.makedirs(failed_dir)
+        with open(os.path.join(failed_dir, "robot.report"), "w") as outfile:
+            outfile.write("")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_get_file_stats(self):
+        """Test counting rows, types and semantic types in one pass."""
+        stats = get_file_stats(self.nodes_path)
+        self.assertEqual(stats["kind"], "nodes")
+        self.assertEqual(stats["lines"], 5)
+        self.assertEqual(stats["rows"], 3)
+        self.assertEqual(
+            stats["types"],
+            {
+                "biolink:NamedThing": 2,
+                "biolink:Cell": 1,
+                "biolink:CellularComponent": 1,
+            },
+        )
+        self.assertEqual(stats["sty"], {f"{STY}T047": 1})
+
+    def test_update_file_stats(self):
+        """Test that unchanged files are not read again."""
+        file_stats = update_file_stats(self.tx_path, self.cache_path, workers=2)
+        self.assertEqual(len(file_stats), 3)
+
+        with open(self.nodes_path, "a") as outfile:
+            outfile.write("A:4\tbiolink:Gene\tfour\thttp://example.org/A_4\n")
+        with mock.patch.object(
+            graph_stats, "get_file_stats", wraps=graph_stats.get_file_stats
+        ) as stats_mock:
+            refreshed = update_file_stats(self.tx_path, self.cache_path)
+        stats_mock.assert_called_once_with(self.nodes_path)
+        self.assertEqual(refreshed[self.nodes_path]["rows"], 4)
+
+    def test_reports(self):
+        """Test the reports produced from file stats."""
+        file_stats = update_file_stats(self.tx_path)
+
+        lines = biolink_report(self.tx_path, file_stats)
+        self.assertEqual(len(lines), 3)
+        aaa = lines[1].split("\t")
+        self.assertEqual(aaa[0:3], ["AAA", "3", "2"])
+        cell_column = 3 + NODE_TYPES.index("biolink:Cell")
+        self.assertEqual(aaa[cell_column], "1")
+        self.assertEqual(lines[2].split("\t")[0:3], ["BBB", "0", "0"])
+
+        lines = umls_report(self.tx_path, file_stats)
+        self.assertIn(f"2\t{STY}T047", lines)
+
+        lines = transform_report(self.tx_path, file_stats)
+        self.assertIn("All processed ontologies:\t2", lines)
+        self.assertIn("MISSING_NODE_PROPERTY\t1", lines)
+        self.assertIn("MISSING_EDGE_PROPERTY\t0", lines)
+        self.assertIn("biolink:subclass_of\t1", lines)
+        failed = [line for line in lines if line.startswith("Ontologies with failed")]
+        self.assertTrue(failed[0].endswith("BBB"))
+
+        output_dir = os.path.join(self.tempdir.name, "stats")
+        report_paths = write_reports(self.tx_path, output_dir, ["counts", "types"])
+        self.assertEqual(
+            sorted(os.listdir(output_dir)), ["all_counts.tsv", "all_types.tsv"]
+        )
+        with open(report_paths[1]) as infile:
+            self.assertIn("biolink:related_to biolink:subclass_of", infile.read())
@@ -0,0 +1,173 @@
+"""Tests for processing KGX node and edge files."""
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx import graph_utils
+from bioportal_to_kgx.graph_utils import (merge_validation_errors,
+                                          process_graph_file,
+                                          process_graph_files,
+                                          split_graph_file,
+                                          validate_graph_file,
+                                          validate_graph_files)
+
+NODES = (
+    "id\tcategory\tname\n"
+    "A:1\tbiolink:NamedThing\tone\n"
+    "A:2\tbiolink:NamedThing\ttwo\n"
+)
+EDGES = (
+    "id\tsubject\tpredicate\tobject\tknowledge_source\n"
+    "e1\tA:1\tbiolink:subclass_of\tA:2\tinfores:bioportal\n"
+)
+MD = {"full_name": "Test Ontology", "bp_version": "BioPortal 1"}
+
+
+class TestGraphUtils(TestCase):
+    """Test single-pass checks of graph files."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.nodes_path = os.path.join(self.tempdir.name, "TEST_1_nodes.tsv")
+        self.edges_path = os.path.join(self.tempdir.name, "TEST_1_edges.tsv")
+        with open(self.nodes_path, "w") as outfile:
+            outfile.write(NODES)
+        with open(self.edges_path, "w") as outfile:
+            outfile.write(EDGES)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_process_graph_files(self):
+        """Test that rows are counted and metadata goes on edges only."""
+        all_stats = process_graph_files(self.tempdir.name, MD)
+        self.assertEqual(all_stats[self.nodes_path]["rows"], 2)
+        self.assertEqual(all_stats[self.edges_path]["rows"], 1)
+        self.assertFalse(all_stats[self.nodes_path]["md_added"])
+        self.assertTrue(all_stats[self.edges_path]["md_added"])
+        with open(self.nodes_path) as infile:
+            self.assertEqual(infile.read(), NODES)
+        with open(self.edges_path) as infile:
+            header, row = infile.read().splitlines()
+        self.assertEqual(
+            header.split("\t"),
+            [
+                "id",
+                "subject",
+                "predicate",
+                "object",
+                "primary_knowledge_source",
+                "aggregator_knowledge_source",
+            ],
+        )
+        self.assertEqual(row.split("\t")[-2:], ["Test Ontology", "BioPortal 1"])
+
+    def test_metadata_not_added_twice(self):
+        """Test that metadata already in the header isn't added again."""
+        process_graph_file(self.edges_path, MD)
+        with open(self.edges_path) as infile:
+            first_pass = infile.read()
+        stats = process_graph_file(self.edges_path, MD)
+        self.assertFalse(stats["md_added"])
+        with open(self.edges_path) as infile:
+            self.assertEqual(infile.read(), first_pass)
+
+    def test_malformed_and_short(self):
+        """Test that malformed rows and short files are detected."""
+        with open(self.nodes_path, "a") as outfile:
+            outfile.write("A:3\tbiolink:NamedThing\n")
+        stats = process_graph_file(self.nodes_path)
+        self.assertEqual(stats["malformed_rows"], 1)
+        self.assertEqual(stats["first_malformed_line"], 4)
+        self.assertFalse(stats["too_short"])
+
+        with open(self.edges_path, "w") as outfile:
+            outfile.write("\n")
+        stats = process_graph_file(self.edges_path, MD)
+        self.assertTrue(stats["too_short"])
+        self.assertFalse(stats["md_added"])
+
+    def test_validate_graph_files(self):
+        """Test that nodes and edges are counted separately."""
+        all_stats = validate_graph_files(self.tempdir.name)
+        self.assertEqual(all_stats[self.nodes_path]["rows"], 2)
+        self.assertEqual(all_stats[self.edges_path]["rows"], 1)
+        self.assertEqual(all_stats[self.edges_path]["columns"], 5)
+
+    def test_validate_across_blocks(self):
+        """Test that rows split across blocks are read whole."""
+        row = "A:1\tbiolink:NamedThing\tone\n"
+        with open(self.nodes_path, "w") as outfile:
+            outfile.write("id\tcategory\tname\n" + row * 1000)
+            outfile.write("\n" + "A:2\tone\n" + row.rstrip("\n"))
+        with mock.patch.object(graph_utils, "BLOCK_SIZE", 7):
+            stats = validate_graph_file(self.nodes_path)
+        self.assertEqual(stats["rows"], 1002)
+        self.assertEqual(stats["malformed_rows"], 1)
+        self.assertEqual(stats["first_malformed_line"], 1003)
+        with open(self.nodes_path, "rb") as infile:
+            infile.seek(stats["first_malformed_offset"])
+            self.assertEqual(infile.readline(), b"A:2\tone\n")
+
+    def test_compress_graph_files(self):
+        """Test that files are compressed in the same pass as metadata."""
+        all_stats = process_graph_files(self.tempdir.name, MD, "gzip", 2)
+        gz_edges_path = self.edges_path + ".gz"
+        self.assertEqual(
+            sorted(all_stats), sorted([self.nodes_path + ".gz", gz_edges_path])
+        )
+        self.assertFalse(os.path.exists(self.edges_path))
+        self.assertTrue(all_stats[gz_edges_path]["md_added"])
+        with gzip.open(gz_edges_path, "rt") as infile:
+            self.assertIn("primary_knowledge_source", infile.readline())
+        all_stats = validate_graph_files(self.tempdir.name)
+        self.assertEqual(all_stats[gz_edges_path]["rows"], 1)
+        self.assertEqual(all_stats[self.nodes_path + ".gz"]["rows"], 2)
+
+    def test_split_graph_file(self):
+        """Test splitting a file into batches, each with the header."""
+        with gzip.open(self.nodes_path + ".gz", "wt") as outfile:
+            outfile.write(NODES.rstrip("\n") + "\n\nA:3\tbiolink:NamedThing\tthree")
+        batch_dir = os.path.join(self.tempdir.name, "batches")
+        os.makedirs(batch_dir)
+
+        batch_paths = list(split_graph_file(self.nodes_path + ".gz", batch_dir, 2))
+        self.assertEqual(
+            [os.path.basename(path) for path in batch_paths],
+            ["TEST_1_00000_nodes.tsv", "TEST_1_00001_nodes.tsv"],
+        )
+        with open(batch_paths[1]) as infile:
+            self.assertEqual(
+                infile.read(), "id\tcategory\tname\nA:3\tbiolink:NamedThing\tthree\n"
+            )
+
+        sample_paths = list(
+            split_graph_file(self.edges_path, batch_dir, 2, sample_fraction=0.01)
+        )
+        self.assertEqual(sample_paths, [])
+
+    def test_merge_validation_errors(self):
+        """Test that errors merge without repeating or too many entities."""
+        merged = {}
+        merge_validation_errors(
+            merged, {"ERROR": {"MISSING_CATEGORY": {"No category": ["A:1"]}}}, 2
+        )
+        merge_validation_errors(
+            merged,
+            {
+                "ERROR": {"MISSING_CATEGORY": {"No category": ["A:1", "A:2", "A:3"]}},
+                "WARNING": {"DUPLICATE_NODE": {"Duplicate": ["A:4"]}},
+            },
+            2,
+        )
+        self.assertEqual(
+            merged,
+            {
+                "ERROR": {"MISSING_CATEGORY": {"No category": ["A:1", "A:2"]}},
+                "WARNING": {"DUPLICATE_NODE": {"Duplicate": ["A:4"]}},
+            },
+        )
@@ -0,0 +1,83 @@
+"""Tests for indexing which ontologies define or reference each node ID."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.id_index import lookup_ids, update_id_index
+
+NODES = {
+    "AAA": (
+        "id\tcategory\tname\tiri\n"
+        "AAA:1\tbiolink:NamedThing\tone\thttp://x/AAA_1\n"
+        "AAA:2\tbiolink:NamedThing\ttwo\thttp://x/AAA_2\n"
+        "BBB:1\tbiolink:NamedThing\tb one\thttp://x/BBB_1\n"
+    ),
+    "BBB": (
+        "id\tcategory\tname\n"
+        "BBB:1\tbiolink:NamedThing\tone\n"
+        "BBB:2\tbiolink:NamedThing\ttwo\n"
+    ),
+}
+
+
+class TestIdIndex(TestCase):
+    """Test building, updating, and searching the ID index."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.tx_path = os.path.join(self.tempdir.name, "ontologies")
+        self.index_path = os.path.join(self.tempdir.name, "id_index.sqlite")
+        for ontology, nodes in NODES.items():
+            self.write_nodes(ontology, nodes)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def write_nodes(self, ontology: str, nodes: str) -> None:
+        """Write an ontology's node file."""
+        onto_dir = os.path.join(self.tx_path, ontology)
+        os.makedirs(onto_dir, exist_ok=True)
+        with open(os.path.join(onto_dir, f"{ontology}_1_nodes.tsv"), "w") as outfile:
+            outfile.write(nodes)
+
+    def test_lookup_ids(self):
+        """Test finding defining ontologies first, by ID or IRI."""
+        result = update_id_index(self.tx_path, self.index_path, workers=2)
+        self.assertEqual(sorted(result["updated"]), ["AAA", "BBB"])
+
+        found = lookup_ids(self.index_path, ["BBB:1", "http://x/AAA_2", "CCC:1"])
+        self.assertEqual(
+            found["BBB:1"],
+            [
+                {"ontology": "BBB", "role": "defined"},
+                {"ontology": "AAA", "role": "referenced"},
+            ],
+        )
+        self.assertEqual(
+            found["http://x/AAA_2"], [{"ontology": "AAA", "role": "defined"}]
+        )
+        self.assertEqual(found["CCC:1"], [])
+
+    def test_update_id_index(self):
+        """Test that only changed ontologies are indexed again."""
+        update_id_index(self.tx_path, self.index_path)
+        result = update_id_index(self.tx_path, self.index_path)
+        self.assertEqual(result, {"updated": [], "removed": [], "unchanged": 2})
+
+        self.write_nodes("BBB", NODES["BBB"] + "BBB:3\tbiolink:NamedThing\tthree\n")
+        result = update_id_index(self.tx_path, self.index_path)
+        self.assertEqual(result, {"updated": ["BBB"], "removed": [], "unchanged": 1})
+        self.assertEqual(
+            lookup_ids(self.index_path, ["BBB:3"])["BBB:3"],
+            [{"ontology": "BBB", "role": "defined"}],
+        )
+
+        os.remove(os.path.join(self.tx_path, "AAA", "AAA_1_nodes.tsv"))
+        os.rmdir(os.path.join(self.tx_path, "AAA"))
+        result = update_id_index(self.tx_path, self.index_path)
+        self.assertEqual(result["removed"], ["AAA"])
+        self.assertEqual(lookup_ids(self.index_path, ["AAA:1"])["AAA:1"], [])
+        self.assertEqual(len(lookup_ids(self.index_path, ["BBB:1"])["BBB:1"]), 1)
@@ -0,0 +1,119 @@
+"""Tests for merging transforms into one de-duplicated graph."""
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx import merge_graph as merge_module
+from bioportal_to_kgx.compress_utils import open_file
+from bioportal_to_kgx.merge_graph import merge_graph, merge_rows
+
+NODES = {
+    "AAA": (
+        "id\tcategory\tname\tprovided_by\n"
+        "BFO:1\tbiolink:NamedThing\tentity\tAAA\n"
+        "A:1\tbiolink:Cell\tcell\tAAA\n"
+    ),
+    "BBB": (
+        "id\tname\tcategory\tprovided_by\tiri\n"
+        "BFO:1\tEntity\tbiolink:Entity|biolink:NamedThing\tBBB\thttp://x/BFO_1\n"
+        "B:1\tb\tbiolink:Gene\tBBB\t\n"
+        "\tno id\tbiolink:Gene\tBBB\t\n"
+    ),
+}
+EDGES = {
+    "AAA": (
+        "id\tsubject\tpredicate\tobject\n"
+        "e1\tA:1\tbiolink:subclass_of\tBFO:1\n"
+    ),
+    "BBB": (
+        "id\tsubject\tpredicate\tobject\tknowledge_source\n"
+        "e2\tA:1\tbiolink:subclass_of\tBFO:1\tBBB\n"
+        "e3\tB:1\tbiolink:subclass_of\tBFO:1\tBBB\n"
+    ),
+}
+
+
+class TestMergeGraph(TestCase):
+    """Test merging node and edge files with an external sort."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.tx_path = os.path.join(self.tempdir.name, "ontologies")
+        self.output_dir = os.path.join(self.tempdir.name, "merged")
+        for ontology in NODES:
+            onto_dir = os.path.join(self.tx_path, ontology)
+            os.makedirs(onto_dir)
+            with open(
+                os.path.join(onto_dir, f"{ontology}_1_nodes.tsv"), "w"
+            ) as outfile:
+                outfile.write(NODES[ontology])
+            edges_path = os.path.join(onto_dir, f"{ontology}_1_edges.tsv.gz")
+            with gzip.open(edges_path, "wt") as outfile:
+                outfile.write(EDGES[ontology])
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def read_merged(self, path: str) -> list:
+        """Read the lines of a merged file, compressed or not."""
+        with open_file(path) as infile:
+            return infile.read().splitlines()
+
+    def test_merge_rows(self):
+        """Test keeping all values of some columns, and the first of others."""
+        headers = {0: ["id", "category", "name"], 1: ["id", "name", "category"]}
+        rows = [
+            (0, "X:1\tbiolink:Gene|biolink:NamedThing\tx"),
+            (1, "X:1\tX\tbiolink:Gene"),
+        ]
+        merged, conflicts = merge_rows(rows, headers, ["id", "category", "name"], [])
+        self.assertEqual(merged, ["X:1", "biolink:Gene|biolink:NamedThing", "x"])
+        self.assertEqual(conflicts, 1)
+
+    def test_merge_graph(self):
+        """Test that the merged graph is the same with or without spilling runs."""
+        stats = merge_graph(self.tx_path, self.output_dir, workers=2)
+        self.assertEqual(stats["nodes"]["rows_read"], 5)
+        self.assertEqual(stats["nodes"]["skipped"], 1)
+        self.assertEqual(stats["nodes"]["rows"], 3)
+        self.assertEqual(stats["nodes"]["duplicates"], 1)
+        self.assertEqual(stats["edges"]["rows"], 2)
+        self.assertEqual(stats["edges"]["conflicts"], 0)
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)),
+            ["kg-bioportal_edges.tsv", "kg-bioportal_nodes.tsv"],
+        )
+
+        nodes = self.read_merged(stats["paths"][0])
+        self.assertEqual(
+            [nodes[0]] + sorted(nodes[1:]),
+            [
+                "id\tcategory\tname\tprovided_by\tiri",
+                "A:1\tbiolink:Cell\tcell\tAAA\t",
+                "B:1\tbiolink:Gene\tb\tBBB\t",
+                "BFO:1\tbiolink:Entity|biolink:NamedThing\tentity\tAAA|BBB\t"
+                "http://x/BFO_1",
+            ],
+        )
+        edges = self.read_merged(stats["paths"][1])
+        self.assertIn("e1\tA:1\tbiolink:subclass_of\tBFO:1\tBBB", edges)
+
+        # One row per run, merged a few runs at a time,
+        # gives the same graph
+        spill_dir = os.path.join(self.tempdir.name, "spilled")
+        with mock.patch.object(
+            merge_module, "ROW_OVERHEAD", 1024 * 1024
+        ), mock.patch.object(merge_module, "MAX_FANIN", 2):
+            spilled = merge_graph(
+                self.tx_path, spill_dir, workers=1, compression="gzip"
+            )
+        self.assertEqual(self.read_merged(spilled["paths"][0]), nodes)
+        self.assertEqual(self.read_merged(spilled["paths"][1]), edges)
+        self.assertEqual(
+            sorted(os.listdir(spill_dir)),
+            ["kg-bioportal_edges.tsv.gz", "kg-bioportal_nodes.tsv.gz"],
+        )
@@ -0,0 +1,166 @@
+"""Test that native transforms match transforms through ROBOT."""
+
+import csv
+import json
+import os
+import tempfile
+from unittest import TestCase, skipIf
+
+from bioportal_to_kgx.dump_utils import dump_body
+from bioportal_to_kgx.ntriples_utils import (get_obograph_edges,
+                                             get_obograph_nodes, load_triples,
+                                             open_triple_store)
+from bioportal_to_kgx.robot_utils import initialize_robot, robot_chain
+
+try:
+    import kgx.cli  # type: ignore
+
+    from bioportal_to_kgx.native_source import native_transform
+except ImportError:
+    kgx = None
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "resources", "native")
+HEADER = "## http://data.bioontology.org/ontologies/TST/submissions/1\n"
+ROBOT_PATH = os.path.join(os.getcwd(), "robot")
+KNOWLEDGE_SOURCES = [
+    ("aggregator_knowledge_source", "BioPortal"),
+    ("primary_knowledge_source", "Test"),
+]
+
+# Columns expected to match, as others include
+# generated edge IDs and input file names
+NODE_COLUMNS = ["id", "category", "name", "description", "synonym", "xref", "iri"]
+EDGE_COLUMNS = ["subject", "predicate", "object", "relation"]
+
+# Parts of OBO Graph nodes KGX reads
+NODE_KEYS = ["id", "type", "lbl", "meta"]
+
+
+def read_rows(filepath: str, columns: list) -> list:
+    """Read selected columns from a KGX TSV, sorted."""
+    with open(filepath) as infile:
+        reader = csv.DictReader(infile, delimiter="\t", quoting=csv.QUOTE_NONE)
+        return sorted(
+            tuple(row.get(column, "") for column in columns) for row in reader
+        )
+
+
+def read_graph(filepath: str) -> tuple:
+    """Read the nodes and edges of OBO Graph JSON, sorted."""
+    with open(filepath) as infile:
+        graph = json.load(infile)["graphs"][0]
+    return get_graph(graph["nodes"], graph["edges"])
+
+
+def get_graph(nodes: list, edges: list) -> tuple:
+    """Sort nodes and edges, keeping only what KGX reads."""
+    return (
+        sorted(
+            json.dumps(
+                {key: node[key] for key in NODE_KEYS if key in node}, sort_keys=True
+            )
+            for node in nodes
+        ),
+        sorted((edge["sub"], edge["pred"], edge["obj"]) for edge in edges),
+    )
+
+
+class TestNativeGraphs(TestCase):
+    """
+    Compare native graphs with the OBO Graph JSON ROBOT relax writes.
+
+    The expected graphs in resources/native are ROBOT's output
+    for each fixture, and are checked against ROBOT (the version
+    post_setup installs) by TestNativeParity, which runs in CI.
+    """
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def assert_graph(self, name: str) -> None:
+        """Build a graph from a fixture and compare it to ROBOT's."""
+        conn = open_triple_store(os.path.join(self.tempdir.name, "triples.db"))
+        try:
+            load_triples(os.path.join(RESOURCES, f"{name}.nt"), 0, conn)
+            native_graph = get_graph(
+                list(get_obograph_nodes(conn)), list(get_obograph_edges(conn))
+            )
+        finally:
+            conn.close()
+
+        self.assertEqual(
+            native_graph, read_graph(os.path.join(RESOURCES, f"{name}_relaxed.json"))
+        )
+
+    def test_hierarchy_graph(self):
+        """Test a plain class hierarchy."""
+        self.assert_graph("hierarchy")
+
+    def test_restrictions_graph(self):
+        """Test a hierarchy with existential restrictions."""
+        self.assert_graph("restrictions")
+
+
+@skipIf(kgx is None or not os.path.exists(ROBOT_PATH), "Needs KGX and ROBOT.")
+class TestNativeParity(TestCase):
+    """Compare native and ROBOT transforms of fixture ontologies."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.robot_env = initialize_robot(ROBOT_PATH)[1]
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def assert_parity(self, name: str) -> None:
+        """Transform a fixture both ways and compare outputs."""
+        dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(os.path.join(RESOURCES, name)) as infile:
+            with open(dump_path, "w") as outfile:
+                outfile.write(HEADER + infile.read())
+
+        relaxed_path = os.path.join(self.tempdir.name, "TST_1_relaxed.json")
+        with dump_body(dump_path, len(HEADER)) as body_path:
+            status = robot_chain(ROBOT_PATH, body_path, self.robot_env, relaxed_path)
+        self.assertTrue(status["relax"])
+        # Keeps the expected graphs used without ROBOT up to date
+        self.assertEqual(
+            read_graph(relaxed_path),
+            read_graph(os.path.join(RESOURCES, name.replace(".nt", "_relaxed.json"))),
+        )
+        robot_outpath = os.path.join(self.tempdir.name, "robot")
+        kgx.cli.transform(
+            inputs=[relaxed_path],
+            input_format="obojson",
+            output=robot_outpath,
+            output_format="tsv",
+            stream=True,
+            knowledge_sources=KNOWLEDGE_SOURCES,
+        )
+
+        native_outpath = os.path.join(self.tempdir.name, "native")
+        native_transform(dump_path, native_outpath, KNOWLEDGE_SOURCES)
+
+        self.assertEqual(
+            read_rows(native_outpath + "_nodes.tsv", NODE_COLUMNS),
+            read_rows(robot_outpath + "_nodes.tsv", NODE_COLUMNS),
+        )
+        self.assertEqual(
+            read_rows(native_outpath + "_edges.tsv", EDGE_COLUMNS),
+            read_rows(robot_outpath + "_edges.tsv", EDGE_COLUMNS),
+        )
+
+    def test_hierarchy_parity(self):
+        """Test a plain class hierarchy."""
+        self.assert_parity("hierarchy.nt")
+
+    def test_restrictions_parity(self):
+        """Test a hierarchy with existential restrictions."""
+        self.assert_parity("restrictions.nt")
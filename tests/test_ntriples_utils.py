@@ -0,0 +1,112 @@
+"""Tests for reading ontologies directly from N-Triples."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.ntriples_utils import (get_obograph_edges,
+                                             get_obograph_nodes, load_triples,
+                                             open_triple_store, parse_object,
+                                             parse_triple)
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "resources", "native")
+HEADER = "## http://data.bioontology.org/ontologies/TST/submissions/1\n"
+OBO = "http://purl.obolibrary.org/obo/"
+
+
+class TestNTriplesUtils(TestCase):
+    """Test parsing N-Triples and building OBO Graph objects."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.conn = open_triple_store(os.path.join(self.tempdir.name, "t.db"))
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.conn.close()
+        self.tempdir.cleanup()
+
+    def load_fixture(self, name: str) -> dict:
+        """Write a fixture as a dump file and load it."""
+        dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(os.path.join(RESOURCES, name)) as infile:
+            with open(dump_path, "w") as outfile:
+                outfile.write(HEADER + infile.read())
+        return load_triples(dump_path, len(HEADER), self.conn)
+
+    def test_parse_triple(self):
+        """Test that triples are split and objects decoded."""
+        self.assertEqual(
+            parse_triple('<http://a> <http://p> "x y" .\n'),
+            ("http://a", "http://p", '"x y"'),
+        )
+        self.assertEqual(
+            parse_triple("_:b1\t<http://p>\t<http://o> .\n"),
+            ("_:b1", "http://p", "<http://o>"),
+        )
+        self.assertIsNone(parse_triple("<http://a> <http://p>\n"))
+        self.assertEqual(parse_object('"caf\\u00E9 \\"x\\""@en'), ('café "x"', "en"))
+        self.assertEqual(parse_object('"true"^^<http://t>'), ("true", ""))
+
+    def test_hierarchy(self):
+        """Test nodes and is_a edges from a plain class hierarchy."""
+        counts = self.load_fixture("hierarchy.nt")
+        self.assertEqual(counts["malformed"], 0)
+        nodes = {node["id"]: node for node in get_obograph_nodes(self.conn)}
+        self.assertEqual(len(nodes), 4)
+        leaf = nodes[OBO + "TST_0000002"]
+        self.assertEqual(leaf["lbl"], "leaf")
+        self.assertEqual(
+            leaf["meta"]["synonyms"],
+            [
+                {"pred": "hasExactSynonym", "val": "foliage leaf"},
+                {"pred": "hasRelatedSynonym", "val": "frond"},
+            ],
+        )
+        self.assertEqual(leaf["meta"]["xrefs"], [{"val": "PO:0025034"}])
+        self.assertEqual(nodes[OBO + "TST_0000003"]["lbl"], 'root "primary" part')
+        self.assertTrue(nodes[OBO + "TST_0000004"]["meta"]["deprecated"])
+        self.assertEqual(
+            nodes[OBO + "TST_0000001"]["meta"]["definition"],
+            {"val": "A part of an organism."},
+        )
+        edges = list(get_obograph_edges(self.conn))
+        self.assertEqual(
+            edges,
+            [
+                {
+                    "sub": OBO + "TST_0000002",
+                    "pred": "is_a",
+                    "obj": OBO + "TST_0000001",
+                },
+                {
+                    "sub": OBO + "TST_0000003",
+                    "pred": "is_a",
+                    "obj": OBO + "TST_0000001",
+                },
+            ],
+        )
+
+    def test_restrictions(self):
+        """Test edges from simple existential restrictions."""
+        self.load_fixture("restrictions.nt")
+        nodes = {node["id"]: node for node in get_obograph_nodes(self.conn)}
+        self.assertEqual(nodes[OBO + "BFO_0000050"]["type"], "PROPERTY")
+        self.assertEqual(
+            nodes[OBO + "TST_0000012"]["meta"]["basicPropertyValues"],
+            [
+                {
+                    "pred": "http://www.w3.org/2004/02/skos/core#exactMatch",
+                    "val": OBO + "PO_0009031",
+                }
+            ],
+        )
+        edges = list(get_obograph_edges(self.conn))
+        self.assertEqual(
+            [(edge["sub"], edge["pred"], edge["obj"]) for edge in edges],
+            [
+                (OBO + "TST_0000011", OBO + "BFO_0000050", OBO + "TST_0000010"),
+                (OBO + "TST_0000012", OBO + "BFO_0000050", OBO + "TST_0000010"),
+            ],
+        )
@@ -0,0 +1,91 @@
+"""Tests for inferring prefixes from node IDs."""
+
+import csv
+import gzip
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.prefix_utils import (PREFIX_FIELDS, TrieNode,
+                                           find_namespaces, infer_prefixes,
+                                           insert_id, tokenize_id,
+                                           write_prefixes)
+
+
+class TestPrefixUtils(TestCase):
+    """Test finding namespaces in a trie of IDs."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.tx_path = os.path.join(self.tempdir.name, "ontologies")
+        ids = {
+            "PATO": [f"http://purl.obolibrary.org/obo/PATO_{i:07d}" for i in range(5)]
+            + [f"GO:{i:07d}" for i in range(2)],
+            "XO": [
+                "http://example.org/xo#Continuant",
+                "http://example.org/xo#has_part",
+                "http://example.org/xo#Occurrent",
+            ],
+        }
+        for ontology, node_ids in ids.items():
+            onto_dir = os.path.join(self.tx_path, ontology)
+            os.makedirs(onto_dir)
+            nodes_path = os.path.join(onto_dir, f"{ontology}_1_nodes.tsv.gz")
+            with gzip.open(nodes_path, "wt") as outfile:
+                outfile.write("category\tid\tname\n")
+                for node_id in node_ids:
+                    outfile.write(f"biolink:NamedThing\t{node_id}\tname\n")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_tokenize_id(self):
+        """Test that tokens join to give the ID again."""
+        node_id = "http://biomodels.net/SBO/#SBO:0000001"
+        tokens = tokenize_id(node_id)
+        self.assertEqual("".join(tokens), node_id)
+        self.assertEqual(tokens[-2:], ["#SBO", ":0000001"])
+
+    def test_find_namespaces(self):
+        """Test choosing a split for each kind of ID."""
+        root = TrieNode()
+        for node_id in [
+            "http://purl.org/obo/owl/GO#GO_0000001",
+            "http://purl.org/obo/owl/GO#GO_0000002",
+            "http://biomodels.net/SBO/#SBO:0000001",
+            "http://purl.bioontology.org/ontology/SNOMEDCT/123",
+            "http://purl.bioontology.org/ontology/SNOMEDCT/456",
+        ]:
+            insert_id(root, node_id)
+        self.assertEqual(
+            find_namespaces(root),
+            [
+                ("http://biomodels.net/SBO/#SBO", ":", 1),
+                ("http://purl.bioontology.org/ontology/SNOMEDCT", "/", 2),
+                ("http://purl.org/obo/owl/GO#GO", "_", 2),
+            ],
+        )
+
+    def test_infer_prefixes(self):
+        """Test inferring and writing prefixes for each ontology."""
+        rows = infer_prefixes(self.tx_path, workers=2)
+        self.assertEqual(
+            [(row["ontology"], row["prefix"], row["delimiter"]) for row in rows],
+            [
+                ("PATO", "GO", ":"),
+                ("PATO", "http://purl.obolibrary.org/obo/PATO", "_"),
+                ("XO", "http://example.org/xo", "#"),
+            ],
+        )
+        self.assertEqual(rows[0]["native"], "Unknown")
+        self.assertEqual(rows[1]["native"], "True")
+        self.assertEqual(len(infer_prefixes(self.tx_path, min_count=3)), 2)
+
+        output_path = os.path.join(self.tempdir.name, "prefixes.tsv")
+        write_prefixes(rows, output_path)
+        with open(output_path, newline="") as infile:
+            reader = csv.DictReader(infile, delimiter="\t")
+            self.assertEqual(reader.fieldnames, PREFIX_FIELDS)
+            self.assertEqual(list(reader), rows)
@@ -0,0 +1,167 @@
+"""Tests for functions repairing transform inputs."""
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from bioportal_to_kgx import repair_utils
+from bioportal_to_kgx.repair_utils import (has_bad_curie, repair_bad_curies,
+                                           sanitize_dump)
+
+GOOD_JSON = (
+    '{"graphs" : [ {\n'
+    '  "nodes" : [ {\n'
+    '    "id" : "http://purl.obolibrary.org/obo/TST_0000001",\n'
+    '    "lbl" : "see file:C:/notes.txt"\n'
+    "  } ]\n"
+    "} ] }\n"
+)
+BAD_JSON = (
+    '{"graphs" : [ {\n'
+    '  "nodes" : [ {\n'
+    '    "id" : "file:C:/Users/ontology.owl#TST_0000001"\n'
+    "  }, {\n"
+    '    "id" : "file:/home/ontology.owl#TST_0000002"\n'
+    "  } ]\n"
+    "} ] }\n"
+)
+REPAIRED_JSON = BAD_JSON.replace('"file:C:', '"OBO:').replace('"file:', '"OBO:')
+
+DUMP_HEADER = b"## http://data.bioontology.org/ontologies/TST/submissions/1\n"
+SUBCLASS = (
+    b"<http://example.org/A> "
+    b"<http://www.w3.org/2000/01/rdf-schema#subClassOf> "
+    b"<http://example.org/B> .\n"
+)
+GOOD_COMMENT = (
+    b"<http://example.org/A> "
+    b'<http://www.w3.org/2000/01/rdf-schema#comment> "A \\"fine\\" comment" .\n'
+)
+NULL_COMMENT = (
+    b"<http://example.org/A> "
+    b'<http://www.w3.org/2000/01/rdf-schema#comment> "null\\u0000" .\n'
+)
+# A literal with an unescaped line break, leaving two broken lines
+BROKEN_COMMENT = (
+    b"<http://example.org/B> "
+    b'<http://www.w3.org/2000/01/rdf-schema#comment> "A broken\n'
+    b'comment" .\n'
+)
+
+
+class TestRepairUtils(TestCase):
+    """Test repairing malformed CURIEs."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.good_path = os.path.join(self.tempdir.name, "good_relaxed.json")
+        with open(self.good_path, "w") as outfile:
+            outfile.write(GOOD_JSON)
+        self.bad_path = os.path.join(self.tempdir.name, "bad_relaxed.json")
+        with open(self.bad_path, "w") as outfile:
+            outfile.write(BAD_JSON)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_has_bad_curie(self):
+        """Test finding file: CURIEs, but not text mentioning files."""
+        self.assertFalse(has_bad_curie(self.good_path))
+        self.assertTrue(has_bad_curie(self.bad_path))
+
+    def test_repair_skips_good_file(self):
+        """Test that files without problems aren't rewritten."""
+        mtime = os.stat(self.good_path).st_mtime_ns
+        self.assertEqual(repair_bad_curies(self.good_path), 0)
+        self.assertEqual(os.stat(self.good_path).st_mtime_ns, mtime)
+
+    def test_repair(self):
+        """Test repairing, with matches split across small blocks."""
+        for block_size in [3, 7, 4096]:
+            with open(self.bad_path, "w") as outfile:
+                outfile.write(BAD_JSON)
+            with mock.patch.object(repair_utils, "BLOCK_SIZE", block_size):
+                self.assertEqual(repair_bad_curies(self.bad_path), 2)
+            with open(self.bad_path) as infile:
+                self.assertEqual(infile.read(), REPAIRED_JSON)
+
+    def test_repair_interrupted(self):
+        """Test that an interrupted repair leaves the original file as it was."""
+
+        def fail_partway(infile, outfile):
+            outfile.write(infile.read(len(BAD_JSON) // 2).replace(b"file:", b"OBO:"))
+            raise KeyboardInterrupt
+
+        with mock.patch.object(repair_utils, "repair_blocks", fail_partway):
+            with self.assertRaises(KeyboardInterrupt):
+                repair_bad_curies(self.bad_path)
+        with open(self.bad_path) as infile:
+            self.assertEqual(infile.read(), BAD_JSON)
+        self.assertEqual(
+            sorted(os.listdir(self.tempdir.name)),
+            ["bad_relaxed.json", "good_relaxed.json"],
+        )
+
+    def test_repair_compressed(self):
+        """Test repairing a gzip-compressed file."""
+        gz_path = self.bad_path + ".gz"
+        with gzip.open(gz_path, "wt") as outfile:
+            outfile.write(BAD_JSON)
+        self.assertEqual(repair_bad_curies(gz_path), 2)
+        with gzip.open(gz_path, "rt") as infile:
+            self.assertEqual(infile.read(), REPAIRED_JSON)
+        self.assertEqual(
+            sorted(os.listdir(self.tempdir.name)),
+            ["bad_relaxed.json", "bad_relaxed.json.gz", "good_relaxed.json"],
+        )
+
+
+class TestSanitizeDump(TestCase):
+    """Test removing triples ROBOT can't handle from dump files."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.out_path = os.path.join(self.tempdir.name, "sanitized.nt")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def write_dump(self, body: bytes) -> str:
+        """Write a dump file with the given body."""
+        dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(dump_path, "wb") as outfile:
+            outfile.write(DUMP_HEADER + body)
+        return dump_path
+
+    def test_clean_dump(self):
+        """Test that nothing is written for a dump without problems."""
+        dump_path = self.write_dump(SUBCLASS + GOOD_COMMENT + SUBCLASS)
+        self.assertEqual(sanitize_dump(dump_path, len(DUMP_HEADER), self.out_path), {})
+        self.assertFalse(os.path.exists(self.out_path))
+
+    def test_sanitize_dump(self):
+        """Test removing broken comments, with lines split across blocks."""
+        body = (
+            SUBCLASS
+            + GOOD_COMMENT
+            + NULL_COMMENT
+            + SUBCLASS
+            + BROKEN_COMMENT
+            + SUBCLASS
+            + GOOD_COMMENT
+        )
+        dump_path = self.write_dump(body)
+        for block_size in [5, 64, 4096]:
+            with mock.patch.object(repair_utils, "BLOCK_SIZE", block_size):
+                fixes = sanitize_dump(dump_path, len(DUMP_HEADER), self.out_path)
+            self.assertEqual(fixes, {"null_comment": 1, "malformed_comment": 2})
+            with open(self.out_path, "rb") as infile:
+                self.assertEqual(
+                    infile.read(),
+                    SUBCLASS + GOOD_COMMENT + SUBCLASS + SUBCLASS + GOOD_COMMENT,
+                )
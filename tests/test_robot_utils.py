@@ -0,0 +1,162 @@
+"""Tests for ROBOT utility functions."""
+
+import json
+import os
+import stat
+import tempfile
+from unittest import TestCase, skipIf
+
+from bioportal_to_kgx.dump_utils import dump_body
+from bioportal_to_kgx.robot_utils import (MIN_JAVA_HEAP_MB,
+                                          estimate_robot_heap, get_robot_heap,
+                                          initialize_robot, robot_chain,
+                                          set_robot_heap)
+
+# Stands in for ROBOT: logs its arguments, and writes each --output
+# as a report with one error, until it reaches a relax if that fails
+FAKE_ROBOT = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/calls.log"
+while [ $# -gt 0 ]; do
+    if [ "$1" = "relax" ] && [ -n "$FAIL_RELAX" ]; then exit 1; fi
+    if [ "$1" = "--output" ]; then printf "ERROR\\tlabel\\tx\\n" > "$2"; fi
+    shift
+done
+"""
+
+ROBOT_PATH = os.path.join(os.getcwd(), "robot")
+RESOURCES = os.path.join(os.path.dirname(__file__), "resources", "native")
+HEADER = "## http://data.bioontology.org/ontologies/TST/submissions/1\n"
+
+
+class TestRobotHeap(TestCase):
+    """Test sizing of ROBOT heaps."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.small_path = os.path.join(self.tempdir.name, "small.nt")
+        with open(self.small_path, "w") as outfile:
+            outfile.write("<http://a> <http://b> <http://c> .\n")
+        self.large_path = os.path.join(self.tempdir.name, "large.nt")
+        with open(self.large_path, "wb") as outfile:
+            outfile.truncate(1024 * 1024 * 1024)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_estimate_robot_heap(self):
+        """Test that heap estimates scale with input and stay in bounds."""
+        small_heap = estimate_robot_heap(self.small_path, 64000)
+        large_heap = estimate_robot_heap(self.large_path, 64000)
+        self.assertEqual(small_heap, MIN_JAVA_HEAP_MB)
+        self.assertGreater(large_heap, small_heap)
+        self.assertEqual(estimate_robot_heap(self.large_path, 4096), 4096)
+
+    def test_set_and_get_robot_heap(self):
+        """Test that heap sizes round-trip through the ROBOT environment."""
+        env = {"ROBOT_JAVA_ARGS": "-Xmx12g -XX:+UseG1GC"}
+        self.assertEqual(get_robot_heap(env), 12288)
+        new_env = set_robot_heap(env, 3000)
+        self.assertEqual(get_robot_heap(new_env), 3000)
+        self.assertEqual(env["ROBOT_JAVA_ARGS"], "-Xmx12g -XX:+UseG1GC")
+
+
+class TestRobotChain(TestCase):
+    """Test running chained ROBOT commands."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.robot_path = os.path.join(self.tempdir.name, "robot")
+        with open(self.robot_path, "w") as outfile:
+            outfile.write(FAKE_ROBOT)
+        os.chmod(self.robot_path, os.stat(self.robot_path).st_mode | stat.S_IEXEC)
+        self.log_path = os.path.join(self.tempdir.name, "calls.log")
+        self.outputs = {
+            name: os.path.join(self.tempdir.name, name)
+            for name in ["relaxed.json", "robot.measure", "robot.report"]
+        }
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_relax_only(self):
+        """Test that relax alone runs as a single command."""
+        status = robot_chain(
+            self.robot_path,
+            "input.nt",
+            os.environ.copy(),
+            relaxed_path=self.outputs["relaxed.json"],
+        )
+        self.assertEqual(status, {"relax": True})
+        with open(self.log_path) as log_file:
+            calls = log_file.readlines()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith("relax -vvv --input input.nt"))
+
+    def test_relax_measure_report(self):
+        """Test that all three commands run in one process, relax last."""
+        status = robot_chain(
+            self.robot_path,
+            "input.nt",
+            os.environ.copy(),
+            relaxed_path=self.outputs["relaxed.json"],
+            measure_path=self.outputs["robot.measure"],
+            report_path=self.outputs["robot.report"],
+        )
+        # Report is unsuccessful, as it is when it finds ontology errors,
+        # but doesn't stop relax
+        self.assertEqual(status, {"measure": True, "report": False, "relax": True})
+        with open(self.log_path) as log_file:
+            calls = log_file.readlines()
+        self.assertEqual(len(calls), 1)
+        commands = [arg for arg in calls[0].split() if arg in status]
+        self.assertEqual(commands, ["measure", "report", "relax"])
+        self.assertIn("--fail-on none", calls[0])
+        for output_path in self.outputs.values():
+            self.assertTrue(os.path.exists(output_path))
+
+    def test_relax_fails(self):
+        """Test that reports on the input are kept if relax fails."""
+        env = os.environ.copy()
+        env["FAIL_RELAX"] = "1"
+        status = robot_chain(
+            self.robot_path,
+            "input.nt",
+            env,
+            relaxed_path=self.outputs["relaxed.json"],
+            measure_path=self.outputs["robot.measure"],
+        )
+        self.assertEqual(status, {"measure": True, "relax": False})
+
+
+@skipIf(not os.path.exists(ROBOT_PATH), "Needs ROBOT.")
+class TestRobotInput(TestCase):
+    """Test ROBOT reading a dump body in place."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.robot_env = initialize_robot(ROBOT_PATH)[1]
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_relax_dump_body(self):
+        """Test that the header is skipped and the ontology IRI is kept."""
+        dump_path = os.path.join(self.tempdir.name, "a" * 28)
+        with open(os.path.join(RESOURCES, "hierarchy.nt")) as infile:
+            with open(dump_path, "w") as outfile:
+                outfile.write(HEADER + infile.read())
+
+        relaxed_path = os.path.join(self.tempdir.name, "TST_1_relaxed.json")
+        with dump_body(dump_path, len(HEADER)) as body_path:
+            status = robot_chain(ROBOT_PATH, body_path, self.robot_env, relaxed_path)
+        self.assertEqual(status, {"relax": True})
+        with open(relaxed_path) as infile:
+            graph = json.load(infile)["graphs"][0]
+        self.assertEqual(graph["id"], "http://purl.obolibrary.org/obo/tst.owl")
+        self.assertEqual(len(graph["nodes"]), 4)
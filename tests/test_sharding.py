@@ -0,0 +1,91 @@
+"""Tests for splitting a dump run into shards and merging their results."""
+
+import os
+import tempfile
+from unittest import TestCase
+
+import yaml
+
+from bioportal_to_kgx.sharding import (assign_shards, find_shard_paths,
+                                       get_shard_files, get_shard_path,
+                                       parse_shard)
+from bioportal_to_kgx.stats import make_transform_stats, merge_transform_stats
+
+
+class TestSharding(TestCase):
+    """Test assigning dump files to shards."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.sizes = {}
+        for i, size in enumerate([900, 500, 400, 300, 300, 100]):
+            filepath = os.path.join(self.tempdir.name, f"dump{i}")
+            with open(filepath, "w") as outfile:
+                outfile.write("x" * size)
+            self.sizes[filepath] = size
+        self.status_path = os.path.join(self.tempdir.name, "onto_status.yaml")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_parse_shard(self):
+        """Test reading shards given as i/N."""
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ["0/4", "5/4", "2", "a/b"]:
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_assign_shards(self):
+        """Test that shards are balanced and cover every file once."""
+        shards = assign_shards(self.sizes, 2)
+        self.assertEqual(
+            sorted(path for shard in shards for path in shard), sorted(self.sizes)
+        )
+        totals = [sum(self.sizes[path] for path in shard) for shard in shards]
+        self.assertEqual(totals, [1300, 1200])
+
+        # The same files in any order give the same shards
+        reordered = dict(reversed(list(self.sizes.items())))
+        self.assertEqual(assign_shards(reordered, 2), shards)
+
+        filepaths = list(self.sizes)
+        shard_filepaths = get_shard_files(filepaths, 2, 2)
+        self.assertEqual(shard_filepaths, sorted(shards[1], key=filepaths.index))
+
+    def test_merge_status(self):
+        """Test merging the status of each shard."""
+        shard_results = {
+            1: [{"id": "AAA", "status": "OK"}, {"id": "BBB", "status": "FAIL"}],
+            2: [{"id": "CCC", "status": "FAIL"}, {"id": "AAA", "status": "FAIL"}],
+        }
+        for index, results in shard_results.items():
+            make_transform_stats(
+                results, get_shard_path(self.status_path, index, 3), (index, 3)
+            )
+        # From an older run, split another way
+        make_transform_stats([], get_shard_path(self.status_path, 1, 2), (1, 2))
+
+        shard_paths = find_shard_paths(self.status_path)
+        self.assertEqual(sorted(shard_paths), [2, 3])
+        self.assertEqual(
+            os.path.basename(shard_paths[3][2]), "onto_status.shard_2_of_3.yaml"
+        )
+
+        summary_path = os.path.join(self.tempdir.name, "summary.yaml")
+        summary = merge_transform_stats(
+            shard_paths[3], 3, self.status_path, summary_path
+        )
+        self.assertEqual(summary["ok"], ["AAA"])
+        self.assertEqual(summary["failed"], ["BBB", "CCC"])
+        self.assertEqual(summary["missing_shards"], [3])
+
+        with open(self.status_path) as infile:
+            merged = yaml.safe_load(infile)
+        self.assertNotIn("shard", merged)
+        self.assertEqual(
+            [result["id"] for result in merged["ontologies"]], ["AAA", "BBB", "CCC"]
+        )
+        with open(summary_path) as infile:
+            self.assertEqual(yaml.safe_load(infile)["shards"], 3)
@@ -0,0 +1,74 @@
+"""Tests for synthetic dumps and the ROBOT stand-in."""
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.benchmark import run_benchmarks
+from bioportal_to_kgx.dump_utils import (dump_body, find_dump_files,
+                                         get_header_offset, parse_header)
+from bioportal_to_kgx.repair_utils import has_bad_curie, sanitize_dump
+from bioportal_to_kgx.robot_utils import robot_chain
+from bioportal_to_kgx.synthetic import write_fake_robot, write_synthetic_dump
+
+
+class TestSynthetic(TestCase):
+    """Test generating synthetic dumps and relaxing them without ROBOT."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.dump_dir = os.path.join(self.tempdir.name, "data")
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_synthetic_dump(self):
+        """Test that synthetic dump files look like 4store's."""
+        filepaths = write_synthetic_dump(
+            self.dump_dir, [10, 50], bad_comment_fraction=1.0
+        )
+        self.assertEqual(find_dump_files(self.dump_dir), sorted(filepaths))
+        self.assertEqual(parse_header(filepaths[1])[:2], ["ontologies", "SYN1"])
+        # Same seed, same dump
+        with open(filepaths[1]) as infile:
+            first = infile.read()
+        write_synthetic_dump(self.dump_dir, [10, 50], bad_comment_fraction=1.0)
+        with open(filepaths[1]) as infile:
+            self.assertEqual(infile.read(), first)
+
+        sanitized_path = os.path.join(self.tempdir.name, "sanitized.nt")
+        fixes = sanitize_dump(
+            filepaths[1], get_header_offset(filepaths[1]), sanitized_path
+        )
+        self.assertEqual(fixes, {"null_comment": 50})
+
+    def test_fake_robot(self):
+        """Test relaxing a dump body with the ROBOT stand-in."""
+        filepath = write_synthetic_dump(self.dump_dir, [20], file_iri_fraction=0.5)[0]
+        robot_path = os.path.join(self.tempdir.name, "robot")
+        write_fake_robot(robot_path)
+
+        relaxed_path = os.path.join(self.tempdir.name, "SYN0_relaxed.json.gz")
+        report_path = os.path.join(self.tempdir.name, "robot.report")
+        with dump_body(filepath, get_header_offset(filepath)) as body_path:
+            status = robot_chain(
+                robot_path,
+                body_path,
+                dict(os.environ),
+                relaxed_path,
+                report_path=report_path,
+            )
+        self.assertEqual(status, {"relax": True, "report": True})
+        self.assertTrue(has_bad_curie(relaxed_path))
+
+    def test_benchmarks(self):
+        """Test timing stages, without full transforms."""
+        results = run_benchmarks(self.tempdir.name, [10, 20], 1, transform=False)
+        stages = [result["stage"] for result in results]
+        self.assertIn("sanitize_dump", stages)
+        self.assertIn("repair_bad_curies", stages)
+        self.assertTrue(all(result["seconds"] >= 0 for result in results))
+        json.dumps(results)
@@ -0,0 +1,69 @@
+"""Tests for recording stage time and resource use."""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from bioportal_to_kgx.telemetry import Tracer
+
+# Holds about 200 MB for a moment, then exits
+CHILD_CODE = "import time; x = bytearray(200 * 1024 * 1024); time.sleep(1)"
+
+
+class TestTracer(TestCase):
+    """Test tracing transform stages."""
+
+    def setUp(self) -> None:
+        """Set up for tests."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.trace_path = os.path.join(self.tempdir.name, "trace.jsonl")
+        self.input_path = os.path.join(self.tempdir.name, "input.nt")
+        with open(self.input_path, "w") as outfile:
+            outfile.write("x" * 1000)
+        self.output_path = os.path.join(self.tempdir.name, "output")
+        os.mkdir(self.output_path)
+
+    def tearDown(self) -> None:
+        """Clean up after tests."""
+        self.tempdir.cleanup()
+
+    def test_spans(self):
+        """Test writing spans to the trace, including failed stages."""
+        tracer = Tracer(self.trace_path, "TST_1")
+        with tracer.span(
+            "copy", inputs=[self.input_path], outputs=[self.output_path]
+        ) as span:
+            with open(os.path.join(self.output_path, "out.tsv"), "w") as outfile:
+                outfile.write("y" * 500)
+            span["rows"] = 5
+        with self.assertRaises(ValueError):
+            with tracer.span("fail"):
+                raise ValueError("Stage failed")
+
+        with open(self.trace_path) as infile:
+            spans = [json.loads(line) for line in infile]
+        self.assertEqual([span["stage"] for span in spans], ["copy", "fail"])
+        self.assertEqual(spans[0]["ontology"], "TST_1")
+        self.assertEqual(spans[0]["input_bytes"], 1000)
+        self.assertEqual(spans[0]["output_bytes"], 500)
+        self.assertEqual(spans[0]["rows"], 5)
+        self.assertTrue(spans[0]["ok"])
+        self.assertFalse(spans[1]["ok"])
+
+    def test_child_resources(self):
+        """Test that time and memory used by child processes are counted."""
+        tracer = Tracer("", "TST_1")
+        with tracer.span("child"):
+            subprocess.run([sys.executable, "-c", CHILD_CODE], check=True)
+        span = tracer.spans[0]
+        self.assertGreaterEqual(span["wall_seconds"], 1)
+        self.assertGreater(span["child_cpu_seconds"], 0)
+        self.assertGreaterEqual(span["peak_rss_mb"], 200)
+
+        summary = tracer.summary()
+        self.assertEqual(summary["slowest_stage"], "child")
+        self.assertEqual(summary["peak_rss_mb"], span["peak_rss_mb"])
+        self.assertFalse(os.path.exists(self.trace_path))
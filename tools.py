@@ -0,0 +1,420 @@
+# tools.py
+
+"""
+Supporting commands for BioPortal-to-KGX,
+for use before or after running transforms
+with run.py.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import click
+
+from bioportal_to_kgx.benchmark import (  # type: ignore
+    format_results,
+    run_benchmarks,
+)
+from bioportal_to_kgx.bioportal_utils import (  # type: ignore
+    MetadataClient,
+    write_metadata_snapshot,
+)
+from bioportal_to_kgx.catalog import (  # type: ignore
+    filter_catalog,
+    update_catalog,
+)
+from bioportal_to_kgx.compress_utils import check_compression  # type: ignore
+from bioportal_to_kgx.graph_stats import REPORTS, write_reports  # type: ignore
+from bioportal_to_kgx.id_index import lookup_ids, update_id_index  # type: ignore
+from bioportal_to_kgx.merge_graph import MERGED_NAME, merge_graph  # type: ignore
+from bioportal_to_kgx.prefix_utils import (  # type: ignore
+    infer_prefixes,
+    write_prefixes,
+)
+from bioportal_to_kgx.sharding import find_shard_paths  # type: ignore
+from bioportal_to_kgx.stats import merge_transform_stats  # type: ignore
+from bioportal_to_kgx.synthetic import write_synthetic_dump  # type: ignore
+
+SIZES_HELP = """Number of classes in each synthetic ontology,
+                      comma-delimited, e.g., 100,1000,10000."""
+
+
+def parse_sizes(_, __, value: str) -> list:
+    """Parse a comma-delimited list of ontology sizes."""
+    try:
+        return [int(size) for size in value.split(",")]
+    except ValueError:
+        raise click.BadParameter("Sizes must be whole numbers, comma-delimited.")
+
+
+@click.group()
+def cli():
+    """Run a supporting command."""
+    pass
+
+
+@cli.command()
+@click.option(
+    "--input",
+    required=True,
+    nargs=1,
+    help="""Path to the 4store data dump - usually named data""",
+)
+@click.option(
+    "--catalog",
+    default="dump_catalog.tsv",
+    help="""Path to the catalog TSV to create or refresh.""",
+)
+@click.option(
+    "--threads",
+    default=8,
+    type=click.IntRange(min=1),
+    help="""Number of threads to use when listing the dump
+                      directory and reading dump file headers.""",
+)
+@click.option(
+    "--ontologies",
+    callback=lambda _, __, x: x.split(",") if x else [],
+    help="""If used, list the dump files for these ontologies,
+                      comma-delimited and named by their BioPortal acronym,
+                      optionally with a submission version,
+                      e.g., BTO,GO:1523.""",
+)
+def catalog(input: str, catalog: str, threads: int, ontologies=[]):
+    """Build or refresh the catalog of dump files."""
+    dump_catalog = update_catalog(input, catalog, threads, threads)
+    print(f"Catalog of {len(dump_catalog)} dump files written to {catalog}")
+
+    if ontologies:
+        for filepath in filter_catalog(dump_catalog, ontologies):
+            entry = dump_catalog[filepath]
+            print(f"{entry['acronym']}\t{entry['version']}\t{filepath}")
+
+
+@cli.command()
+@click.option("--ncbo_key", required=True, help="""Key for the NCBO API.""")
+@click.option(
+    "--snapshot",
+    default="metadata_snapshot.json",
+    help="""Path to the snapshot file to write.""",
+)
+def prefetch_metadata(ncbo_key: str, snapshot: str):
+    """Retrieve records for all BioPortal ontologies into a snapshot."""
+    client = MetadataClient(ncbo_key)
+    try:
+        records = client.get_snapshot()
+    finally:
+        client.close()
+    if not records:
+        sys.exit("Could not retrieve ontology records - snapshot not written.")
+
+    write_metadata_snapshot(records, snapshot)
+    print(f"Records for {len(records)} ontologies written to {snapshot}")
+
+
+@cli.command()
+@click.option(
+    "--output",
+    required=True,
+    help="""Path to write the synthetic dump to.""",
+)
+@click.option(
+    "--sizes",
+    default="100,1000,10000",
+    callback=parse_sizes,
+    help=SIZES_HELP,
+)
+@click.option(
+    "--branching",
+    default=4,
+    type=click.IntRange(min=0),
+    help="""Number of subclasses per class,
+                      or 0 to choose each superclass at random.""",
+)
+@click.option("--seed", default=0, help="""Seed for randomness.""")
+def make_dump(output: str, sizes: list, branching: int, seed: int):
+    """Write a synthetic 4store dump, for testing."""
+    filepaths = write_synthetic_dump(output, sizes, seed, branching=branching)
+    print(f"Wrote {len(filepaths)} synthetic dump files to {output}")
+
+
+@cli.command()
+@click.option(
+    "--sizes",
+    default="1000,10000,100000",
+    callback=parse_sizes,
+    help=SIZES_HELP,
+)
+@click.option(
+    "--repeat",
+    default=3,
+    type=click.IntRange(min=1),
+    help="""Number of times to run each stage,
+                      keeping the fastest.""",
+)
+@click.option(
+    "--transform/--no_transform",
+    default=True,
+    help="""Whether to time full transforms, with a stand-in
+                      for ROBOT. Needs KGX and universalizer.""",
+)
+@click.option(
+    "--work_dir",
+    default="",
+    help="""Directory to write synthetic data and outputs to.
+                      Defaults to a temporary directory.""",
+)
+@click.option(
+    "--output",
+    default="",
+    help="""If used, also write results to this JSON file,
+                      to compare between versions.""",
+)
+def benchmark(sizes: list, repeat: int, transform: bool, work_dir: str, output: str):
+    """Time each pipeline stage on a synthetic dump."""
+    if work_dir:
+        results = run_benchmarks(work_dir, sizes, repeat, transform)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = run_benchmarks(tmp_dir, sizes, repeat, transform)
+
+    print(format_results(results))
+    if output:
+        with open(output, "w") as outfile:
+            json.dump({"sizes": sizes, "results": results}, outfile, indent=2)
+        print(f"Results written to {output}")
+
+
+@cli.command()
+@click.option(
+    "--input",
+    default="transformed/ontologies",
+    help="""Path to the transformed ontologies,
+                      with one directory per ontology.""",
+)
+@click.option(
+    "--output",
+    default="stats",
+    help="""Directory to write reports to.""",
+)
+@click.option(
+    "--reports",
+    default=",".join(REPORTS),
+    callback=lambda _, __, x: x.split(",") if x else [],
+    help="""Reports to write, comma-delimited, from
+                      biolink, counts, types, umls and transform.
+                      Defaults to all of them.""",
+)
+@click.option(
+    "--cache",
+    default="stats_cache.json",
+    help="""Path to the stats cache. Files with the same size
+                      and modification time as when last read are not
+                      read again. Use an empty string to read every file.""",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="""Number of processes to read files with.""",
+)
+def stats(input: str, output: str, reports: list, cache: str, workers: int):
+    """Write reports on node, edge and validation log contents."""
+    unknown = [name for name in reports if name not in REPORTS]
+    if unknown:
+        raise click.BadParameter(f"Unknown report(s): {', '.join(unknown)}")
+
+    for report_path in write_reports(input, output, reports, cache, workers):
+        print(f"Wrote {report_path}")
+
+
+@cli.command()
+@click.option(
+    "--input",
+    default="transformed/ontologies",
+    help="""Path to the transformed ontologies,
+                      with one directory per ontology.""",
+)
+@click.option(
+    "--output",
+    default="prefixes/bioportal-prefixes.tsv",
+    help="""Path to write prefixes to, in the same format
+                      as prefixes/bioportal-prefixes-curated.tsv.""",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="""Number of processes to read ontologies with.""",
+)
+@click.option(
+    "--min_count",
+    default=1,
+    type=click.IntRange(min=1),
+    help="""Leave out prefixes used by fewer nodes than this.""",
+)
+def prefixes(input: str, output: str, workers: int, min_count: int):
+    """Infer the prefixes used by each ontology's node IDs."""
+    rows = infer_prefixes(input, workers, min_count)
+    write_prefixes(rows, output)
+    print(f"Wrote {len(rows)} prefixes to {output}")
+
+
+@cli.command()
+@click.option(
+    "--status",
+    default="onto_status.yaml",
+    help="""Path to write the merged status to. Each shard's
+                      status is found next to it, e.g.,
+                      onto_status.shard_1_of_4.yaml.""",
+)
+@click.option(
+    "--summary",
+    default="onto_status_summary.yaml",
+    help="""Path to write a summary of successes, failures
+                      and missing shards to.""",
+)
+@click.option(
+    "--shards",
+    default=0,
+    type=click.IntRange(min=0),
+    help="""Number of shards the run was split into.
+                      Only needed if statuses from runs split
+                      different ways are found together.""",
+)
+def merge_status(status: str, summary: str, shards: int):
+    """Merge the statuses written by each shard of a run."""
+    shard_paths = find_shard_paths(status)
+    if not shards:
+        if len(shard_paths) != 1:
+            found = ", ".join(str(count) for count in sorted(shard_paths)) or "none"
+            sys.exit(f"Found statuses for runs split {found} ways - use --shards.")
+        shards = list(shard_paths)[0]
+
+    merged = merge_transform_stats(
+        shard_paths.get(shards, {}), shards, status, summary
+    )
+    print(f"Merged {len(shard_paths.get(shards, {}))} of {shards} shards to {status}")
+    if merged["ok"]:
+        print(f"Successful transforms: {', '.join(merged['ok'])}")
+    if merged["failed"]:
+        print(f"Failed transforms: {', '.join(merged['failed'])}")
+    if merged["missing_shards"]:
+        missing = ", ".join(str(index) for index in merged["missing_shards"])
+        sys.exit(f"No status found for shard(s) {missing} of {shards}.")
+
+
+@cli.command("merge-graph")
+@click.option(
+    "--input",
+    default="transformed/ontologies",
+    help="""Path to the transformed ontologies,
+                      with one directory per ontology.""",
+)
+@click.option(
+    "--output",
+    default="merged",
+    help="""Directory to write the merged graph to.""",
+)
+@click.option(
+    "--name",
+    default=MERGED_NAME,
+    help="""Name of the merged graph, used to name its files,
+                      e.g., kg-bioportal_nodes.tsv.""",
+)
+@click.option(
+    "--memory_budget",
+    default=2048,
+    type=click.IntRange(min=1),
+    help="""Memory, in MB, to use for sorting nodes and edges,
+                      shared between workers. Rows beyond this are
+                      sorted on disk. Defaults to 2048.""",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="""Number of processes to sort and merge with.""",
+)
+@click.option(
+    "--compress",
+    default="",
+    type=click.Choice(["", "gzip", "zstd"]),
+    help="""If used, compress the merged node and edge files
+                      with gzip or zstd.""",
+)
+def merge_graph_files(
+    input: str, output: str, name: str, memory_budget: int, workers: int, compress: str
+):
+    """Merge all transforms into one graph, without duplicates."""
+    try:
+        check_compression(compress)
+    except ImportError as e:
+        sys.exit(str(e))
+
+    stats = merge_graph(input, output, name, memory_budget, workers, compress)
+    for kind in ["nodes", "edges"]:
+        print(
+            f"Merged {stats[kind]['rows_read']} {kind} from {stats[kind]['files']} "
+            f"files into {stats[kind]['rows']}, combining "
+            f"{stats[kind]['duplicates']} duplicates "
+            f"({stats[kind]['conflicts']} conflicting values, first kept)."
+        )
+        if stats[kind]["skipped"] > 0:
+            print(f"Skipped {stats[kind]['skipped']} {kind} without IDs.")
+    for path in stats["paths"]:
+        print(f"Wrote {path}")
+
+
+@cli.command()
+@click.option(
+    "--input",
+    default="transformed/ontologies",
+    help="""Path to the transformed ontologies,
+                      with one directory per ontology.""",
+)
+@click.option(
+    "--index",
+    default="id_index.sqlite",
+    help="""Path to the ID index. Created if it does not exist,
+                      or updated for ontologies that changed.""",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="""Number of processes to read ontologies with.""",
+)
+def index(input: str, index: str, workers: int):
+    """Index which ontologies define or reference each node ID and IRI."""
+    result = update_id_index(input, index, workers)
+    print(
+        f"Indexed {len(result['updated'])} ontologies, "
+        f"removed {len(result['removed'])}, "
+        f"and left {result['unchanged']} unchanged in {index}."
+    )
+
+
+@cli.command()
+@click.argument("ids", nargs=-1, required=True)
+@click.option(
+    "--index",
+    default="id_index.sqlite",
+    help="""Path to the ID index, as written by the index command.""",
+)
+def lookup(ids: tuple, index: str):
+    """Find which ontologies define or reference node IDs or IRIs."""
+    if not os.path.exists(index):
+        sys.exit(f"No ID index at {index} - run the index command first.")
+
+    for key, matches in lookup_ids(index, list(ids)).items():
+        if not matches:
+            print(f"{key}\tnot found")
+        for match in matches:
+            print(f"{key}\t{match['ontology']}\t{match['role']}")
+
+
+if __name__ == "__main__":
+    cli()